@@ -1,50 +1,253 @@
 
-import json
 import os
-from datetime import datetime, timedelta
+import queue
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
+from finance_core import (DATA_FILE, GOALS_FILE, HISTORY_FILE, METRICS, METRICS_FILE, PROFILE, SAVINGS_FILE, LedgerAggregator,
+                          LedgerError, LedgerIndex, LedgerService, LedgerSlots, PersistenceWorker, cli, date_ordinal,
+                          export_records, export_transaction_records, format_money, import_batches, import_summary,
+                          ledger_fingerprints, new_import_stats, parse_import_file, record_fingerprints, timed, transaction_criteria,
+                          validate_date)
 
-DATA_FILE = "finance_data.json"
-SAVINGS_FILE = "savings_data.json"
-GOALS_FILE = "goals_data.json"
+try:
+    from ttkbootstrap.toast import ToastNotification
+except ImportError:
+    ToastNotification = getattr(ttk, "ToastNotification", None)
 
-def load_data(file_path):
-    if os.path.exists(file_path):
-        try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except json.JSONDecodeError as e:
-            messagebox.showerror("خطا", f"خطا در بارگذاری فایل {file_path}: {str(e)}")
-            return []
-    return []
-
-def save_data(data, file_path):
+# فشرده‌سازی پس از این مدت بدون تغییر جدید انجام می‌شود (میلی‌ثانیه)
+FLUSH_DELAY_MS = 2000
+# فاصله بررسی نتیجه ذخیره‌سازی در پس‌زمینه (میلی‌ثانیه)
+PERSIST_POLL_MS = 100
+# فاصله بررسی تغییراتی که برنامه‌های دیگر در ژورنال ثبت کرده‌اند (میلی‌ثانیه)
+SYNC_POLL_MS = 1000
+# تراکنش‌ها در دسته‌هایی به این اندازه در پس‌زمینه بارگذاری و هر LOAD_POLL_MS به برنامه اضافه می‌شوند
+LOAD_CHUNK_SIZE = 5000
+LOAD_POLL_MS = 50
+# تعداد ردیف‌های قابل مشاهده در جدول تراکنش‌ها و ردیف‌هایی که از پیش قالب‌بندی می‌شوند
+VISIBLE_ROWS = 15
+ROW_BUFFER = 15
+# بیشترین تعداد ردیف‌های قالب‌بندی‌شده نگه‌داشته‌شده؛ ردیف‌هایی که مدتی نمایش داده نشده‌اند دور ریخته می‌شوند
+ROW_CACHE_SIZE = 4 * (VISIBLE_ROWS + ROW_BUFFER)
+# خروجی تراکنش‌ها: تعداد ردیفی که هر بار در رشته اصلی خوانده و به رشته خروجی داده می‌شود و تعداد تکه‌های در صف
+EXPORT_FEED_ROWS = 2000
+EXPORT_QUEUE_CHUNKS = 4
+# بیشترین تأخیر قابل قبول برای after در Tcl (میلی‌ثانیه)
+MAX_AFTER_MS = 2 ** 31 - 1
+# با FINANCE_PROFILE=1 معیارهای سنجش در این فاصله در METRICS_FILE نوشته می‌شوند (میلی‌ثانیه)
+METRICS_DUMP_MS = 60000
+GOAL_STATUS_TEXT = {"active": "در حال انجام", "near": "مهلت نزدیک!", "expired": "منقضی"}
+
+def format_transaction(t):
+    tag = "income" if t["type"] == "income" else "expense"
+    # فارسی کردن نوع تراکنش و افزودن جداکننده سه‌رقمی
+    ttype_display = "درآمد" if t["type"] == "income" else "هزینه"
     try:
-        with open(file_path, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
-    except Exception as e:
-        messagebox.showerror("خطا", f"خطا در ذخیره فایل {file_path}: {str(e)}")
+        amount_str = f"{format_money(t['amount'])} تومان"
+    except (TypeError, ValueError):
+        amount_str = "نامعتبر"
+    return (t["id"], t["date"], ttype_display, amount_str, t["category"], t["description"]), tag
 
-def generate_id(data):
-    return data[-1]["id"] + 1 if data else 1
+def queued_records(chunks):
+    # رکوردهای تکه‌هایی که رشته اصلی در صف می‌گذارد؛ None پایان و خطا لغو خروجی است
+    while True:
+        chunk = chunks.get()
+        if chunk is None:
+            return
+        if isinstance(chunk, Exception):
+            raise chunk
+        yield from chunk
 
-def validate_date(date_str):
-    try:
-        datetime.strptime(date_str, "%Y-%m-%d")
-        return True
-    except ValueError:
-        return False
+class VirtualTransactionList:
+    # فقط ردیف‌های قابل مشاهده در Treeview ساخته می‌شوند و با اسکرول جایگزین می‌شوند
+    def __init__(self, parent, source, lookup, formatter, height=VISIBLE_ROWS):
+        self.source = source
+        self.lookup = lookup
+        self.formatter = formatter
+        self.height = height
+        self.offset = 0
+        self.frame = ttk.Frame(parent)
+        self.tree = ttk.Treeview(self.frame, columns=("ID", "Date", "Type", "Amount", "Category", "Description"), show="headings", height=height, bootstyle=SUCCESS)
+        self.tree.heading("ID", text="شناسه")
+        self.tree.heading("Date", text="تاریخ")
+        self.tree.heading("Type", text="نوع")
+        self.tree.heading("Amount", text="مبلغ (تومان)")
+        self.tree.heading("Category", text="دسته‌بندی")
+        self.tree.heading("Description", text="توضیحات")
+        self.tree.column("ID", width=50)
+        self.tree.column("Date", width=100)
+        self.tree.column("Type", width=80)
+        self.tree.column("Amount", width=120)
+        self.tree.column("Category", width=100)
+        self.tree.column("Description", width=150)
+        self.tree.grid(row=0, column=0)
+        self.tree.tag_configure("income", background="#28a745", foreground="white")
+        self.tree.tag_configure("expense", background="#dc3545", foreground="white")
+        self.scrollbar = ttk.Scrollbar(self.frame, orient=tk.VERTICAL, command=self.on_scroll, bootstyle=SUCCESS)
+        self.scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
+        self.tree.bind("<MouseWheel>", self.on_mousewheel)
+        self.tree.bind("<Button-4>", lambda e: self.scroll_by(-3))
+        self.tree.bind("<Button-5>", lambda e: self.scroll_by(3))
+        self.tree.bind("<Up>", lambda e: self.on_arrow(-1))
+        self.tree.bind("<Down>", lambda e: self.on_arrow(1))
+        self.tree.bind("<Prior>", lambda e: self.scroll_by(-self.height))
+        self.tree.bind("<Next>", lambda e: self.scroll_by(self.height))
+        self.refresh()
+
+    def grid(self, **kwargs):
+        self.frame.grid(**kwargs)
+
+    def window(self, rows):
+        # جایگاه‌های حذف‌شده (None) رد می‌شوند
+        window = []
+        end = self.offset
+        while end < len(rows) and len(window) < self.height:
+            if rows[end] is not None:
+                window.append(rows[end])
+            end += 1
+        return window, end
+
+    def refresh(self):
+        rows = self.source()
+        self.offset = max(0, min(self.offset, len(rows) - self.height))
+        window, end = self.window(rows)
+        while len(window) < self.height and self.offset > 0:
+            self.offset -= 1
+            if rows[self.offset] is not None:
+                window.insert(0, rows[self.offset])
+        children = self.tree.get_children()
+        if children:
+            self.tree.delete(*children)
+        for t in window:
+            self.insert_row(t)
+        if PROFILE:
+            METRICS.add("rows_rendered", len(window))
+        # آماده‌سازی ردیف‌های بعدی تا اسکرول فقط هزینه درج در Treeview را داشته باشد
+        for t in rows[end:end + ROW_BUFFER]:
+            if t is not None:
+                self.formatter(t)
+        self.update_scrollbar(len(rows))
+
+    def insert_row(self, t, index=tk.END):
+        values, tag = self.formatter(t)
+        self.tree.insert("", index, iid=str(t["id"]), values=values, tags=(tag,))
+
+    def reconcile(self, ids):
+        # فقط ردیف‌های تغییرکرده در پنجره فعلی اصلاح می‌شوند
+        for tid in ids:
+            iid = str(tid)
+            if not self.tree.exists(iid):
+                continue
+            t = self.lookup(tid)
+            if t is None:
+                self.tree.delete(iid)
+            else:
+                values, tag = self.formatter(t)
+                self.tree.item(iid, values=values, tags=(tag,))
+        rows = self.source()
+        window, _ = self.window(rows)
+        children = self.tree.get_children()
+        if tuple(str(t["id"]) for t in window[:len(children)]) != children or (len(window) < self.height and self.offset > 0):
+            # فشرده‌سازی فهرست یا رسیدن به انتهای آن جایگاه‌ها را جابه‌جا کرده است
+            self.refresh()
+            return
+        for t in window[len(children):]:
+            self.insert_row(t)
+        self.update_scrollbar(len(rows))
+
+    def update_scrollbar(self, total):
+        if total:
+            self.scrollbar.set(self.offset / total, min(1.0, (self.offset + self.height) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def scroll_to(self, offset):
+        offset = max(0, min(offset, len(self.source()) - self.height))
+        if offset != self.offset:
+            self.offset = offset
+            self.refresh()
+
+    def scroll_by(self, delta):
+        self.scroll_to(self.offset + delta)
+        return "break"
+
+    def on_scroll(self, *args):
+        if args[0] == "moveto":
+            self.scroll_to(int(float(args[1]) * len(self.source())))
+        elif args[0] == "scroll":
+            step = self.height if args[2] == "pages" else 1
+            self.scroll_by(int(args[1]) * step)
+
+    def on_mousewheel(self, event):
+        return self.scroll_by(-3 if event.delta > 0 else 3)
+
+    def on_arrow(self, delta):
+        items = self.tree.get_children()
+        if not items or self.tree.focus() != (items[0] if delta < 0 else items[-1]):
+            return None
+        old_offset = self.offset
+        self.scroll_by(delta)
+        if self.offset == old_offset:
+            return "break"
+        items = self.tree.get_children()
+        item = items[0] if delta < 0 else items[-1]
+        self.tree.focus(item)
+        self.tree.selection_set(item)
+        return "break"
 
 class FinanceManagerApp:
     def __init__(self, root):
         self.root = root
         self.root.title("مدیریت مالی")
-        self.data = load_data(DATA_FILE)
-        self.savings = load_data(SAVINGS_FILE)
-        self.goals = load_data(GOALS_FILE)
+        self.started_at = time.perf_counter()
+        # منطق مالی در LedgerService است و این کلاس فقط ورودی‌ها را می‌خواند و نتیجه یا خطا را نمایش می‌دهد.
+        # تراکنش‌ها در پس‌زمینه بارگذاری می‌شوند و منوی اصلی بلافاصله نمایش داده می‌شود
+        self.service = LedgerService(persist=self.persist, load_transactions=False,
+                                     on_load_error=lambda e: messagebox.showerror("خطا", str(e)))
+        self.storage = self.service.storage
+        self.savings = self.service.savings
+        self.goals = self.service.goals
+        self.data = self.service.data
+        self.totals = self.service.totals
+        self.data_ready = threading.Event()
+        self.load_queue = queue.Queue(maxsize=8)
+        self.menu_time = None
+        self.load_time = None
+        self.pending_screen = None
+        self.status_label = None
+        self.aggregator = None
+        self.ledger_index = None
+        # معیارهای فیلتر فهرست تراکنش‌ها و ردیف‌های منطبق با آن (None یعنی نیاز به پرس‌وجوی دوباره)
+        self.transaction_filter = None
+        self.filtered_rows = None
+        self.import_queue = queue.Queue(maxsize=4)
+        self.import_cancel = threading.Event()
+        self.import_thread = None
+        self.import_stats = None
+        self.export_queue = queue.Queue()
+        self.export_thread = None
+        # (ردیف‌ها، جایگاه بعدی، نسخه ستون‌ها، صف تکه‌ها) تا وقتی ردیف‌های خروجی در حال خوانده شدن‌اند
+        self.export_feed = None
+        self.goal_job = None
+        self.goals_tree = None
+        self.metrics_job = None
+        self.stale_warned = False
+        self.undo_button = None
+        self.redo_button = None
+        self.metrics_tree = None
+        self.counters_label = None
+        if self.service.paged:
+            # با SQLite تراکنش‌ها بارگذاری نمی‌شوند و صفحه‌ها، فیلترها و جمع‌ها از پایگاه خوانده می‌شوند
+            self.load_time = 0.0
+            self.data_ready.set()
+        else:
+            threading.Thread(target=self.stream_transactions, daemon=True).start()
         self.style = ttk.Style("darkly")
         # تنظیم فونت B Nazanin برای پشتیبانی از فارسی
         self.style.configure("TLabel", font=("B Nazanin", 14))
@@ -55,7 +258,241 @@ class FinanceManagerApp:
         self.style.configure("success.Treeview", background="#28a745", foreground="white")
         self.style.configure("danger.Treeview", background="#dc3545", foreground="white")
         self.current_frame = None
+        self.transaction_list = None
+        # ردیف‌های قالب‌بندی‌شده جدول تراکنش‌ها بر اساس شناسه (LRU) و تراکنش‌هایی که از آخرین نمایش تغییر کرده‌اند
+        self.row_cache = OrderedDict()
+        self.dirty_ids = set()
+        self.flush_job = None
+        self.worker = PersistenceWorker(self.storage)
+        self.worker.start()
+        if self.service.paged:
+            # ثبت‌ها در رشته ذخیره‌سازی انجام می‌شوند و خواندن از پایگاه باید پس از آن‌ها باشد
+            self.data.settle = self.worker.wait
+        self.root.after(PERSIST_POLL_MS, self.poll_persistence)
+        self.root.after(SYNC_POLL_MS, self.poll_changes)
+        self.root.protocol("WM_DELETE_WINDOW", self.shutdown)
+        # صفحه پنهان سنجش کارایی
+        self.root.bind("<Control-Shift-D>", lambda e: self.show_diagnostics())
+        self.root.bind("<Control-z>", lambda e: self.on_history_key(e, False))
+        self.root.bind("<Control-y>", lambda e: self.on_history_key(e, True))
+        if PROFILE:
+            self.metrics_job = self.root.after(METRICS_DUMP_MS, self.dump_metrics)
         self.show_main_menu()
+        self.menu_time = time.perf_counter() - self.started_at
+        self.root.after(LOAD_POLL_MS, self.poll_loading)
+        self.schedule_goal_check()
+
+    def stream_transactions(self):
+        try:
+            next_id, records = self.storage.stream(DATA_FILE)
+            chunk = []
+            for record in records:
+                chunk.append(record)
+                if len(chunk) >= LOAD_CHUNK_SIZE:
+                    self.load_queue.put(("chunk", chunk))
+                    chunk = []
+            self.load_queue.put(("chunk", chunk))
+            self.load_queue.put(("done", next_id))
+        except Exception as e:
+            self.load_queue.put(("error", e))
+
+    def poll_loading(self):
+        # دسته‌های خوانده‌شده در رشته اصلی به داده‌ها اضافه می‌شوند
+        deadline = time.perf_counter() + LOAD_POLL_MS / 1000
+        while time.perf_counter() < deadline and not self.data_ready.is_set():
+            try:
+                kind, payload = self.load_queue.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "chunk":
+                try:
+                    self.service.add_loaded(payload)
+                    continue
+                except Exception as e:
+                    # خطا نباید حلقه after را متوقف کند؛ در غیر این صورت صفحه‌های منتظر بارگذاری هرگز باز نمی‌شوند
+                    kind, payload = "error", e
+            if kind == "done":
+                self.data.next_id = max(self.data.next_id, payload)
+                if self.service.rejected:
+                    messagebox.showwarning("هشدار", str(self.service.quarantine_rejected()))
+            else:
+                messagebox.showerror("خطا", f"خطا در بارگذاری فایل {DATA_FILE}: {str(payload)}")
+            self.load_time = time.perf_counter() - self.started_at
+            self.data_ready.set()
+            self.update_history_buttons()
+        self.update_load_status()
+        if not self.data_ready.is_set():
+            self.root.after(LOAD_POLL_MS, self.poll_loading)
+
+    def load_status_text(self):
+        if not self.data_ready.is_set():
+            return f"در حال بارگذاری تراکنش‌ها... ({len(self.data):,})"
+        return f"{len(self.data):,} تراکنش در {self.load_time:.2f} ثانیه بارگذاری شد (نمایش منو: {self.menu_time or 0:.2f} ثانیه)"
+
+    def update_load_status(self):
+        if self.status_label and self.status_label.winfo_exists():
+            self.status_label.configure(text=self.load_status_text())
+
+    def when_ready(self, screen):
+        # صفحه‌هایی که به همه تراکنش‌ها نیاز دارند تا پایان بارگذاری منتظر می‌مانند
+        if self.data_ready.is_set():
+            self.pending_screen = None
+            screen()
+            return
+        if self.pending_screen is None:
+            self.clear_frame()
+            ttk.Label(self.current_frame, text="لطفاً صبر کنید", font=("B Nazanin", 18, "bold"), bootstyle=SUCCESS).grid(row=0, column=0, pady=10)
+            self.status_label = ttk.Label(self.current_frame, text=self.load_status_text(), bootstyle=INFO)
+            self.status_label.grid(row=1, column=0, pady=10)
+            ttk.Button(self.current_frame, text="بازگشت", command=self.show_main_menu, bootstyle=(INFO, OUTLINE)).grid(row=2, column=0, pady=10)
+        self.pending_screen = screen
+        self.root.after(LOAD_POLL_MS, lambda: self.pending_screen is screen and self.when_ready(screen))
+
+    def persist(self, ops):
+        # رکوردها کپی می‌شوند تا تغییرات بعدی رشته اصلی روی داده در صف اثر نگذارد
+        self.worker.submit("commit", [(file_path, op, dict(record)) for file_path, op, record in ops])
+        self.schedule_flush()
+
+    def poll_persistence(self):
+        self.report_persistence()
+        if self.data_ready.is_set():
+            self.merge_changes()
+        self.root.after(PERSIST_POLL_MS, self.poll_persistence)
+
+    def poll_changes(self):
+        # بررسی ارزان ژورنال در رشته اصلی؛ خواندن خطوط جدید در رشته ذخیره‌سازی و اعمال آن‌ها در poll_persistence
+        if self.data_ready.is_set() and self.storage.changed():
+            self.worker.submit("sync", None)
+        self.root.after(SYNC_POLL_MS, self.poll_changes)
+
+    def merge_changes(self):
+        transaction_ids, files = self.service.merge_changes()
+        if self.storage.stale and not self.stale_warned:
+            self.stale_warned = True
+            messagebox.showwarning("هشدار", "برنامه دیگری داده‌ها را فشرده کرده است و بخشی از تغییرات آن در این پنجره دیده نمی‌شود. "
+                                             "برای دیدن همه تغییرات برنامه را دوباره باز کنید.")
+        self.apply_changes(transaction_ids, files)
+
+    def apply_changes(self, transaction_ids, files):
+        # به‌روزرسانی صفحه پس از تغییراتی که از این صفحه ثبت نشده‌اند (برنامه‌های دیگر، واگرد و انجام دوباره)
+        if transaction_ids:
+            self.dirty_ids.update(transaction_ids)
+            self.update_transaction_list()
+        if GOALS_FILE in files:
+            if self.goals_tree is not None and self.goals_tree.winfo_exists():
+                self.update_goals_list()
+            self.schedule_goal_check()
+        if HISTORY_FILE in files:
+            self.update_history_buttons()
+
+    def on_history_key(self, event, redo):
+        # در فیلدهای ورودی کلیدها به خود فیلد تعلق دارند
+        if event.widget.winfo_class() not in ("TEntry", "Entry", "TCombobox"):
+            self.undo(redo)
+
+    def undo(self, redo=False):
+        # واگرد با Ctrl+Z و انجام دوباره با Ctrl+Y؛ پیش از آن تغییرات برنامه‌های دیگر اعمال می‌شوند تا آخرین عمل واگرد شود
+        if not self.data_ready.is_set():
+            return
+        self.merge_changes()
+        try:
+            _, transaction_ids, files = self.service.redo() if redo else self.service.undo()
+        except LedgerError as e:
+            messagebox.showerror("خطا", str(e))
+            return
+        self.apply_changes(transaction_ids, files | {HISTORY_FILE})
+
+    def redo(self):
+        self.undo(redo=True)
+
+    def update_history_buttons(self):
+        if self.undo_button is None or not self.undo_button.winfo_exists():
+            return
+        ready = self.data_ready.is_set()
+        for button, text, entry in ((self.undo_button, "واگرد", self.service.history.last_done()),
+                                    (self.redo_button, "انجام دوباره", self.service.history.first_undone())):
+            button.configure(text=f"{text}: {entry['label']}" if entry else text, state=tk.NORMAL if ready and entry else tk.DISABLED)
+
+    def report_persistence(self):
+        while True:
+            try:
+                kind, error = self.worker.results.get_nowait()
+            except queue.Empty:
+                return
+            if error is not None:
+                messagebox.showerror("خطا", f"خطا در ذخیره‌سازی داده‌ها: {str(error)}")
+
+    def schedule_goal_check(self):
+        # زمان‌بند فقط برای نیمه‌شب اولین مرز بعدی اهداف تنظیم می‌شود؛ مرز گذشته بلافاصله بررسی می‌شود
+        if self.goal_job:
+            self.root.after_cancel(self.goal_job)
+            self.goal_job = None
+        boundary = self.service.goal_engine.next_boundary()
+        if boundary is None:
+            return
+        delay = (datetime.combine(date.fromordinal(boundary), datetime.min.time()) - datetime.now()).total_seconds()
+        self.goal_job = self.root.after(min(max(0, int(delay * 1000)), MAX_AFTER_MS), self.check_goals)
+
+    def check_goals(self):
+        self.goal_job = None
+        for goal, status in self.service.goal_engine.due(date.today().toordinal()):
+            self.notify_goal(goal, status)
+        if self.goals_tree is not None and self.goals_tree.winfo_exists():
+            self.update_goals_list()
+        self.schedule_goal_check()
+
+    def notify_goal(self, goal, status):
+        if status == "near":
+            message = f"مهلت هدف {goal['name']} ({goal['deadline']}) نزدیک است."
+        else:
+            message = f"مهلت هدف {goal['name']} ({goal['deadline']}) به پایان رسیده است."
+        if ToastNotification is not None:
+            ToastNotification(title="اهداف مالی", message=message, duration=10000, bootstyle=WARNING if status == "near" else DANGER).show_toast()
+        else:
+            messagebox.showwarning("اهداف مالی", message)
+
+    def shutdown(self):
+        self.import_cancel.set()
+        if self.goal_job:
+            self.root.after_cancel(self.goal_job)
+        if self.flush_job:
+            self.root.after_cancel(self.flush_job)
+        if self.metrics_job:
+            self.root.after_cancel(self.metrics_job)
+        self.worker.stop()
+        self.report_persistence()
+        if PROFILE:
+            self.write_metrics()
+        self.root.quit()
+
+    def write_metrics(self):
+        try:
+            METRICS.dump()
+        except OSError as e:
+            print(f"خطا در ذخیره معیارهای سنجش: {e}", file=sys.stderr)
+
+    def dump_metrics(self):
+        self.write_metrics()
+        self.metrics_job = self.root.after(METRICS_DUMP_MS, self.dump_metrics)
+
+    def schedule_flush(self):
+        # تغییرات پشت سر هم فقط یک فشرده‌سازی پس از FLUSH_DELAY_MS ایجاد می‌کنند
+        if not self.storage.needs_compaction():
+            return
+        if self.flush_job:
+            self.root.after_cancel(self.flush_job)
+        self.flush_job = self.root.after(FLUSH_DELAY_MS, self.compact)
+
+    def compact(self):
+        # تا پایان بارگذاری تراکنش‌ها data کامل نیست و نباید جای DATA_FILE نوشته شود
+        if not self.data_ready.is_set():
+            self.flush_job = self.root.after(FLUSH_DELAY_MS, self.compact)
+            return
+        self.flush_job = None
+        # تغییرات دریافتی پیش از گرفتن کپی اعمال می‌شوند؛ اگر تا زمان نوشتن تغییر دیگری برسد فشرده‌سازی انجام نمی‌شود.
+        # فقط کپی ستون‌ها در این رشته گرفته می‌شود و ساختن رکوردها و JSON در رشته ذخیره‌سازی انجام می‌شود
+        self.merge_changes()
+        self.worker.submit("compact", (self.service.collections(copy=True), self.service.merged))
 
     def clear_frame(self):
         if self.current_frame:
@@ -64,16 +501,30 @@ class FinanceManagerApp:
         self.current_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
 
     def show_main_menu(self):
+        self.pending_screen = None
         self.clear_frame()
-        ttk.Label(self.current_frame, text="مدیریت مالی", font=("B Nazanin", 26, "bold"), bootstyle=SUCCESS).grid(row=0, column=0, columnspan=2, pady=20)
-        ttk.Button(self.current_frame, text="ثبت تراکنش جدید", command=self.show_add_transaction, bootstyle=(SUCCESS, OUTLINE), width=20).grid(row=1, column=0, pady=10)
-        ttk.Button(self.current_frame, text="نمایش تراکنش‌ها", command=self.show_transactions, bootstyle=(SUCCESS, OUTLINE), width=20).grid(row=2, column=0, pady=10)
-        ttk.Button(self.current_frame, text="ویرایش تراکنش", command=self.show_edit_transaction, bootstyle=(SUCCESS, OUTLINE), width=20).grid(row=3, column=0, pady=10)
-        ttk.Button(self.current_frame, text="حذف تراکنش", command=self.show_delete_transaction, bootstyle=(SUCCESS, OUTLINE), width=20).grid(row=4, column=0, pady=10)
+        title = ttk.Label(self.current_frame, text="مدیریت مالی", font=("B Nazanin", 26, "bold"), bootstyle=SUCCESS)
+        title.grid(row=0, column=0, columnspan=2, pady=20)
+        title.bind("<Double-Button-1>", lambda e: self.show_diagnostics())
+        ttk.Button(self.current_frame, text="ثبت تراکنش جدید", command=lambda: self.when_ready(self.show_add_transaction), bootstyle=(SUCCESS, OUTLINE), width=20).grid(row=1, column=0, pady=10)
+        ttk.Button(self.current_frame, text="نمایش تراکنش‌ها", command=lambda: self.when_ready(self.show_transactions), bootstyle=(SUCCESS, OUTLINE), width=20).grid(row=2, column=0, pady=10)
+        ttk.Button(self.current_frame, text="ویرایش تراکنش", command=lambda: self.when_ready(self.show_edit_transaction), bootstyle=(SUCCESS, OUTLINE), width=20).grid(row=3, column=0, pady=10)
+        ttk.Button(self.current_frame, text="حذف تراکنش", command=lambda: self.when_ready(self.show_delete_transaction), bootstyle=(SUCCESS, OUTLINE), width=20).grid(row=4, column=0, pady=10)
         ttk.Button(self.current_frame, text="خلاصه مالی", command=self.show_summary, bootstyle=(SUCCESS, OUTLINE), width=20).grid(row=5, column=0, pady=10)
-        ttk.Button(self.current_frame, text="مدیریت اهداف مالی", command=self.show_goals, bootstyle=(SUCCESS, OUTLINE), width=20).grid(row=6, column=0, pady=10)
-        ttk.Button(self.current_frame, text="مدیریت پس‌انداز", command=self.show_savings, bootstyle=(SUCCESS, OUTLINE), width=20).grid(row=7, column=0, pady=10)
-        ttk.Button(self.current_frame, text="خروج", command=self.root.quit, bootstyle=(DANGER, OUTLINE), width=20).grid(row=8, column=0, pady=20)
+        ttk.Button(self.current_frame, text="گزارش دوره‌ای", command=lambda: self.when_ready(self.show_report), bootstyle=(SUCCESS, OUTLINE), width=20).grid(row=6, column=0, pady=10)
+        ttk.Button(self.current_frame, text="ورود گروهی تراکنش‌ها", command=lambda: self.when_ready(self.show_import), bootstyle=(SUCCESS, OUTLINE), width=20).grid(row=7, column=0, pady=10)
+        ttk.Button(self.current_frame, text="مدیریت اهداف مالی", command=lambda: self.when_ready(self.show_goals), bootstyle=(SUCCESS, OUTLINE), width=20).grid(row=8, column=0, pady=10)
+        ttk.Button(self.current_frame, text="مدیریت پس‌انداز", command=lambda: self.when_ready(self.show_savings), bootstyle=(SUCCESS, OUTLINE), width=20).grid(row=9, column=0, pady=10)
+        history = ttk.Frame(self.current_frame)
+        history.grid(row=10, column=0, pady=10)
+        self.redo_button = ttk.Button(history, command=self.redo, bootstyle=(WARNING, OUTLINE))
+        self.redo_button.grid(row=0, column=0, padx=5)
+        self.undo_button = ttk.Button(history, command=self.undo, bootstyle=(WARNING, OUTLINE))
+        self.undo_button.grid(row=0, column=1, padx=5)
+        self.update_history_buttons()
+        ttk.Button(self.current_frame, text="خروج", command=self.shutdown, bootstyle=(DANGER, OUTLINE), width=20).grid(row=11, column=0, pady=20)
+        self.status_label = ttk.Label(self.current_frame, text=self.load_status_text(), font=("B Nazanin", 10), bootstyle=SECONDARY)
+        self.status_label.grid(row=12, column=0, pady=5)
 
     def show_add_transaction(self):
         self.clear_frame()
@@ -98,37 +549,13 @@ class FinanceManagerApp:
         ttk.Button(self.current_frame, text="بازگشت", command=self.show_main_menu, bootstyle=(INFO, OUTLINE)).grid(row=7, column=0, columnspan=2, pady=5)
 
     def add_transaction(self):
-        ttype = self.type_var.get()
-        # تبدیل نوع تراکنش فارسی به انگلیسی برای ذخیره‌سازی
-        ttype_english = "income" if ttype == "درآمد" else "expense" if ttype == "هزینه" else ""
-        date = self.date_entry.get()
-        amount = self.amount_entry.get()
-        category = self.category_entry.get()
-        desc = self.desc_entry.get()
-        if ttype_english not in ("income", "expense"):
-            messagebox.showerror("خطا", "نوع تراکنش نامعتبر است.")
-            return
-        if not validate_date(date):
-            messagebox.showerror("خطا", "فرمت تاریخ نامعتبر است (yyyy-mm-dd).")
-            return
         try:
-            amount = float(amount)
-            if amount <= 0:
-                messagebox.showerror("خطا", "مبلغ باید مثبت باشد.")
-                return
-        except ValueError:
-            messagebox.showerror("خطا", "مبلغ نامعتبر است.")
-            return
-        transaction = {
-            "id": generate_id(self.data),
-            "date": date,
-            "type": ttype_english,
-            "amount": amount,
-            "category": category,
-            "description": desc
-        }
-        self.data.append(transaction)
-        save_data(self.data, DATA_FILE)
+            transaction = self.service.add_transaction(self.type_var.get(), self.date_entry.get(), self.amount_entry.get(),
+                                                       self.category_entry.get(), self.desc_entry.get())
+        except LedgerError as e:
+            messagebox.showerror("خطا", str(e))
+            return
+        self.dirty_ids.add(transaction["id"])
         self.update_transaction_list()
         self.clear_entries()
         messagebox.showinfo("موفقیت", "تراکنش با موفقیت ثبت شد!", parent=self.root)
@@ -145,59 +572,203 @@ class FinanceManagerApp:
     def show_transactions(self):
         self.clear_frame()
         ttk.Label(self.current_frame, text="لیست تراکنش‌ها", font=("B Nazanin", 18, "bold"), bootstyle=SUCCESS).grid(row=0, column=0, pady=10)
-        self.tree = ttk.Treeview(self.current_frame, columns=("ID", "Date", "Type", "Amount", "Category", "Description"), show="headings", bootstyle=SUCCESS)
-        self.tree.heading("ID", text="شناسه")
-        self.tree.heading("Date", text="تاریخ")
-        self.tree.heading("Type", text="نوع")
-        self.tree.heading("Amount", text="مبلغ (تومان)")
-        self.tree.heading("Category", text="دسته‌بندی")
-        self.tree.heading("Description", text="توضیحات")
-        self.tree.column("ID", width=50)
-        self.tree.column("Date", width=100)
-        self.tree.column("Type", width=80)
-        self.tree.column("Amount", width=120)
-        self.tree.column("Category", width=100)
-        self.tree.column("Description", width=150)
-        self.tree.grid(row=1, column=0, pady=10)
-        self.tree.tag_configure("income", background="#28a745", foreground="white")
-        self.tree.tag_configure("expense", background="#dc3545", foreground="white")
-        self.update_transaction_list()
-        ttk.Button(self.current_frame, text="بازگشت", command=self.show_main_menu, bootstyle=(INFO, OUTLINE)).grid(row=2, column=0, pady=10)
+        self.create_transaction_list()
+        exports = ttk.Frame(self.current_frame)
+        exports.grid(row=2, column=0, pady=5)
+        ttk.Button(exports, text="خروجی تراکنش‌ها", command=lambda: self.export("transactions"), bootstyle=(SUCCESS, OUTLINE)).grid(row=0, column=0, padx=5)
+        ttk.Button(exports, text="گزارش ماهانه", command=lambda: self.export("report"), bootstyle=(SUCCESS, OUTLINE)).grid(row=0, column=1, padx=5)
+        ttk.Button(self.current_frame, text="بازگشت", command=self.show_main_menu, bootstyle=(INFO, OUTLINE)).grid(row=3, column=0, pady=10)
+
+    def export(self, kind):
+        # خروجی تراکنش‌ها و گزارش ماهانه با همان فیلتر فعلی صفحه تراکنش‌ها گرفته می‌شود. ردیف‌ها در رشته اصلی
+        # انتخاب و با feed_export تکه‌تکه به رشته پس‌زمینه داده می‌شوند که فایل را می‌نویسد، پس نه کل داده‌ها کپی
+        # می‌شود و نه پنجره در خروجی‌های بزرگ منتظر می‌ماند
+        if self.export_thread and self.export_thread.is_alive():
+            messagebox.showerror("خطا", "یک خروجی در حال نوشتن است.")
+            return
+        self.export_feed = None
+        file_path = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV", "*.csv"), ("JSON Lines", "*.jsonl")])
+        if not file_path:
+            return
+        try:
+            if kind == "savings":
+                job = (export_records, [dict(s) for s in self.savings], file_path, SAVINGS_FILE)
+            elif kind == "goals":
+                job = (export_records, [dict(g) for g in self.goals], file_path, GOALS_FILE)
+            elif self.service.paged:
+                # رشته خروجی با اتصال جداگانه مستقیم از پایگاه می‌خواند
+                self.data.refresh()
+                job = (export_transaction_records, self.storage.select(self.transaction_filter or {}), kind, file_path)
+            else:
+                rows = self.transaction_index().query(**(self.transaction_filter or {}))
+                chunks = queue.Queue(maxsize=EXPORT_QUEUE_CHUNKS)
+                job = (export_transaction_records, queued_records(chunks), kind, file_path)
+                self.export_feed = (rows, 0, self.data.generation, chunks)
+        except (LedgerError, ValueError) as e:
+            messagebox.showerror("خطا", str(e))
+            return
+        self.export_thread = threading.Thread(target=self.run_export, args=job, daemon=True)
+        self.export_thread.start()
+        if self.export_feed is not None:
+            self.root.after(0, self.feed_export)
+        self.root.after(LOAD_POLL_MS, self.poll_export, file_path)
+
+    def feed_export(self):
+        # هر بار حداکثر EXPORT_FEED_ROWS ردیف خوانده می‌شود. تغییر یک ردیف در میانه خروجی فقط همان ردیف را تغییر
+        # می‌دهد، ولی پس از فشرده‌سازی ستون‌ها شماره ردیف‌ها معتبر نیست و خروجی لغو می‌شود
+        if self.export_feed is None:
+            return
+        rows, position, generation, chunks = self.export_feed
+        if not self.export_thread.is_alive():
+            # رشته خروجی با خطا متوقف شده است و poll_export آن را گزارش می‌کند
+            self.export_feed = None
+            return
+        if chunks.full():
+            self.root.after(LOAD_POLL_MS, self.feed_export)
+            return
+        if self.data.generation != generation:
+            chunks.put(LedgerError("تراکنش‌ها هنگام خروجی بازچینی شدند؛ خروجی را دوباره بگیرید."))
+            self.export_feed = None
+            return
+        if position >= len(rows):
+            chunks.put(None)
+            self.export_feed = None
+            return
+        end = position + EXPORT_FEED_ROWS
+        chunks.put([self.data.record(row) for row in rows[position:end] if self.data.live[row]])
+        self.export_feed = (rows, end, generation, chunks)
+        self.root.after(1, self.feed_export)
+
+    def run_export(self, export, *args):
+        started = time.perf_counter()
+        try:
+            count = export(*args)
+            self.export_queue.put(("done", (count, time.perf_counter() - started)))
+        except Exception as e:
+            self.export_queue.put(("error", e))
+
+    def poll_export(self, file_path):
+        try:
+            kind, payload = self.export_queue.get_nowait()
+        except queue.Empty:
+            self.root.after(LOAD_POLL_MS, self.poll_export, file_path)
+            return
+        if kind == "error":
+            if isinstance(payload, OSError):
+                messagebox.showerror("خطا", f"خطا در نوشتن فایل {file_path}: {str(payload)}")
+            else:
+                messagebox.showerror("خطا", f"خطا در خروجی: {str(payload)}")
+            return
+        count, elapsed = payload
+        messagebox.showinfo("موفقیت", f"{count:,} ردیف در {elapsed:.2f} ثانیه نوشته شد.")
+
+    def transaction_row(self, t):
+        row = self.row_cache.get(t["id"])
+        if row is None:
+            row = format_transaction(t)
+            self.row_cache[t["id"]] = row
+            if len(self.row_cache) > ROW_CACHE_SIZE:
+                self.row_cache.popitem(last=False)
+        else:
+            self.row_cache.move_to_end(t["id"])
+        return row
+
+    def reconcile_rows(self):
+        # ردیف‌های قالب‌بندی‌شده فقط برای تراکنش‌های تغییرکرده دور ریخته می‌شوند
+        dirty, self.dirty_ids = self.dirty_ids, set()
+        for tid in dirty:
+            self.row_cache.pop(tid, None)
+        return dirty
 
+    def create_transaction_list(self):
+        self.reconcile_rows()
+        self.transaction_filter = None
+        self.filtered_rows = None
+        container = ttk.Frame(self.current_frame)
+        container.grid(row=1, column=0, pady=10)
+        filters = ttk.Frame(container)
+        filters.grid(row=0, column=0, pady=5)
+        ttk.Label(filters, text="از:").grid(row=0, column=0, padx=2)
+        self.filter_start_entry = ttk.Entry(filters, width=11, bootstyle=SUCCESS)
+        self.filter_start_entry.grid(row=0, column=1, padx=2)
+        ttk.Label(filters, text="تا:").grid(row=0, column=2, padx=2)
+        self.filter_end_entry = ttk.Entry(filters, width=11, bootstyle=SUCCESS)
+        self.filter_end_entry.grid(row=0, column=3, padx=2)
+        self.filter_type = tk.StringVar(value="همه")
+        ttk.Combobox(filters, textvariable=self.filter_type, values=["همه", "درآمد", "هزینه"], state="readonly", width=7, bootstyle=SUCCESS).grid(row=0, column=4, padx=2)
+        self.filter_category = tk.StringVar(value="همه")
+        ttk.Combobox(filters, textvariable=self.filter_category, values=["همه"] + sorted(name for name in self.data.category_names if name), state="readonly", width=12, bootstyle=SUCCESS).grid(row=0, column=5, padx=2)
+        ttk.Label(filters, text="جستجو:").grid(row=1, column=0, padx=2, pady=5)
+        self.filter_text_entry = ttk.Entry(filters, bootstyle=SUCCESS)
+        self.filter_text_entry.grid(row=1, column=1, columnspan=3, sticky=(tk.W, tk.E), padx=2, pady=5)
+        self.filter_text_entry.bind("<Return>", lambda e: self.apply_transaction_filter())
+        ttk.Button(filters, text="فیلتر", command=self.apply_transaction_filter, bootstyle=SUCCESS).grid(row=1, column=4, padx=2, pady=5)
+        ttk.Button(filters, text="همه", command=self.clear_transaction_filter, bootstyle=(INFO, OUTLINE)).grid(row=1, column=5, padx=2, pady=5)
+        self.transaction_list = VirtualTransactionList(container, self.transaction_source, self.data.get, self.transaction_row)
+        self.transaction_list.grid(row=1, column=0)
+        self.filter_status = ttk.Label(container, text="", font=("B Nazanin", 10), bootstyle=SECONDARY)
+        self.filter_status.grid(row=2, column=0)
+        self.tree = self.transaction_list.tree
+
+    def transaction_index(self):
+        # با SQLite خود SqliteLedger پرس‌وجو را در پایگاه اجرا می‌کند
+        if self.ledger_index is None:
+            self.ledger_index = self.data if self.service.paged else LedgerIndex(self.data)
+        return self.ledger_index
+
+    def transaction_source(self):
+        if self.transaction_filter is None:
+            return self.data.slots
+        if self.filtered_rows is None or self.filtered_rows[0] != self.data.generation:
+            self.filtered_rows = (self.data.generation, self.transaction_index().query(**self.transaction_filter))
+        rows = self.filtered_rows[1]
+        return rows if self.service.paged else LedgerSlots(self.data, rows)
+
+    def apply_transaction_filter(self):
+        try:
+            criteria = transaction_criteria(self.filter_start_entry.get().strip(), self.filter_end_entry.get().strip(),
+                                            {"درآمد": "income", "هزینه": "expense"}.get(self.filter_type.get()),
+                                            None if self.filter_category.get() == "همه" else self.filter_category.get(),
+                                            self.filter_text_entry.get().strip())
+        except LedgerError as e:
+            messagebox.showerror("خطا", str(e))
+            return
+        if not any(criteria.values()):
+            self.clear_transaction_filter()
+            return
+        started = time.perf_counter()
+        self.transaction_filter = criteria
+        self.filtered_rows = None
+        self.transaction_list.offset = 0
+        self.transaction_list.refresh()
+        elapsed = (time.perf_counter() - started) * 1000
+        self.filter_status.configure(text=f"{len(self.filtered_rows[1]):,} تراکنش ({elapsed:.1f} میلی‌ثانیه)")
+
+    def clear_transaction_filter(self):
+        self.transaction_filter = None
+        self.filtered_rows = None
+        self.filter_start_entry.delete(0, tk.END)
+        self.filter_end_entry.delete(0, tk.END)
+        self.filter_text_entry.delete(0, tk.END)
+        self.filter_type.set("همه")
+        self.filter_category.set("همه")
+        self.filter_status.configure(text="")
+        self.transaction_list.offset = 0
+        self.transaction_list.refresh()
+
+    @timed("update_transaction_list")
     def update_transaction_list(self):
-        if hasattr(self, 'tree'):
-            for item in self.tree.get_children():
-                self.tree.delete(item)
-            for t in self.data:
-                tag = "income" if t["type"] == "income" else "expense"
-                # فارسی کردن نوع تراکنش و افزودن جداکننده سه‌رقمی
-                ttype_display = "درآمد" if t["type"] == "income" else "هزینه"
-                try:
-                    amount_str = f"{t['amount']:,.2f} تومان"
-                except (TypeError, ValueError):
-                    amount_str = "نامعتبر"
-                self.tree.insert("", tk.END, values=(t["id"], t["date"], ttype_display, amount_str, t["category"], t["description"]), tags=(tag,))
+        dirty = self.reconcile_rows()
+        if dirty and self.transaction_filter is not None:
+            # تراکنش ویرایش‌شده ممکن است دیگر با فیلتر منطبق نباشد
+            self.filtered_rows = None
+        if self.transaction_list and self.transaction_list.tree.winfo_exists():
+            self.transaction_list.reconcile(dirty)
 
     def show_edit_transaction(self):
         self.clear_frame()
         ttk.Label(self.current_frame, text="ویرایش تراکنش", font=("B Nazanin", 18, "bold"), bootstyle=SUCCESS).grid(row=0, column=0, pady=10)
-        self.tree = ttk.Treeview(self.current_frame, columns=("ID", "Date", "Type", "Amount", "Category", "Description"), show="headings", bootstyle=SUCCESS)
-        self.tree.heading("ID", text="شناسه")
-        self.tree.heading("Date", text="تاریخ")
-        self.tree.heading("Type", text="نوع")
-        self.tree.heading("Amount", text="مبلغ (تومان)")
-        self.tree.heading("Category", text="دسته‌بندی")
-        self.tree.heading("Description", text="توضیحات")
-        self.tree.column("ID", width=50)
-        self.tree.column("Date", width=100)
-        self.tree.column("Type", width=80)
-        self.tree.column("Amount", width=120)
-        self.tree.column("Category", width=100)
-        self.tree.column("Description", width=150)
-        self.tree.grid(row=1, column=0, pady=10)
-        self.tree.tag_configure("income", background="#28a745", foreground="white")
-        self.tree.tag_configure("expense", background="#dc3545", foreground="white")
-        self.update_transaction_list()
+        self.create_transaction_list()
         ttk.Button(self.current_frame, text="ویرایش", command=self.edit_transaction, bootstyle=SUCCESS).grid(row=2, column=0, pady=5)
         ttk.Button(self.current_frame, text="بازگشت", command=self.show_main_menu, bootstyle=(INFO, OUTLINE)).grid(row=3, column=0, pady=5)
 
@@ -207,76 +778,244 @@ class FinanceManagerApp:
             messagebox.showerror("خطا", "لطفاً یک تراکنش انتخاب کنید.")
             return
         tid = int(self.tree.item(selected)["values"][0])
-        for t in self.data:
-            if t["id"] == tid:
-                edit_window = ttk.Window(title="ویرایش تراکنش", themename="darkly")
-                ttk.Label(edit_window, text="تاریخ (yyyy-mm-dd):", font=("B Nazanin", 14)).grid(row=0, column=0, sticky=tk.E, padx=5)
-                date_entry = ttk.Entry(edit_window, bootstyle=SUCCESS)
-                date_entry.insert(0, t["date"])
-                date_entry.grid(row=0, column=1, pady=5)
-                ttk.Label(edit_window, text="نوع تراکنش:", font=("B Nazanin", 14)).grid(row=1, column=0, sticky=tk.E, padx=5)
-                type_var = tk.StringVar(value="درآمد" if t["type"] == "income" else "هزینه")
-                # فارسی کردن گزینه‌های نوع تراکنش
-                ttk.Combobox(edit_window, textvariable=type_var, values=["درآمد", "هزینه"], state="readonly", bootstyle=SUCCESS).grid(row=1, column=1, pady=5)
-                ttk.Label(edit_window, text="مبلغ (تومان):", font=("B Nazanin", 14)).grid(row=2, column=0, sticky=tk.E, padx=5)
-                amount_entry = ttk.Entry(edit_window, bootstyle=SUCCESS)
-                amount_entry.insert(0, f"{t['amount']:.2f}")
-                amount_entry.grid(row=2, column=1, pady=5)
-                ttk.Label(edit_window, text="دسته‌بندی:", font=("B Nazanin", 14)).grid(row=3, column=0, sticky=tk.E, padx=5)
-                category_entry = ttk.Entry(edit_window, bootstyle=SUCCESS)
-                category_entry.insert(0, t["category"])
-                category_entry.grid(row=3, column=1, pady=5)
-                ttk.Label(edit_window, text="توضیحات:", font=("B Nazanin", 14)).grid(row=4, column=0, sticky=tk.E, padx=5)
-                desc_entry = ttk.Entry(edit_window, bootstyle=SUCCESS)
-                desc_entry.insert(0, t["description"])
-                desc_entry.grid(row=4, column=1, pady=5)
-
-                def save_edit():
-                    if not validate_date(date_entry.get()):
-                        messagebox.showerror("خطا", "فرمت تاریخ نامعتبر است (yyyy-mm-dd).")
-                        return
-                    ttype = type_var.get()
-                    ttype_english = "income" if ttype == "درآمد" else "expense" if ttype == "هزینه" else ""
-                    if ttype_english not in ("income", "expense"):
-                        messagebox.showerror("خطا", "نوع تراکنش نامعتبر است.")
-                        return
-                    try:
-                        amount = float(amount_entry.get())
-                        if amount <= 0:
-                            messagebox.showerror("خطا", "مبلغ باید مثبت باشد.")
-                            return
-                    except ValueError:
-                        messagebox.showerror("خطا", "مبلغ نامعتبر است.")
-                        return
-                    t["date"] = date_entry.get()
-                    t["type"] = ttype_english
-                    t["amount"] = amount
-                    t["category"] = category_entry.get()
-                    t["description"] = desc_entry.get()
-                    save_data(self.data, DATA_FILE)
-                    self.update_transaction_list()
-                    messagebox.showinfo("موفقیت", "تراکنش با موفقیت ویرایش شد.")
-                    edit_window.destroy()
-
-                ttk.Button(edit_window, text="ذخیره", command=save_edit, bootstyle=SUCCESS).grid(row=5, column=0, columnspan=2, pady=10)
-                return
+        t = self.data.get(tid)
+        if t is not None:
+            edit_window = ttk.Window(title="ویرایش تراکنش", themename="darkly")
+            ttk.Label(edit_window, text="تاریخ (yyyy-mm-dd):", font=("B Nazanin", 14)).grid(row=0, column=0, sticky=tk.E, padx=5)
+            date_entry = ttk.Entry(edit_window, bootstyle=SUCCESS)
+            date_entry.insert(0, t["date"])
+            date_entry.grid(row=0, column=1, pady=5)
+            ttk.Label(edit_window, text="نوع تراکنش:", font=("B Nazanin", 14)).grid(row=1, column=0, sticky=tk.E, padx=5)
+            type_var = tk.StringVar(value="درآمد" if t["type"] == "income" else "هزینه")
+            # فارسی کردن گزینه‌های نوع تراکنش
+            ttk.Combobox(edit_window, textvariable=type_var, values=["درآمد", "هزینه"], state="readonly", bootstyle=SUCCESS).grid(row=1, column=1, pady=5)
+            ttk.Label(edit_window, text="مبلغ (تومان):", font=("B Nazanin", 14)).grid(row=2, column=0, sticky=tk.E, padx=5)
+            amount_entry = ttk.Entry(edit_window, bootstyle=SUCCESS)
+            amount_entry.insert(0, format_money(t["amount"], grouping=False))
+            amount_entry.grid(row=2, column=1, pady=5)
+            ttk.Label(edit_window, text="دسته‌بندی:", font=("B Nazanin", 14)).grid(row=3, column=0, sticky=tk.E, padx=5)
+            category_entry = ttk.Entry(edit_window, bootstyle=SUCCESS)
+            category_entry.insert(0, t["category"])
+            category_entry.grid(row=3, column=1, pady=5)
+            ttk.Label(edit_window, text="توضیحات:", font=("B Nazanin", 14)).grid(row=4, column=0, sticky=tk.E, padx=5)
+            desc_entry = ttk.Entry(edit_window, bootstyle=SUCCESS)
+            desc_entry.insert(0, t["description"])
+            desc_entry.grid(row=4, column=1, pady=5)
+
+            def save_edit():
+                try:
+                    self.service.edit_transaction(tid, type_var.get(), date_entry.get(), amount_entry.get(),
+                                                  category_entry.get(), desc_entry.get())
+                except LedgerError as e:
+                    messagebox.showerror("خطا", str(e))
+                    return
+                self.dirty_ids.add(tid)
+                self.update_transaction_list()
+                messagebox.showinfo("موفقیت", "تراکنش با موفقیت ویرایش شد. (واگرد: Ctrl+Z)")
+                edit_window.destroy()
+
+            ttk.Button(edit_window, text="ذخیره", command=save_edit, bootstyle=SUCCESS).grid(row=5, column=0, columnspan=2, pady=10)
+            return
         messagebox.showerror("خطا", "تراکنش پیدا نشد.")
 
+    @timed("show_summary")
     def show_summary(self):
         self.clear_frame()
-        income = sum(t["amount"] for t in self.data if t["type"] == "income")
-        expense = sum(t["amount"] for t in self.data if t["type"] == "expense")
-        savings = sum(t["amount"] for t in self.savings)
-        balance = income - expense - savings
+        income = self.totals.income
+        expense = self.totals.expense
+        savings = self.totals.savings
+        balance = self.totals.balance
         ttk.Label(self.current_frame, text="خلاصه مالی", font=("B Nazanin", 22, "bold"), bootstyle=SUCCESS).grid(row=0, column=0, pady=20)
         # افزودن جداکننده سه‌رقمی به مبالغ
-        ttk.Label(self.current_frame, text=f"کل درآمد (تومان): {income:,.2f}", font=("B Nazanin", 16), bootstyle=SUCCESS).grid(row=1, column=0, pady=10)
-        ttk.Label(self.current_frame, text=f"کل هزینه (تومان): {expense:,.2f}", font=("B Nazanin", 16), bootstyle=DANGER).grid(row=2, column=0, pady=10)
-        ttk.Label(self.current_frame, text=f"پس‌انداز (تومان): {savings:,.2f}", font=("B Nazanin", 16), bootstyle=INFO).grid(row=3, column=0, pady=10)
-        ttk.Label(self.current_frame, text=f"مانده حساب (تومان): {balance:,.2f}", font=("B Nazanin", 16), bootstyle=WARNING).grid(row=4, column=0, pady=10)
+        ttk.Label(self.current_frame, text=f"کل درآمد (تومان): {format_money(income)}", font=("B Nazanin", 16), bootstyle=SUCCESS).grid(row=1, column=0, pady=10)
+        ttk.Label(self.current_frame, text=f"کل هزینه (تومان): {format_money(expense)}", font=("B Nazanin", 16), bootstyle=DANGER).grid(row=2, column=0, pady=10)
+        ttk.Label(self.current_frame, text=f"پس‌انداز (تومان): {format_money(savings)}", font=("B Nazanin", 16), bootstyle=INFO).grid(row=3, column=0, pady=10)
+        ttk.Label(self.current_frame, text=f"مانده حساب (تومان): {format_money(balance)}", font=("B Nazanin", 16), bootstyle=WARNING).grid(row=4, column=0, pady=10)
         if balance < 0:
             ttk.Label(self.current_frame, text="⚠️ هشدار: مانده حساب منفی است!", font=("B Nazanin", 14), bootstyle=DANGER).grid(row=5, column=0, pady=10)
         ttk.Button(self.current_frame, text="بازگشت", command=self.show_main_menu, bootstyle=(INFO, OUTLINE)).grid(row=6, column=0, pady=20)
+        if not self.data_ready.is_set():
+            # تا پایان بارگذاری، مقادیر جزئی نمایش داده و دوباره به‌روز می‌شوند
+            self.status_label = ttk.Label(self.current_frame, text=self.load_status_text(), font=("B Nazanin", 10), bootstyle=SECONDARY)
+            self.status_label.grid(row=7, column=0, pady=5)
+            frame = self.current_frame
+            self.root.after(LOAD_POLL_MS * 10, lambda: frame is self.current_frame and self.show_summary())
+
+    def show_report(self):
+        if self.aggregator is None:
+            self.aggregator = self.data if self.service.paged else LedgerAggregator(self.data)
+        self.clear_frame()
+        ttk.Label(self.current_frame, text="گزارش دوره‌ای", font=("B Nazanin", 22, "bold"), bootstyle=SUCCESS).grid(row=0, column=0, columnspan=2, pady=20)
+        ttk.Label(self.current_frame, text="بازه آماده:").grid(row=1, column=0, sticky=tk.E, padx=5)
+        self.report_range = tk.StringVar(value="این ماه")
+        range_box = ttk.Combobox(self.current_frame, textvariable=self.report_range, values=["این ماه", "ماه گذشته", "امسال", "همه"], state="readonly", bootstyle=SUCCESS)
+        range_box.grid(row=1, column=1, pady=5)
+        range_box.bind("<<ComboboxSelected>>", lambda e: self.apply_report_range())
+        ttk.Label(self.current_frame, text="از تاریخ (yyyy-mm-dd):").grid(row=2, column=0, sticky=tk.E, padx=5)
+        self.report_start_entry = ttk.Entry(self.current_frame, bootstyle=SUCCESS)
+        self.report_start_entry.grid(row=2, column=1, pady=5)
+        ttk.Label(self.current_frame, text="تا تاریخ (yyyy-mm-dd):").grid(row=3, column=0, sticky=tk.E, padx=5)
+        self.report_end_entry = ttk.Entry(self.current_frame, bootstyle=SUCCESS)
+        self.report_end_entry.grid(row=3, column=1, pady=5)
+        ttk.Label(self.current_frame, text="گروه‌بندی:").grid(row=4, column=0, sticky=tk.E, padx=5)
+        self.report_group = tk.StringVar(value="روز")
+        ttk.Combobox(self.current_frame, textvariable=self.report_group, values=["روز", "ماه", "سال", "دسته‌بندی"], state="readonly", bootstyle=SUCCESS).grid(row=4, column=1, pady=5)
+        ttk.Button(self.current_frame, text="نمایش", command=self.update_report, bootstyle=SUCCESS).grid(row=5, column=0, columnspan=2, pady=10)
+        self.tree = ttk.Treeview(self.current_frame, columns=("Key", "Income", "Expense", "Net"), show="headings", bootstyle=SUCCESS)
+        self.tree.heading("Key", text="دوره / دسته")
+        self.tree.heading("Income", text="درآمد (تومان)")
+        self.tree.heading("Expense", text="هزینه (تومان)")
+        self.tree.heading("Net", text="خالص (تومان)")
+        self.tree.column("Key", width=120)
+        self.tree.column("Income", width=130)
+        self.tree.column("Expense", width=130)
+        self.tree.column("Net", width=130)
+        self.tree.grid(row=6, column=0, columnspan=2, pady=10)
+        self.tree.tag_configure("negative", foreground="#dc3545")
+        self.report_status = ttk.Label(self.current_frame, text="", font=("B Nazanin", 12), bootstyle=INFO)
+        self.report_status.grid(row=7, column=0, columnspan=2, pady=5)
+        ttk.Button(self.current_frame, text="بازگشت", command=self.show_main_menu, bootstyle=(INFO, OUTLINE)).grid(row=8, column=0, columnspan=2, pady=10)
+        self.apply_report_range()
+
+    def apply_report_range(self):
+        today = datetime.now().date()
+        choice = self.report_range.get()
+        if choice == "این ماه":
+            start, end = today.replace(day=1), today
+        elif choice == "ماه گذشته":
+            end = today.replace(day=1) - timedelta(days=1)
+            start = end.replace(day=1)
+        elif choice == "امسال":
+            start, end = today.replace(month=1, day=1), today
+        else:
+            start = end = None
+        self.report_start_entry.delete(0, tk.END)
+        self.report_end_entry.delete(0, tk.END)
+        if start is not None:
+            self.report_start_entry.insert(0, start.isoformat())
+            self.report_end_entry.insert(0, end.isoformat())
+        self.update_report()
+
+    def update_report(self):
+        start_str = self.report_start_entry.get().strip()
+        end_str = self.report_end_entry.get().strip()
+        # تاریخ خالی یعنی بازه از آن سمت باز است
+        for value in (start_str, end_str):
+            if value and not validate_date(value):
+                messagebox.showerror("خطا", "فرمت تاریخ نامعتبر است (yyyy-mm-dd).")
+                return
+        start = date_ordinal(start_str) if start_str else None
+        end = date_ordinal(end_str) if end_str else None
+        if start is not None and end is not None and start > end:
+            messagebox.showerror("خطا", "تاریخ شروع باید پیش از تاریخ پایان باشد.")
+            return
+        by = {"روز": "day", "ماه": "month", "سال": "year", "دسته‌بندی": "category"}[self.report_group.get()]
+        started = time.perf_counter()
+        rows = self.aggregator.summarize(by, start, end)
+        elapsed = (time.perf_counter() - started) * 1000
+        children = self.tree.get_children()
+        if children:
+            self.tree.delete(*children)
+        total_income = total_expense = 0
+        for label, income, expense in rows:
+            total_income += income
+            total_expense += expense
+            net = income - expense
+            self.tree.insert("", tk.END, values=(label, format_money(income), format_money(expense), format_money(net)), tags=("negative",) if net < 0 else ())
+        self.report_status.configure(text=f"درآمد: {format_money(total_income)} | هزینه: {format_money(total_expense)} | خالص: {format_money(total_income - total_expense)} ({elapsed:.1f} میلی‌ثانیه)")
+
+    def show_import(self):
+        self.clear_frame()
+        ttk.Label(self.current_frame, text="ورود گروهی تراکنش‌ها", font=("B Nazanin", 22, "bold"), bootstyle=SUCCESS).grid(row=0, column=0, columnspan=2, pady=20)
+        ttk.Label(self.current_frame, text="فایل CSV (ستون‌های date, type, amount, category, description) یا JSON Lines:", font=("B Nazanin", 12)).grid(row=1, column=0, columnspan=2, pady=5)
+        self.import_file_entry = ttk.Entry(self.current_frame, width=40, bootstyle=SUCCESS)
+        self.import_file_entry.grid(row=2, column=0, pady=5, padx=5)
+        ttk.Button(self.current_frame, text="انتخاب فایل", command=self.choose_import_file, bootstyle=(INFO, OUTLINE)).grid(row=2, column=1, pady=5)
+        ttk.Button(self.current_frame, text="شروع", command=self.start_import, bootstyle=SUCCESS).grid(row=3, column=0, pady=10)
+        ttk.Button(self.current_frame, text="توقف", command=self.import_cancel.set, bootstyle=(DANGER, OUTLINE)).grid(row=3, column=1, pady=10)
+        self.import_progress = ttk.Progressbar(self.current_frame, maximum=100, length=400, bootstyle=SUCCESS)
+        self.import_progress.grid(row=4, column=0, columnspan=2, pady=10)
+        self.import_status = ttk.Label(self.current_frame, text="", font=("B Nazanin", 12), bootstyle=INFO)
+        self.import_status.grid(row=5, column=0, columnspan=2, pady=5)
+        self.import_errors = tk.Listbox(self.current_frame, height=6, width=60)
+        self.import_errors.grid(row=6, column=0, columnspan=2, pady=5)
+        ttk.Button(self.current_frame, text="بازگشت", command=self.show_main_menu, bootstyle=(INFO, OUTLINE)).grid(row=7, column=0, columnspan=2, pady=10)
+        self.update_import_status()
+
+    def choose_import_file(self):
+        path = filedialog.askopenfilename(filetypes=[("CSV / JSON Lines", "*.csv *.jsonl *.ndjson *.json"), ("All files", "*.*")])
+        if path:
+            self.import_file_entry.delete(0, tk.END)
+            self.import_file_entry.insert(0, path)
+
+    def start_import(self):
+        if self.import_thread and self.import_thread.is_alive():
+            messagebox.showerror("خطا", "یک ورود گروهی در حال اجراست.")
+            return
+        file_path = self.import_file_entry.get().strip()
+        if not os.path.isfile(file_path):
+            messagebox.showerror("خطا", "فایل پیدا نشد.")
+            return
+        self.import_cancel.clear()
+        self.import_stats = new_import_stats(file_path)
+        # اثر انگشت تراکنش‌های موجود در رشته پس‌زمینه از روی یک کپی از ستون‌ها یا با SQLite مستقیم از پایگاه محاسبه می‌شود
+        if self.service.paged:
+            self.data.refresh()
+            snapshot = None
+        else:
+            snapshot = self.data.copy()
+        self.import_thread = threading.Thread(target=self.run_import, args=(file_path, snapshot, self.import_stats), daemon=True)
+        self.import_thread.start()
+        self.root.after(LOAD_POLL_MS, self.poll_import)
+
+    def run_import(self, file_path, snapshot, stats):
+        try:
+            if snapshot is None:
+                fingerprints, _ = record_fingerprints(self.storage.stream(DATA_FILE)[1])
+            else:
+                fingerprints = ledger_fingerprints(snapshot)
+                del snapshot
+            batches = import_batches(parse_import_file(file_path, stats), fingerprints, stats)
+            for batch in batches:
+                if self.import_cancel.is_set():
+                    batches.close()
+                    break
+                self.import_queue.put(("batch", batch))
+            self.import_queue.put(("done", None))
+        except Exception as e:
+            self.import_queue.put(("error", e))
+
+    def poll_import(self):
+        # هر دسته در رشته اصلی به داده‌ها اضافه و با یک UnitOfWork ثبت می‌شود
+        deadline = time.perf_counter() + LOAD_POLL_MS / 1000
+        finished = False
+        while time.perf_counter() < deadline:
+            try:
+                kind, payload = self.import_queue.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "batch":
+                self.import_stats["imported"] += self.service.import_batch(payload)
+            else:
+                if kind == "error":
+                    messagebox.showerror("خطا", f"خطا در ورود گروهی: {str(payload)}")
+                finished = True
+                break
+        self.update_import_status(finished)
+        if not finished:
+            self.root.after(LOAD_POLL_MS, self.poll_import)
+
+    def update_import_status(self, finished=False):
+        stats = self.import_stats
+        if stats is None or not (getattr(self, "import_status", None) and self.import_status.winfo_exists()):
+            return
+        self.import_progress.configure(value=100 * stats["bytes"] / stats["size"] if stats["size"] else 100)
+        suffix = " (پایان)" if finished else ""
+        self.import_status.configure(text=import_summary(stats) + suffix)
+        if self.import_errors.size() != len(stats["errors"]):
+            self.import_errors.delete(0, tk.END)
+            for error in stats["errors"]:
+                self.import_errors.insert(tk.END, error)
 
     def show_goals(self):
         self.clear_frame()
@@ -306,6 +1045,7 @@ class FinanceManagerApp:
         self.tree.column("Status", width=80)
         self.tree.grid(row=5, column=0, columnspan=2, pady=10)
         self.tree.tag_configure("near_deadline", background="#ffc107", foreground="black")
+        self.goals_tree = self.tree
         self.update_goals_list()
         ttk.Label(self.current_frame, text="مبلغ تخصیص (تومان):").grid(row=6, column=0, sticky=tk.E, padx=5)
         self.allocate_amount_entry = ttk.Entry(self.current_frame, bootstyle=SUCCESS)
@@ -314,143 +1054,83 @@ class FinanceManagerApp:
         self.allocate_source = tk.StringVar(value="موجودی")
         ttk.Combobox(self.current_frame, textvariable=self.allocate_source, values=["موجودی", "پس‌انداز"], state="readonly", bootstyle=SUCCESS).grid(row=7, column=1, pady=5)
         ttk.Button(self.current_frame, text="تخصیص به هدف", command=self.allocate_to_goal, bootstyle=SUCCESS).grid(row=8, column=0, columnspan=2, pady=10)
-        ttk.Button(self.current_frame, text="بازگشت", command=self.show_main_menu, bootstyle=(INFO, OUTLINE)).grid(row=9, column=0, columnspan=2, pady=10)
+        ttk.Button(self.current_frame, text="پیشنهاد تخصیص", command=self.show_allocation_plan, bootstyle=(SUCCESS, OUTLINE)).grid(row=9, column=0, columnspan=2, pady=5)
+        ttk.Button(self.current_frame, text="خروجی اهداف", command=lambda: self.export("goals"), bootstyle=(SUCCESS, OUTLINE)).grid(row=10, column=0, columnspan=2, pady=5)
+        ttk.Button(self.current_frame, text="بازگشت", command=self.show_main_menu, bootstyle=(INFO, OUTLINE)).grid(row=11, column=0, columnspan=2, pady=10)
 
     def add_goal(self):
-        name = self.goal_name_entry.get()
-        amount = self.goal_amount_entry.get()
-        deadline = self.goal_deadline_entry.get()
-        if not name:
-            messagebox.showerror("خطا", "نام هدف را وارد کنید.")
-            return
-        if not validate_date(deadline):
-            messagebox.showerror("خطا", "فرمت تاریخ نامعتبر است (yyyy-mm-dd).")
-            return
         try:
-            amount = float(amount)
-            if amount <= 0:
-                messagebox.showerror("خطا", "مبلغ هدف باید مثبت باشد.")
-                return
-        except ValueError:
-            messagebox.showerror("خطا", "مبلغ نامعتبر است.")
-            return
-        goal = {
-            "id": generate_id(self.goals),
-            "name": name,
-            "target_amount": amount,
-            "current_amount": 0.0,
-            "deadline": deadline
-        }
-        self.goals.append(goal)
-        save_data(self.goals, GOALS_FILE)
+            self.service.add_goal(self.goal_name_entry.get(), self.goal_amount_entry.get(), self.goal_deadline_entry.get())
+        except LedgerError as e:
+            messagebox.showerror("خطا", str(e))
+            return
         self.goal_name_entry.delete(0, tk.END)
         self.goal_amount_entry.delete(0, tk.END)
         self.goal_deadline_entry.delete(0, tk.END)
         self.update_goals_list()
+        self.schedule_goal_check()
         messagebox.showinfo("موفقیت", "هدف مالی با موفقیت اضافه شد!")
         self.show_goals()
 
+    @timed("update_goals_list")
     def update_goals_list(self):
         if hasattr(self, 'tree'):
             for item in self.tree.get_children():
                 self.tree.delete(item)
-            today = datetime.now().date()
+            # پیشرفت و مهلت تجزیه‌شده هر هدف از GoalEngine خوانده می‌شود
+            engine = self.service.goal_engine
+            today = date.today().toordinal()
             for g in self.goals:
-                progress = (g["current_amount"] / g["target_amount"]) * 100 if g["target_amount"] > 0 else 0
-                deadline = datetime.strptime(g["deadline"], "%Y-%m-%d").date()
-                days_left = (deadline - today).days
-                status = "در حال انجام" if days_left > 7 else "مهلت نزدیک!" if days_left > 0 else "منقضی"
-                tag = "near_deadline" if days_left <= 7 and days_left > 0 else ""
+                progress = engine.progress[g["id"]]
+                status = engine.status(g["id"], today)
+                tag = "near_deadline" if status == "near" else ""
+                status = GOAL_STATUS_TEXT[status]
                 # افزودن جداکننده سه‌رقمی به مبلغ هدف
                 self.tree.insert("", tk.END, values=(
                     g["id"],
                     g["name"],
-                    f"{g['target_amount']:,.2f} تومان",
+                    f"{format_money(g['target_amount'])} تومان",
                     f"{progress:.1f}%",
                     g["deadline"],
                     status
                 ), tags=(tag,))
 
+    def show_allocation_plan(self):
+        source = "balance" if self.allocate_source.get() == "موجودی" else "savings"
+        plan = self.service.plan_allocation(source)
+        if not plan:
+            messagebox.showinfo("پیشنهاد تخصیص", "مبلغی برای تخصیص یا هدف ناتمامی وجود ندارد.")
+            return
+        lines = [f"{goal['name']} (مهلت {goal['deadline']}): {format_money(amount)} تومان" for goal, amount in plan]
+        messagebox.showinfo("پیشنهاد تخصیص", "\n".join(lines))
+
     def allocate_to_goal(self):
         selected = self.tree.selection()
         if not selected:
             messagebox.showerror("خطا", "لطفاً یک هدف انتخاب کنید.")
             return
         amount = self.allocate_amount_entry.get()
-        source = self.allocate_source.get()
+        source = "balance" if self.allocate_source.get() == "موجودی" else "savings"
+        gid = int(self.tree.item(selected)["values"][0])
         try:
-            amount = float(amount)
-            if amount <= 0:
-                messagebox.showerror("خطا", "مبلغ تخصیص باید مثبت باشد.")
-                return
-        except ValueError:
-            messagebox.showerror("خطا", "مبلغ نامعتبر است.")
+            expense = self.service.allocate_to_goal(gid, amount, source)
+        except LedgerError as e:
+            messagebox.showerror("خطا", str(e))
             return
-        tid = int(self.tree.item(selected)["values"][0])
-        for g in self.goals:
-            if g["id"] == tid:
-                if g["current_amount"] + amount > g["target_amount"]:
-                    messagebox.showerror("خطا", "مبلغ تخصیص بیش از مبلغ هدف است.")
-                    return
-                if source == "موجودی":
-                    balance = sum(t["amount"] for t in self.data if t["type"] == "income") - sum(t["amount"] for t in self.data if t["type"] == "expense") - sum(t["amount"] for t in self.savings)
-                    if amount > balance:
-                        messagebox.showerror("خطا", "موجودی کافی نیست.")
-                        return
-                    expense = {
-                        "id": generate_id(self.data),
-                        "date": datetime.now().strftime("%Y-%m-%d"),
-                        "type": "expense",
-                        "amount": amount,
-                        "category": f"هدف: {g['name']}",
-                        "description": f"تخصیص به هدف {g['name']}"
-                    }
-                    self.data.append(expense)
-                else:  # پس‌انداز
-                    total_savings = sum(t["amount"] for t in self.savings)
-                    if amount > total_savings:
-                        messagebox.showerror("خطا", "پس‌انداز کافی نیست.")
-                        return
-                    remaining_amount = amount
-                    new_savings = []
-                    for s in self.savings:
-                        if remaining_amount >= s["amount"]:
-                            remaining_amount -= s["amount"]
-                        else:
-                            s["amount"] -= remaining_amount
-                            new_savings.append(s)
-                            remaining_amount = 0
-                        if remaining_amount <= 0:
-                            new_savings.extend(self.savings[self.savings.index(s)+1:])
-                            break
-                    self.savings = new_savings
-                    expense = {
-                        "id": generate_id(self.data),
-                        "date": datetime.now().strftime("%Y-%m-%d"),
-                        "type": "expense",
-                        "amount": amount,
-                        "category": f"هدف: {g['name']}",
-                        "description": f"تخصیص از پس‌انداز به هدف {g['name']}"
-                    }
-                    self.data.append(expense)
-                g["current_amount"] += amount
-                save_data(self.data, DATA_FILE)
-                save_data(self.savings, SAVINGS_FILE)
-                save_data(self.goals, GOALS_FILE)
-                self.allocate_amount_entry.delete(0, tk.END)
-                self.update_goals_list()
-                messagebox.showinfo("موفقیت", f"{amount:,.2f} تومان به هدف {g['name']} تخصیص یافت.")
-                return
-        messagebox.showerror("خطا", "هدف پیدا نشد.")
+        self.dirty_ids.add(expense["id"])
+        self.allocate_amount_entry.delete(0, tk.END)
+        self.update_goals_list()
+        self.schedule_goal_check()
+        messagebox.showinfo("موفقیت", f"{format_money(expense['amount'])} تومان به هدف {self.goals.get(gid)['name']} تخصیص یافت.")
 
     def show_savings(self):
         self.clear_frame()
-        savings = sum(t["amount"] for t in self.savings)
-        balance = sum(t["amount"] for t in self.data if t["type"] == "income") - sum(t["amount"] for t in self.data if t["type"] == "expense") - savings
+        savings = self.totals.savings
+        balance = self.totals.balance
         ttk.Label(self.current_frame, text="مدیریت پس‌انداز", font=("B Nazanin", 22, "bold"), bootstyle=SUCCESS).grid(row=0, column=0, columnspan=2, pady=20)
         # افزودن جداکننده سه‌رقمی به مبالغ
-        ttk.Label(self.current_frame, text=f"موجودی پس‌انداز (تومان): {savings:,.2f}", font=("B Nazanin", 16), bootstyle=INFO).grid(row=1, column=0, columnspan=2, pady=10)
-        ttk.Label(self.current_frame, text=f"مانده حساب (تومان): {balance:,.2f}", font=("B Nazanin", 16), bootstyle=WARNING).grid(row=2, column=0, columnspan=2, pady=10)
+        ttk.Label(self.current_frame, text=f"موجودی پس‌انداز (تومان): {format_money(savings)}", font=("B Nazanin", 16), bootstyle=INFO).grid(row=1, column=0, columnspan=2, pady=10)
+        ttk.Label(self.current_frame, text=f"مانده حساب (تومان): {format_money(balance)}", font=("B Nazanin", 16), bootstyle=WARNING).grid(row=2, column=0, columnspan=2, pady=10)
         ttk.Label(self.current_frame, text="مبلغ پس‌انداز (تومان):").grid(row=3, column=0, sticky=tk.E, padx=5)
         self.savings_amount_entry = ttk.Entry(self.current_frame, bootstyle=SUCCESS)
         self.savings_amount_entry.grid(row=3, column=1, pady=5)
@@ -459,91 +1139,78 @@ class FinanceManagerApp:
         self.release_amount_entry = ttk.Entry(self.current_frame, bootstyle=SUCCESS)
         self.release_amount_entry.grid(row=5, column=1, pady=5)
         ttk.Button(self.current_frame, text="رها‌سازی", command=self.release_savings, bootstyle=WARNING).grid(row=6, column=0, columnspan=2, pady=10)
-        ttk.Button(self.current_frame, text="بازگشت", command=self.show_main_menu, bootstyle=(INFO, OUTLINE)).grid(row=7, column=0, columnspan=2, pady=10)
+        ttk.Button(self.current_frame, text="خروجی پس‌اندازها", command=lambda: self.export("savings"), bootstyle=(SUCCESS, OUTLINE)).grid(row=7, column=0, columnspan=2, pady=5)
+        ttk.Button(self.current_frame, text="بازگشت", command=self.show_main_menu, bootstyle=(INFO, OUTLINE)).grid(row=8, column=0, columnspan=2, pady=10)
 
     def add_savings(self):
-        amount = self.savings_amount_entry.get()
         try:
-            amount = float(amount)
-            if amount <= 0:
-                messagebox.showerror("خطا", "مبلغ پس‌انداز باید مثبت باشد.")
-                return
-            balance = sum(t["amount"] for t in self.data if t["type"] == "income") - sum(t["amount"] for t in self.data if t["type"] == "expense") - sum(t["amount"] for t in self.savings)
-            if amount > balance:
-                messagebox.showerror("خطا", "موجودی کافی نیست.")
-                return
-            savings_data = {
-                "id": generate_id(self.savings),
-                "amount": amount,
-                "date": datetime.now().strftime("%Y-%m-%d")
-            }
-            self.savings.append(savings_data)
-            save_data(self.savings, SAVINGS_FILE)
-            self.savings_amount_entry.delete(0, tk.END)
-            messagebox.showinfo("موفقیت", f"{amount:,.2f} تومان به پس‌انداز اضافه شد.")
-            self.show_savings()
-        except ValueError:
-            messagebox.showerror("خطا", "مبلغ نامعتبر است.")
+            savings_data = self.service.add_savings(self.savings_amount_entry.get())
+        except LedgerError as e:
+            messagebox.showerror("خطا", str(e))
+            return
+        self.savings_amount_entry.delete(0, tk.END)
+        messagebox.showinfo("موفقیت", f"{format_money(savings_data['amount'])} تومان به پس‌انداز اضافه شد.")
+        self.show_savings()
 
     def release_savings(self):
-        amount = self.release_amount_entry.get()
-       
-        amount = float(amount)
-        if amount <= 0:
-                messagebox.showerror("خطا", "مبلغ باید مثبت باشد.")
-                return
-        total_savings = sum(t["amount"] for t in self.savings)
-        if amount > total_savings:
-                messagebox.showerror("خطا", "مبلغ رها‌سازی بیش از پس‌انداز است.")
-                return
-        income_entry = {
-                "id": generate_id(self.data),
-                "date": datetime.now().strftime("%Y-%m-%d"),
-                "type": "income",
-                "amount": amount,
-                "category": "رها‌سازی پس‌انداز",
-                "description": f"رها‌سازی {amount:,.2f} تومان از پس‌انداز"
-            }
-        self.data.append(income_entry)
-        remaining_amount = amount
-        new_savings = []
-        for s in self.savings:
-                if remaining_amount >= s["amount"]:
-                    remaining_amount -= s["amount"]
-                else:
-                    s["amount"] -= remaining_amount
-                    new_savings.append(s)
-                    remaining_amount = 0
-                if remaining_amount <= 0:
-                    new_savings.extend(self.savings[self.savings.index(s)+1:])
-                    break
-        self.savings = new_savings
-        save_data(self.data, DATA_FILE)
-        save_data(self.savings, SAVINGS_FILE)
+        try:
+            income_entry = self.service.release_savings(self.release_amount_entry.get())
+        except LedgerError as e:
+            messagebox.showerror("خطا", str(e))
+            return
+        self.dirty_ids.add(income_entry["id"])
         self.release_amount_entry.delete(0, tk.END)
-        messagebox.showinfo("موفقیت", f"{amount:,.2f} تومان از پس‌انداز رها شد و به حساب اضافه شد.")
+        messagebox.showinfo("موفقیت", f"{format_money(income_entry['amount'])} تومان از پس‌انداز رها شد و به حساب اضافه شد.")
         self.show_savings()
 
+    def show_diagnostics(self):
+        self.pending_screen = None
+        self.clear_frame()
+        ttk.Label(self.current_frame, text="سنجش کارایی", font=("B Nazanin", 18, "bold"), bootstyle=SUCCESS).grid(row=0, column=0, columnspan=4, pady=10)
+        if not PROFILE:
+            ttk.Label(self.current_frame, text="سنجش غیرفعال است؛ برنامه را با FINANCE_PROFILE=1 اجرا کنید.", bootstyle=SECONDARY).grid(row=1, column=0, columnspan=4, pady=10)
+            ttk.Button(self.current_frame, text="بازگشت", command=self.show_main_menu, bootstyle=(INFO, OUTLINE)).grid(row=2, column=0, columnspan=4, pady=10)
+            return
+        self.metrics_tree = ttk.Treeview(self.current_frame, columns=("Name", "Count", "Mean", "P50", "P95", "Max"), show="headings", height=12, bootstyle=SUCCESS)
+        for column, text, width in (("Name", "عملیات", 180), ("Count", "تعداد", 70), ("Mean", "میانگین (ms)", 100),
+                                    ("P50", "میانه (ms)", 90), ("P95", "صدک ۹۵ (ms)", 90), ("Max", "بیشینه (ms)", 90)):
+            self.metrics_tree.heading(column, text=text)
+            self.metrics_tree.column(column, width=width)
+        self.metrics_tree.grid(row=1, column=0, columnspan=4, pady=10)
+        self.counters_label = ttk.Label(self.current_frame, text="", font=("B Nazanin", 11), justify=tk.RIGHT)
+        self.counters_label.grid(row=2, column=0, columnspan=4, pady=5)
+        ttk.Button(self.current_frame, text="به‌روزرسانی", command=self.update_diagnostics, bootstyle=SUCCESS).grid(row=3, column=0, padx=5, pady=10)
+        ttk.Button(self.current_frame, text="ذخیره در فایل", command=self.save_metrics, bootstyle=INFO).grid(row=3, column=1, padx=5, pady=10)
+        ttk.Button(self.current_frame, text="صفر کردن", command=self.reset_metrics, bootstyle=(DANGER, OUTLINE)).grid(row=3, column=2, padx=5, pady=10)
+        ttk.Button(self.current_frame, text="بازگشت", command=self.show_main_menu, bootstyle=(INFO, OUTLINE)).grid(row=3, column=3, padx=5, pady=10)
+        self.update_diagnostics()
+
+    def update_diagnostics(self):
+        snapshot = METRICS.snapshot()
+        for item in self.metrics_tree.get_children():
+            self.metrics_tree.delete(item)
+        for name, timing in sorted(snapshot["timings"].items()):
+            self.metrics_tree.insert("", tk.END, values=(name, timing["count"], f"{timing['mean_ms']:.2f}", f"{timing['p50_ms']:.2f}",
+                                                         f"{timing['p95_ms']:.2f}", f"{timing['max_ms']:.2f}"))
+        counters = snapshot["counters"]
+        self.counters_label.config(text="\n".join(f"{name}: {value:,}" for name, value in sorted(counters.items())) or "شمارنده‌ای ثبت نشده است.")
+
+    def save_metrics(self):
+        try:
+            METRICS.dump()
+        except OSError as e:
+            messagebox.showerror("خطا", f"ذخیره معیارها ممکن نشد: {e}")
+            return
+        messagebox.showinfo("موفقیت", f"معیارها در {METRICS_FILE} ذخیره شد.")
+
+    def reset_metrics(self):
+        METRICS.reset()
+        self.update_diagnostics()
+
     def show_delete_transaction(self):
         self.clear_frame()
         ttk.Label(self.current_frame, text="حذف تراکنش", font=("B Nazanin", 18, "bold"), bootstyle=SUCCESS).grid(row=0, column=0, pady=10)
-        self.tree = ttk.Treeview(self.current_frame, columns=("ID", "Date", "Type", "Amount", "Category", "Description"), show="headings", bootstyle=SUCCESS)
-        self.tree.heading("ID", text="شناسه")
-        self.tree.heading("Date", text="تاریخ")
-        self.tree.heading("Type", text="نوع")
-        self.tree.heading("Amount", text="مبلغ (تومان)")
-        self.tree.heading("Category", text="دسته‌بندی")
-        self.tree.heading("Description", text="توضیحات")
-        self.tree.column("ID", width=50)
-        self.tree.column("Date", width=100)
-        self.tree.column("Type", width=80)
-        self.tree.column("Amount", width=120)
-        self.tree.column("Category", width=100)
-        self.tree.column("Description", width=150)
-        self.tree.grid(row=1, column=0, pady=10)
-        self.tree.tag_configure("income", background="#28a745", foreground="white")
-        self.tree.tag_configure("expense", background="#dc3545", foreground="white")
-        self.update_transaction_list()
+        self.create_transaction_list()
         ttk.Button(self.current_frame, text="حذف", command=self.delete_transaction, bootstyle=DANGER).grid(row=2, column=0, pady=5)
         ttk.Button(self.current_frame, text="بازگشت", command=self.show_main_menu, bootstyle=(INFO, OUTLINE)).grid(row=3, column=0, pady=5)
 
@@ -553,12 +1220,24 @@ class FinanceManagerApp:
             messagebox.showerror("خطا", "لطفاً یک تراکنش انتخاب کنید.")
             return
         tid = int(self.tree.item(selected)["values"][0])
-        self.data = [t for t in self.data if t["id"] != tid]
-        save_data(self.data, DATA_FILE)
+        try:
+            self.service.delete_transaction(tid)
+        except LedgerError as e:
+            messagebox.showerror("خطا", str(e))
+            return
+        self.dirty_ids.add(tid)
         self.update_transaction_list()
-        messagebox.showinfo("موفقیت", "تراکنش حذف شد.")
+        messagebox.showinfo("موفقیت", "تراکنش حذف شد. (واگرد: Ctrl+Z)")
 
-if __name__ == "__main__":
+def main(argv=None):
+    # با هر آرگومانی فرمان خط فرمان اجرا می‌شود و پنجره ساخته نمی‌شود
+    argv = sys.argv[1:] if argv is None else argv
+    if argv:
+        return cli(argv)
     root = ttk.Window(title="مدیریت مالی", themename="darkly")
     app = FinanceManagerApp(root)
     root.mainloop()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
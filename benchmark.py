@@ -0,0 +1,219 @@
+
+# سنجش کارایی با دفتر مصنوعی: فایل‌های داده با همان قالب برنامه در یک پوشه موقت ساخته می‌شوند و
+# زمان عملیات اصلی برای هر اندازه به صورت JSON گزارش می‌شود تا نسخه‌ها با هم مقایسه شوند.
+#   python benchmark.py --sizes 10000 100000 --output results.json
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+import finance_core
+from finance_core import (DATA_FILE, FORMAT_VERSION, GOALS_FILE, META_FILE, MONEY_SCALE, SAVINGS_FILE, JsonStorage,
+                          LedgerAggregator, LedgerService, LedgerTotals, format_money, load_data, save_data, write_meta)
+
+START_DATE = date(2015, 1, 1).toordinal()
+WORDS = ("خرید", "نان", "شیر", "اجاره", "حقوق", "قبض", "برق", "گاز", "تاکسی", "رستوران", "کتاب", "هدیه")
+
+def generate_ledger(directory, size, categories=20, category_skew=1.1, lots=1000, lot_min=10000, lot_max=5000000,
+                    lot_distribution="uniform", days=3650, seed=0):
+    # تراکنش‌ها یکی‌یکی در فایل نوشته می‌شوند تا ساخت ۱۰ میلیون رکورد هم حافظه ثابت داشته باشد.
+    # مبالغ مانند برنامه به صدم تومان‌اند
+    rng = random.Random(seed)
+    names = [f"دسته {i + 1}" for i in range(categories)]
+    # توزیع Zipf: دسته با رتبه r وزن 1 / r^skew دارد
+    weights = [1 / (rank + 1) ** category_skew for rank in range(categories)]
+    cumulative = []
+    total = 0.0
+    for weight in weights:
+        total += weight
+        cumulative.append(total)
+    income = 0
+    with open(os.path.join(directory, DATA_FILE), "w", encoding="utf-8") as f:
+        f.write("[\n")
+        for tid in range(1, size + 1):
+            is_income = rng.random() < 0.3
+            amount = round(rng.uniform(1000, 10000000 if is_income else 2000000) * MONEY_SCALE)
+            if is_income:
+                income += amount
+            record = {
+                "id": tid,
+                "date": date.fromordinal(START_DATE + rng.randrange(days)).isoformat(),
+                "type": "income" if is_income else "expense",
+                "amount": amount,
+                "category": rng.choices(names, cum_weights=cumulative)[0],
+                "description": " ".join(rng.sample(WORDS, 2))
+            }
+            f.write(json.dumps(record, ensure_ascii=False))
+            f.write(",\n" if tid < size else "\n")
+        f.write("]")
+    savings = []
+    for sid in range(1, lots + 1):
+        if lot_distribution == "exponential":
+            amount = min(lot_max, lot_min + rng.expovariate(1 / ((lot_max - lot_min) / 10)))
+        else:
+            amount = rng.uniform(lot_min, lot_max)
+        savings.append({"id": sid, "amount": round(amount * MONEY_SCALE), "date": date.fromordinal(START_DATE + rng.randrange(days)).isoformat()})
+    goals = [{"id": gid, "name": f"هدف {gid}", "target_amount": 10000000 * MONEY_SCALE, "current_amount": 0,
+              "deadline": date.fromordinal(START_DATE + days + rng.randrange(365)).isoformat()} for gid in range(1, 11)]
+    save_data(savings, os.path.join(directory, SAVINGS_FILE))
+    save_data(goals, os.path.join(directory, GOALS_FILE))
+    write_meta({"format": FORMAT_VERSION}, os.path.join(directory, META_FILE))
+
+def measure(fn, repeat=1):
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - started)
+    return {"seconds": min(runs), "median": statistics.median(runs), "runs": runs}
+
+def per_op(result, count):
+    result["ops"] = count
+    result["per_op_ms"] = result["seconds"] / count * 1000
+    return result
+
+def ensure_display():
+    # بدون DISPLAY در صورت وجود Xvfb یک نمایشگر مجازی راه‌اندازی می‌شود
+    if os.environ.get("DISPLAY") or sys.platform in ("win32", "darwin"):
+        return None
+    if shutil.which("Xvfb") is None:
+        return None
+    display = ":%d" % (90 + os.getpid() % 100)
+    process = subprocess.Popen(["Xvfb", display, "-screen", "0", "1280x1024x24"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    time.sleep(0.5)
+    os.environ["DISPLAY"] = display
+    return process
+
+def load_gui():
+    spec = importlib.util.spec_from_file_location("finance_gui", os.path.join(HERE, "Financial management.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def bench_render(service, repeat):
+    # رسم فهرست مجازی تراکنش‌ها و به‌روزرسانی پس از ویرایش، مانند update_transaction_list
+    try:
+        gui = load_gui()
+        root = gui.tk.Tk()
+    except Exception as e:
+        return {"skipped": str(e)}
+    try:
+        root.withdraw()
+        rows = {}
+        def formatter(t):
+            row = rows.get(t["id"])
+            if row is None:
+                row = rows[t["id"]] = gui.format_transaction(t)
+            return row
+        view = gui.VirtualTransactionList(root, lambda: service.data.slots, service.data.get, formatter)
+        results = {"initial": measure(lambda: (rows.clear(), view.refresh(), root.update_idletasks()), repeat)}
+        results["scroll"] = measure(lambda: (view.scroll_to(view.offset + len(service.data) // 7), root.update_idletasks()), repeat)
+        visible = [int(iid) for iid in view.tree.get_children()]
+        def reconcile():
+            for tid in visible:
+                rows.pop(tid, None)
+            view.reconcile(visible)
+            root.update_idletasks()
+        results["reconcile"] = measure(reconcile, repeat)
+        return results
+    finally:
+        root.destroy()
+
+def run_size(size, args):
+    directory = tempfile.mkdtemp(prefix="finance-bench-")
+    cwd = os.getcwd()
+    results = {}
+    try:
+        started = time.perf_counter()
+        generate_ledger(directory, size, args.categories, args.category_skew, args.lots, args.lot_min, args.lot_max,
+                        args.lot_distribution, seed=args.seed)
+        results["generate"] = {"seconds": time.perf_counter() - started, "bytes": os.path.getsize(os.path.join(directory, DATA_FILE))}
+        os.chdir(directory)
+        loaded = {}
+        def load():
+            loaded["records"] = load_data(DATA_FILE)
+        results["load_data"] = measure(load, args.repeat)
+        results["save_data"] = measure(lambda: save_data(loaded["records"], DATA_FILE + ".bench"), args.repeat)
+        del loaded["records"]
+        os.remove(DATA_FILE + ".bench")
+        def load_columnar():
+            loaded["service"] = LedgerService(JsonStorage())
+        results["load_columnar"] = measure(load_columnar, args.repeat)
+        service = loaded["service"]
+        results["summary"] = measure(lambda: LedgerTotals(service.data, service.savings), args.repeat)
+        aggregator = LedgerAggregator(service.data)
+        results["monthly_first"] = measure(lambda: aggregator.summarize("month"))
+        results["monthly_cached"] = measure(lambda: aggregator.summarize("month"), args.repeat)
+        rng = random.Random(args.seed)
+        ids = rng.sample(range(1, size + 1), min(args.ops, size))
+        results["render"] = bench_render(service, args.repeat) if not args.no_tk else {"skipped": "--no-tk"}
+        results["edit_by_id"] = per_op(measure(lambda: [service.edit_transaction(tid, amount=str(rng.uniform(1000, 100000)))
+                                                        for tid in ids]), len(ids))
+        results["delete_by_id"] = per_op(measure(lambda: [service.delete_transaction(tid) for tid in ids]), len(ids))
+        drains = min(args.ops, args.lots)
+        amount = format_money(service.totals.savings // (drains * 2), grouping=False) if drains else "0"
+        results["savings_drawdown"] = per_op(measure(lambda: [service.release_savings(amount) for _ in range(drains)]), max(drains, 1))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="سنجش کارایی مدیریت مالی با دفتر مصنوعی")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000], help="تعداد تراکنش‌ها (۱۰ هزار تا ۱۰ میلیون)")
+    parser.add_argument("--categories", type=int, default=20)
+    parser.add_argument("--category-skew", type=float, default=1.1, help="توان توزیع Zipf دسته‌ها (0 = یکنواخت)")
+    parser.add_argument("--lots", type=int, default=1000, help="تعداد پس‌اندازها")
+    parser.add_argument("--lot-min", type=float, default=10000)
+    parser.add_argument("--lot-max", type=float, default=5000000)
+    parser.add_argument("--lot-distribution", choices=("uniform", "exponential"), default="uniform")
+    parser.add_argument("--ops", type=int, default=200, help="تعداد ویرایش، حذف و برداشت")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-tk", action="store_true", help="بدون سنجش رسم جدول")
+    parser.add_argument("--output", default="-", help="فایل JSON نتایج یا - برای خروجی استاندارد")
+    args = parser.parse_args(argv)
+    display = None if args.no_tk else ensure_display()
+    try:
+        report = {
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": finance_core.np is not None,
+            "parameters": {key: value for key, value in vars(args).items() if key != "output"},
+            "results": {}
+        }
+        for size in args.sizes:
+            print(f"{size:,} تراکنش...", file=sys.stderr)
+            report["results"][str(size)] = run_size(size, args)
+    finally:
+        if display is not None:
+            display.terminate()
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output == "-":
+        print(output)
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
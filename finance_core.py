@@ -0,0 +1,3018 @@
+
+# هسته مدیریت مالی بدون رابط کاربری: ذخیره‌سازی، ساختار داده‌ها، ورود و خروج گروهی و LedgerService.
+# برنامه گرافیکی و خط فرمان هر دو از همین ماژول استفاده می‌کنند
+import argparse
+import bisect
+import csv
+import hashlib
+import heapq
+import json
+import math
+import os
+import queue
+import re
+import sqlite3
+import sys
+import threading
+import time
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from decimal import ROUND_HALF_UP, Decimal, DecimalException
+from functools import lru_cache, wraps
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+DATA_FILE = "finance_data.json"
+SAVINGS_FILE = "savings_data.json"
+GOALS_FILE = "goals_data.json"
+HISTORY_FILE = "finance_history.json"
+JOURNAL_FILE = "finance_journal.jsonl"
+DB_FILE = "finance_data.db"
+# نوع ذخیره‌سازی: "json" (پیش‌فرض) یا "sqlite"
+STORAGE_BACKEND = os.environ.get("FINANCE_STORAGE", "json")
+# وقتی ژورنال به این تعداد عملیات یا این حجم (بایت) برسد فایل‌های اصلی بازنویسی و ژورنال خالی می‌شود؛
+# یک خط ژورنال می‌تواند دسته‌ای از هزاران عملیات باشد (ورود گروهی)، پس تعداد خطوط معیار مناسبی نیست
+COMPACT_THRESHOLD_OPS = 5000
+COMPACT_THRESHOLD_BYTES = 2 << 20
+# حجم انتهای ژورنال که پس از فشرده‌سازی نگه داشته می‌شود تا برنامه‌های دیگری که هنوز آن را نخوانده‌اند
+# بدون بارگذاری دوباره ادامه دهند؛ خطی که در این حجم جا نشود نگه داشته نمی‌شود
+COMPACT_KEEP_BYTES = 64 << 10
+# چند برنامه می‌توانند هم‌زمان از یک پوشه داده استفاده کنند: بیشترین انتظار برای قفل فایل (ثانیه)
+# و تعداد شناسه‌ای که هر بار در ژورنال رزرو می‌شود تا برنامه‌ها شناسه تکراری نسازند
+LOCK_TIMEOUT = 30
+ID_BLOCK = 64
+# تاریخچه واگرد: بیشترین تعداد عمل نگه‌داشته‌شده و بیشترین تعداد کل تغییرات آن‌ها؛ با رسیدن به هر کدام قدیمی‌ترین عمل حذف می‌شود
+UNDO_LIMIT = 100
+UNDO_MAX_OPS = 10000
+# با FINANCE_VERIFY_TOTALS=1 جمع‌ها پس از هر تغییر از نو محاسبه و مقایسه می‌شوند
+VERIFY_TOTALS = os.environ.get("FINANCE_VERIFY_TOTALS") == "1"
+# ورود گروهی: تعداد سطر هر تکه برای پردازش موازی، تعداد رکورد هر ثبت و حداکثر خطاهای نگه‌داشته‌شده
+IMPORT_CHUNK_LINES = 2000
+IMPORT_BATCH_SIZE = 5000
+IMPORT_ERROR_LIMIT = 20
+# نام‌های پذیرفته‌شده برای نوع تراکنش
+TYPE_NAMES = {"income": "income", "expense": "expense", "درآمد": "income", "هزینه": "expense"}
+# با FINANCE_PROFILE=1 زمان عملیات اصلی، حجم نوشته‌شده و تعداد ردیف‌ها ثبت و در METRICS_FILE نوشته می‌شود
+PROFILE = os.environ.get("FINANCE_PROFILE") == "1"
+METRICS_FILE = os.environ.get("FINANCE_METRICS_FILE", "finance_metrics.json")
+# هدفی که تا مهلتش این تعداد روز یا کمتر مانده باشد «مهلت نزدیک» است
+NEAR_DEADLINE_DAYS = 7
+# خروجی: تعداد ردیفی که هر بار روی فایل نوشته می‌شود
+EXPORT_CHUNK_ROWS = 5000
+REPORT_FIELDS = ("month", "income", "expense", "net", "count")
+# مبالغ به صورت عدد صحیح به صدم تومان ذخیره و جمع می‌شوند؛ بزرگ‌ترین مبلغ قابل ثبت (به همین واحد)
+MONEY_SCALE = 100
+MAX_AMOUNT = 10 ** 15
+MONEY_FIELDS = {DATA_FILE: ("amount",), SAVINGS_FILE: ("amount",), GOALS_FILE: ("target_amount", "current_amount")}
+# نسخه قالب داده‌ها (۲: مبالغ عدد صحیح)؛ در JSON در META_FILE و در SQLite در PRAGMA user_version ثبت می‌شود
+FORMAT_VERSION = 2
+META_FILE = "finance_meta.json"
+# رکوردهایی که هنگام ارتقای قالب مبلغ معتبر ندارند (مثلاً NaN) کنار گذاشته و در این فایل نگه داشته می‌شوند
+QUARANTINE_FILE = "finance_quarantine.json"
+# SQLite: تعداد ردیف هر صفحه از پرس‌وجوی تراکنش‌ها و تعداد صفحه‌های نگه‌داشته‌شده هر پرس‌وجو، و تعداد آخرین
+# تغییراتی که در جدول changes برای برنامه‌های دیگر نگه داشته می‌شود
+SQL_PAGE_ROWS = 200
+SQL_PAGE_CACHE = 16
+CHANGE_LOG_KEEP = 20000
+
+class LedgerError(Exception):
+    # خطای عملیات مالی؛ پیام آن فارسی و قابل نمایش به کاربر است
+    pass
+
+class ValidationError(LedgerError, ValueError):
+    pass
+
+class NotFoundError(LedgerError):
+    pass
+
+class InsufficientFundsError(LedgerError):
+    pass
+
+class StorageError(LedgerError):
+    pass
+
+class Metrics:
+    # هیستوگرام زمان‌ها (میلی‌ثانیه) و شمارنده‌ها؛ رشته ذخیره‌سازی هم در آن می‌نویسد، پس با قفل محافظت می‌شود
+    BUCKETS = (0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000, 5000, math.inf)
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.timings = {}
+            self.counters = {}
+            self.started_at = time.time()
+
+    def observe(self, name, ms):
+        with self.lock:
+            timing = self.timings.get(name)
+            if timing is None:
+                timing = self.timings[name] = {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "buckets": [0] * len(self.BUCKETS)}
+            timing["count"] += 1
+            timing["total_ms"] += ms
+            timing["max_ms"] = max(timing["max_ms"], ms)
+            timing["buckets"][bisect.bisect_left(self.BUCKETS, ms)] += 1
+
+    def add(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def percentile(self, timing, q):
+        # مرز بالای سطلی که صدک q در آن است (بیشینه برای سطل آخر)
+        target = q * timing["count"]
+        seen = 0
+        for bound, count in zip(self.BUCKETS, timing["buckets"]):
+            seen += count
+            if seen >= target:
+                return timing["max_ms"] if math.isinf(bound) else min(bound, timing["max_ms"])
+        return timing["max_ms"]
+
+    def snapshot(self):
+        with self.lock:
+            timings = {}
+            for name, timing in self.timings.items():
+                timings[name] = {
+                    "count": timing["count"],
+                    "mean_ms": timing["total_ms"] / timing["count"],
+                    "p50_ms": self.percentile(timing, 0.5),
+                    "p95_ms": self.percentile(timing, 0.95),
+                    "max_ms": timing["max_ms"],
+                    "buckets": {("inf" if math.isinf(bound) else str(bound)): count for bound, count in zip(self.BUCKETS, timing["buckets"])}
+                }
+            return {"since": self.started_at, "at": time.time(), "timings": timings, "counters": dict(self.counters)}
+
+    def dump(self, file_path=METRICS_FILE):
+        write_atomic(file_path, json.dumps(self.snapshot(), indent=2, ensure_ascii=False))
+
+METRICS = Metrics()
+
+def timed(name):
+    # اندازه‌گیری زمان تابع در METRICS؛ وقتی سنجش خاموش است خود تابع بدون پوشش برگردانده می‌شود
+    def decorate(fn):
+        if not PROFILE:
+            return fn
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                METRICS.observe(name, (time.perf_counter() - started) * 1000)
+        return wrapper
+    return decorate
+
+def lock_file(fd, timeout=LOCK_TIMEOUT):
+    # قفل انحصاری توصیه‌ای؛ flock در لینوکس و مک منتظر می‌ماند و به ترتیب درخواست قفل را می‌دهد.
+    # در ویندوز LK_LOCK ده بار با فاصله یک ثانیه تلاش می‌کند و تا timeout تکرار می‌شود
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        return
+    if msvcrt is None:
+        return
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            if time.monotonic() >= deadline:
+                raise StorageError("فایل‌های داده در اختیار برنامه دیگری است؛ کمی بعد دوباره تلاش کنید.")
+
+def unlock_file(fd):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    elif msvcrt is not None:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+class FileLock:
+    # قفل بین برنامه‌ها روی یک فایل جانبی؛ در یک برنامه بین رشته‌ها هم کار می‌کند و تودرتو قابل استفاده است
+    def __init__(self, path):
+        self.path = path
+        self.mutex = threading.RLock()
+        self.depth = 0
+        self.fd = None
+
+    def __enter__(self):
+        self.mutex.acquire()
+        if self.depth == 0:
+            try:
+                self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                try:
+                    lock_file(self.fd)
+                except BaseException:
+                    os.close(self.fd)
+                    raise
+            except BaseException:
+                self.mutex.release()
+                raise
+        self.depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        self.depth -= 1
+        if self.depth == 0:
+            try:
+                unlock_file(self.fd)
+            finally:
+                os.close(self.fd)
+                self.fd = None
+        self.mutex.release()
+
+class Journal:
+    # ژورنال فقط-افزودنی: هر خط یک عملیات insert/update/delete روی یکی از فایل‌ها
+    # یا یک دسته (batch) از عملیات که با هم و به صورت اتمی ثبت می‌شوند.
+    # هر خط شماره ترتیب (seq) دارد و offset تا جایی است که خوانده شده، پس خطوطی که برنامه‌های دیگر
+    # اضافه می‌کنند بدون خواندن دوباره کل فایل پیدا می‌شوند. ops تعداد عملیات پس از آخرین خط base و base_end
+    # جای پایان آن خط است؛ خطوط پیش از آن در فایل‌های اصلی آمده‌اند. خواندن و نوشتن باید با قفل JsonStorage باشد
+    def __init__(self, path):
+        self.path = path
+        self.ops = 0
+        self.base_end = 0
+        self.seq = 0
+        self.offset = 0
+        self.signature = None
+        # عملیات موجود هنگام باز کردن به تفکیک فایل؛ هر فایل یک بار با entries خوانده می‌شود
+        self.loaded = {}
+
+    def open(self):
+        if os.path.exists(self.path):
+            with open(self.path, "rb+") as f:
+                content = f.read()
+                if content and not content.endswith(b"\n"):
+                    # حذف خط ناقص انتهای ژورنال (قطع برنامه هنگام نوشتن)
+                    f.truncate(content.rfind(b"\n") + 1)
+        ops, _ = self.read_tail()
+        for file_path, op, record in ops:
+            self.loaded.setdefault(file_path, []).append({"file": file_path, "op": op, "record": record})
+        return ops
+
+    def stat(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def changed(self):
+        # بررسی ارزان: اندازه، زمان تغییر یا خود فایل (پس از فشرده‌سازی) عوض شده است
+        return self.stat() != self.signature
+
+    def read_from(self, start, seq):
+        # خروجی: [(seq، خط، جای پایان خط نسبت به start)] برای خطوط کامل از start و اندازه خوانده‌شده؛
+        # None اگر از وسط یک خط شروع شده باشد
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(start)
+                content = f.read()
+        except FileNotFoundError:
+            return [], 0
+        content = content[:content.rfind(b"\n") + 1]
+        lines = []
+        end = 0
+        for raw in content.split(b"\n")[:-1]:
+            end += len(raw) + 1
+            if not raw.strip():
+                continue
+            try:
+                entry = json.loads(raw)
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                return None
+            # خطوط ژورنال‌های قدیمی seq ندارند
+            seq = entry.get("seq", seq + 1)
+            lines.append((seq, entry, end))
+        return lines, len(content)
+
+    def measure(self, start, lines):
+        for _, entry, end in lines:
+            if entry.get("base"):
+                self.ops = 0
+                self.base_end = start + end
+            else:
+                self.ops += len(entry["batch"]) if "batch" in entry else 1
+
+    def read_tail(self):
+        # خطوط جدید از آخرین خواندن. اگر فایل جایگزین شده باشد (فشرده‌سازی در برنامه دیگر) از ابتدا خوانده
+        # و خطوط دیده‌شده رد می‌شوند. خروجی دوم False است اگر خطی که دیده نشده از ژورنال حذف شده باشد
+        signature = self.stat()
+        result = None
+        if self.signature is not None and signature is not None and signature[0] == self.signature[0] and signature[1] >= self.offset:
+            result = self.read_from(self.offset, self.seq)
+            if result is not None and result[0] and result[0][0][0] != self.seq + 1:
+                result = None
+            if result is not None:
+                self.measure(self.offset, result[0])
+                self.offset += result[1]
+        if result is None:
+            result = self.read_from(0, 0)
+            if result is None:
+                raise StorageError(f"فایل {self.path} خراب است.")
+            self.ops = self.base_end = 0
+            self.measure(0, result[0])
+            self.offset = result[1]
+        lines = [(seq, entry) for seq, entry, _ in result[0] if seq > self.seq]
+        continuous = not lines or lines[0][0] == self.seq + 1
+        ops = []
+        for seq, entry in lines:
+            self.seq = seq
+            ops.extend((e["file"], e["op"], e["record"]) for e in entry.get("batch", (entry,)))
+        self.signature = self.stat()
+        return ops, continuous
+
+    @timed("journal_append")
+    def append(self, ops, sync=True):
+        entries = [{"file": file_path, "op": op, "record": record} for file_path, op, record in ops]
+        line = dict(entries[0]) if len(entries) == 1 else {"batch": entries}
+        line["seq"] = self.seq + 1
+        data = (json.dumps(line, ensure_ascii=False) + "\n").encode("utf-8")
+        with open(self.path, "ab") as f:
+            f.write(data)
+            f.flush()
+            if sync:
+                os.fsync(f.fileno())
+        self.seq += 1
+        self.offset += len(data)
+        self.ops += len(entries)
+        self.signature = self.stat()
+        if PROFILE:
+            METRICS.add("journal_bytes", len(data))
+            METRICS.add("journal_ops", len(entries))
+
+    def entries(self, file_path):
+        return iter(self.loaded.pop(file_path, ()))
+
+    def base_line(self, ops):
+        line = {"seq": self.seq + 1, "base": True, "batch": [{"file": file_path, "op": op, "record": record} for file_path, op, record in ops]}
+        return json.dumps(line, ensure_ascii=False) + "\n"
+
+    def tail(self, size):
+        # خطوط کامل انتهای ژورنال که روی هم حداکثر size بایت‌اند؛ فقط همین بخش از فایل خوانده می‌شود
+        try:
+            with open(self.path, "rb") as f:
+                end = f.seek(0, os.SEEK_END)
+                start = max(end - size - 1, 0)
+                f.seek(start)
+                content = f.read()
+        except FileNotFoundError:
+            return b""
+        if end > size:
+            # بایت پیش از بخش خوانده‌شده هم خوانده شده تا معلوم باشد خط اول کامل است یا نه
+            content = content[content.find(b"\n") + 1:]
+        return content[:content.rfind(b"\n") + 1]
+
+    def reset(self, ops=(), keep=0):
+        # ژورنال جدید به خط base ختم می‌شود: فایل‌های اصلی همه تغییرات تا آن خط را دارند و اعمال دوباره
+        # خطوط نگه‌داشته‌شده پیش از آن (حداکثر keep بایت) هنگام بارگذاری بی‌اثر است
+        kept = self.tail(keep).decode("utf-8") if keep else ""
+        write_atomic(self.path, kept + self.base_line(ops))
+        self.seq += 1
+        self.ops = 0
+        self.signature = self.stat()
+        self.offset = self.base_end = self.signature[1]
+
+def inverse_op(file_path, op, record, old):
+    # عملیاتی که اثر (op، record) را برمی‌گرداند؛ old رکورد پیش از تغییر است (None اگر وجود نداشت)
+    if old is None:
+        return [file_path, "delete", {"id": record["id"]}]
+    return [file_path, "insert" if op == "delete" else "update", dict(old)]
+
+class UnitOfWork:
+    # تغییرات یک عمل کاربر جمع می‌شوند و یک بار با هم ثبت می‌شوند. اگر remember داده شود عکس هر تغییر هم
+    # نگه داشته و پیش از ثبت با remember به تاریخچه واگرد سپرده می‌شود
+    def __init__(self, commit, remember=None, label=None):
+        self.commit_ops = commit
+        self.remember = remember
+        self.label = label
+        self.ops = []
+        self.inverse = []
+
+    def record(self, file_path, op, record, old=None):
+        # old: رکورد پیش از تغییر برای update و delete
+        self.ops.append((file_path, op, record))
+        if self.remember is not None:
+            self.inverse.append(inverse_op(file_path, op, record, old))
+
+    def log(self, file_path, op, record):
+        # تغییری که خود در تاریخچه واگرد نمی‌آید
+        self.ops.append((file_path, op, record))
+
+    def commit(self):
+        if self.ops:
+            if self.remember is not None and self.inverse:
+                self.remember(self)
+            self.commit_ops(self.ops)
+            self.ops = []
+            self.inverse = []
+
+class PersistenceWorker(threading.Thread):
+    # همه نوشتن‌ها روی دیسک در این رشته انجام می‌شود تا پنجره منتظر دیسک نماند؛
+    # نتیجه هر کار در results قرار می‌گیرد و رشته اصلی با root.after آن را می‌خواند
+    def __init__(self, storage):
+        super().__init__(daemon=True)
+        self.storage = storage
+        self.tasks = queue.Queue()
+        self.results = queue.Queue()
+
+    def run(self):
+        while True:
+            task = self.tasks.get()
+            if task is None:
+                self.tasks.task_done()
+                break
+            kind, payload = task
+            try:
+                if kind == "commit":
+                    self.storage.commit(payload)
+                elif kind == "sync":
+                    self.storage.sync()
+                else:
+                    self.storage.compact(*payload)
+                self.results.put((kind, None))
+            except Exception as e:
+                self.results.put((kind, e))
+            finally:
+                self.tasks.task_done()
+
+    def submit(self, kind, payload):
+        self.tasks.put((kind, payload))
+
+    def wait(self):
+        # تا انجام همه کارهای فرستاده‌شده صبر می‌کند؛ SqliteLedger پیش از خواندن از پایگاه
+        self.tasks.join()
+
+    def stop(self):
+        # کارهای باقی‌مانده در صف پیش از پایان انجام می‌شوند
+        self.tasks.put(None)
+        self.join()
+
+class RecordList:
+    # رکوردها به ترتیب ثبت به همراه نمایه شناسه → جایگاه؛ رکورد حذف‌شده با None علامت می‌خورد
+    def __init__(self, records=(), next_id=1):
+        self.slots = []
+        self.index = {}
+        self.removed = 0
+        self.next_id = next_id
+        for record in records:
+            self.append(record)
+
+    def __len__(self):
+        return len(self.slots) - self.removed
+
+    def __iter__(self):
+        return (r for r in self.slots if r is not None)
+
+    def append(self, record):
+        self.index[record["id"]] = len(self.slots)
+        self.slots.append(record)
+        self.next_id = max(self.next_id, record["id"] + 1)
+
+    def get(self, rid):
+        pos = self.index.get(rid)
+        return None if pos is None else self.slots[pos]
+
+    def remove(self, rid):
+        pos = self.index.pop(rid, None)
+        if pos is None:
+            return None
+        record = self.slots[pos]
+        self.slots[pos] = None
+        self.removed += 1
+        if self.removed > len(self.slots) // 2:
+            self.compact()
+        return record
+
+    def compact(self):
+        self.slots = [r for r in self.slots if r is not None]
+        self.index = {r["id"]: i for i, r in enumerate(self.slots)}
+        self.removed = 0
+
+    def put(self, record):
+        # جایگزینی رکورد هم‌شناسه در همان جایگاه یا افزودن آن؛ خروجی رکورد قبلی
+        pos = self.index.get(record["id"])
+        if pos is None:
+            self.append(record)
+            return None
+        old = self.slots[pos]
+        self.slots[pos] = record
+        return old
+
+    def allocate_id(self):
+        rid = self.next_id
+        self.next_id += 1
+        return rid
+
+class SavingsLots(RecordList):
+    # پس‌اندازها به ترتیب قدیمی‌ترین با جمع کل که با هر تغییر به‌روز می‌شود. برداشت از اولین جایگاه زنده (head)
+    # شروع می‌شود، پس هزینه آن به تعداد پس‌اندازهای مصرف‌شده بستگی دارد و نه به کل فهرست
+    def __init__(self, records=(), next_id=1):
+        self.total = 0
+        self.head = 0
+        super().__init__(records, next_id)
+
+    def append(self, record):
+        super().append(record)
+        self.total += record["amount"]
+
+    def remove(self, rid):
+        record = super().remove(rid)
+        if record is not None:
+            self.total -= record["amount"]
+        return record
+
+    def put(self, record):
+        # پس‌انداز برگردانده‌شده (واگرد برداشت) که از اولین پس‌انداز زنده قدیمی‌تر است پیش از آن قرار می‌گیرد
+        # تا دوباره اول برداشت شود
+        if record["id"] not in self.index:
+            first = self.first()
+            if first is not None and record["id"] < first["id"]:
+                self.restore(record)
+                return None
+        old = super().put(record)
+        if old is not None:
+            self.total += record["amount"] - old["amount"]
+        return old
+
+    def restore(self, record):
+        if self.head > 0:
+            # جایگاه‌های پیش از head همه حذف‌شده‌اند
+            self.head -= 1
+            self.slots[self.head] = record
+            self.index[record["id"]] = self.head
+            self.removed -= 1
+        else:
+            self.slots.insert(0, record)
+            self.index = {r["id"]: i for i, r in enumerate(self.slots) if r is not None}
+        self.next_id = max(self.next_id, record["id"] + 1)
+        self.total += record["amount"]
+
+    def compact(self):
+        super().compact()
+        self.head = 0
+
+    def first(self):
+        while self.head < len(self.slots) and self.slots[self.head] is None:
+            self.head += 1
+        return self.slots[self.head] if self.head < len(self.slots) else None
+
+    def drain(self, amount):
+        # خروجی: فهرست (عملیات، رکورد، رکورد پیش از تغییر) برای ثبت در ژورنال با همان قالب رکوردهای پس‌انداز
+        changes = []
+        remaining = amount
+        while remaining > 0:
+            lot = self.first()
+            if lot is None:
+                break
+            if remaining >= lot["amount"]:
+                remaining -= lot["amount"]
+                self.remove(lot["id"])
+                changes.append(("delete", {"id": lot["id"]}, lot))
+            else:
+                old = dict(lot)
+                lot["amount"] -= remaining
+                self.total -= remaining
+                remaining = 0
+                changes.append(("update", lot, old))
+        return changes
+
+class OperationLog(RecordList):
+    # تاریخچه واگرد و انجام دوباره به ترتیب ثبت. هر عمل فقط تغییراتی را نگه می‌دارد که باید برای برگرداندنش
+    # اعمال شوند (ops)، پس هزینه واگرد به اندازه همان عمل است. عمل‌های واگردشده (undone) همیشه در انتهای فهرست‌اند
+    # و size تعداد کل تغییرات نگه‌داشته‌شده است
+    def __init__(self, records=(), next_id=1):
+        self.size = 0
+        super().__init__(records, next_id)
+
+    def append(self, record):
+        super().append(record)
+        self.size += len(record["ops"])
+
+    def remove(self, rid):
+        record = super().remove(rid)
+        if record is not None:
+            self.size -= len(record["ops"])
+        return record
+
+    def put(self, record):
+        old = super().put(record)
+        if old is not None:
+            self.size += len(record["ops"]) - len(old["ops"])
+        return old
+
+    def last_done(self):
+        for entry in reversed(self.slots):
+            if entry is not None and not entry["undone"]:
+                return entry
+        return None
+
+    def first_undone(self):
+        result = None
+        for entry in reversed(self.slots):
+            if entry is None:
+                continue
+            if not entry["undone"]:
+                break
+            result = entry
+        return result
+
+    def undone(self):
+        return [entry for entry in self if entry["undone"]]
+
+    def evict(self, limit=UNDO_LIMIT, max_ops=UNDO_MAX_OPS):
+        # حذف قدیمی‌ترین عمل‌ها تا اندازه تاریخچه در محدوده بماند؛ خروجی عمل‌های حذف‌شده
+        evicted = []
+        while len(self) > limit or self.size > max_ops:
+            evicted.append(self.remove(next(iter(self))["id"]))
+        return evicted
+
+def iter_json_array(file_path, chunk_size=1 << 16, errors="strict"):
+    # خواندن جریانی آرایه JSON بدون بارگذاری کل فایل در حافظه
+    decoder = json.JSONDecoder()
+    with open(file_path, "r", encoding="utf-8-sig", errors=errors) as f:
+        buf = f.read(chunk_size)
+        pos = len(buf) - len(buf.lstrip())
+        if not buf.startswith("[", pos):
+            raise json.JSONDecodeError("Expecting '['", buf, pos)
+        pos += 1
+        eof = False
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n,":
+                pos += 1
+            if pos < len(buf) and buf[pos] == "]":
+                return
+            try:
+                record, pos = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                more = f.read(chunk_size)
+                eof = not more
+                buf = buf[pos:] + more
+                pos = 0
+                continue
+            yield record
+
+def read_records(file_path, journal=None):
+    # ژورنال پیش از فایل اصلی خوانده می‌شود تا رکوردها در حین خواندن جریانی اصلاح شوند
+    overrides = {}
+    next_id = 1
+    if journal is not None:
+        for entry in journal.entries(file_path):
+            record = entry["record"]
+            if entry["op"] == "seq":
+                next_id = max(next_id, record["next_id"])
+            elif entry["op"] == "delete":
+                overrides[record["id"]] = None
+            else:
+                overrides[record["id"]] = record
+                next_id = max(next_id, record["id"] + 1)
+
+    def records():
+        if os.path.exists(file_path):
+            for record in iter_json_array(file_path):
+                if record["id"] in overrides:
+                    record = overrides.pop(record["id"])
+                    if record is None:
+                        continue
+                yield record
+        for record in overrides.values():
+            if record is not None:
+                yield record
+
+    return next_id, records()
+
+@lru_cache(maxsize=4096)
+def date_ordinal(date_str):
+    return datetime.strptime(date_str, "%Y-%m-%d").toordinal()
+
+@lru_cache(maxsize=4096)
+def ordinal_date(ordinal):
+    return date.fromordinal(ordinal).isoformat()
+
+def canonical_date(date_str):
+    # yyyy-mm-dd با صفرهای پیشرو (strptime «2026-1-5» را هم می‌پذیرد) تا ترتیب متنی همان ترتیب تاریخ باشد؛
+    # تاریخ نامعتبر بدون تغییر می‌ماند
+    try:
+        return ordinal_date(date_ordinal(date_str))
+    except (TypeError, ValueError):
+        return date_str
+
+@lru_cache(maxsize=4096)
+def ordinal_month(ordinal):
+    # کلید ماه: سال × ۱۲ + شماره ماه از صفر
+    d = date.fromordinal(ordinal)
+    return d.year * 12 + d.month - 1
+
+def to_minor(value):
+    # مبلغ به تومان (رشته یا عدد) → صدم تومان. float از نمایش دهدهی کوتاهش خوانده می‌شود تا 0.1 دقیقاً 10 شود.
+    # مبالغ بزرگ‌تر از MAX_AMOUNT پیش از تبدیل به int رد می‌شوند؛ تبدیل 1e999999 به int چند ده ثانیه طول می‌کشد
+    try:
+        amount = Decimal(str(value).strip().replace(",", "")) * MONEY_SCALE
+    except DecimalException:
+        raise ValidationError("مبلغ نامعتبر است.") from None
+    if not amount.is_finite():
+        raise ValidationError("مبلغ نامعتبر است.")
+    if abs(amount) > MAX_AMOUNT:
+        raise ValidationError("مبلغ بیش از حد بزرگ است.")
+    return int(amount.to_integral_value(ROUND_HALF_UP))
+
+def money_value(minor):
+    # مبلغ به تومان برای خروجی JSON و CSV؛ نمایش کوتاه float برای مبالغ تا ۱۵ رقم همان عدد دهدهی است
+    return minor / MONEY_SCALE
+
+def format_money(minor, grouping=True):
+    whole, fraction = divmod(abs(minor), MONEY_SCALE)
+    sign = "-" if minor < 0 else ""
+    return f"{sign}{whole:,}.{fraction:02d}" if grouping else f"{sign}{whole}.{fraction:02d}"
+
+def money_record(record, fields):
+    # کپی رکورد با مبالغ به تومان
+    record = dict(record)
+    for name in fields:
+        record[name] = money_value(record[name])
+    return record
+
+class TransactionView:
+    # نمای یک ردیف از ColumnarLedger با رابط dict تا صفحه‌های موجود بدون تغییر کار کنند
+    __slots__ = ("ledger", "id", "row", "generation")
+    KEYS = ("id", "date", "type", "amount", "category", "description")
+
+    def __init__(self, ledger, row):
+        self.ledger = ledger
+        self.row = row
+        self.id = ledger.ids[row]
+        self.generation = ledger.generation
+
+    def resolve(self):
+        # پس از فشرده‌سازی ستون‌ها جایگاه ردیف دوباره از روی شناسه پیدا می‌شود
+        if self.generation != self.ledger.generation:
+            self.row = self.ledger.row_of(self.id)
+            self.generation = self.ledger.generation
+        if self.row is None:
+            raise KeyError(self.id)
+        return self.row
+
+    def __getitem__(self, key):
+        return self.ledger.field(self.resolve(), key)
+
+    def __setitem__(self, key, value):
+        self.ledger.set_field(self.resolve(), key, value)
+
+    def get(self, key, default=None):
+        return self[key] if key in self.KEYS else default
+
+    def keys(self):
+        return self.KEYS
+
+    def __iter__(self):
+        return iter(self.KEYS)
+
+    def __len__(self):
+        return len(self.KEYS)
+
+class LedgerSlots:
+    # دنباله جایگاه‌های ColumnarLedger؛ ردیف حذف‌شده None است (مانند RecordList.slots).
+    # با rows فقط همان ردیف‌ها و به همان ترتیب (مثلاً نتیجه یک فیلتر) دیده می‌شوند
+    def __init__(self, ledger, rows=None):
+        self.ledger = ledger
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.ledger.ids) if self.rows is None else len(self.rows)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        row = i if self.rows is None else self.rows[i]
+        return TransactionView(self.ledger, row) if self.ledger.live[row] else None
+
+class ColumnarLedger:
+    # ذخیره ستونی تراکنش‌ها: مبلغ (صدم تومان) در array('q')، تاریخ به صورت شماره روز، نوع در یک بایت،
+    # دسته‌بندی با کد عددی و توضیحات به صورت UTF-8 در یک بافر که فقط هنگام دسترسی رمزگشایی می‌شود
+    TYPES = ("income", "expense")
+
+    def __init__(self, records=(), next_id=1):
+        self.ids = array("q")
+        self.amounts = array("q")
+        self.days = array("i")
+        self.types = array("B")
+        self.categories = array("i")
+        self.desc_start = array("q")
+        self.desc_len = array("i")
+        self.live = array("B")
+        self.descriptions = bytearray()
+        # بایت‌هایی از descriptions که به توضیحات جایگزین‌شده یا تراکنش حذف‌شده تعلق دارند
+        self.dead_bytes = 0
+        self.category_names = []
+        self.category_codes = {}
+        # تا وقتی شناسه‌ها صعودی ثبت شوند جستجو با bisect انجام می‌شود و نمایه جداگانه لازم نیست
+        self.id_index = None
+        self.removed = 0
+        self.generation = 0
+        self.next_id = next_id
+        # توابعی که با تغییر هر ردیف، (ردیف، روز قبلی، روز جدید، فیلد تغییرکرده، مقدار قبلی فیلد) را دریافت می‌کنند؛
+        # روز قبلی برای درج و روز جدید برای حذف None است
+        self.listeners = []
+        for record in records:
+            self.append(record)
+
+    @property
+    def slots(self):
+        return LedgerSlots(self)
+
+    def notify(self, row, old, new, key=None, previous=None):
+        for listener in self.listeners:
+            listener(row, old, new, key, previous)
+
+    def __len__(self):
+        return len(self.ids) - self.removed
+
+    def __iter__(self):
+        return (TransactionView(self, row) for row in range(len(self.ids)) if self.live[row])
+
+    def category_code(self, name):
+        code = self.category_codes.get(name)
+        if code is None:
+            code = len(self.category_names)
+            self.category_names.append(name)
+            self.category_codes[name] = code
+        return code
+
+    def store_description(self, text):
+        encoded = text.encode("utf-8")
+        start = len(self.descriptions)
+        self.descriptions += encoded
+        return start, len(encoded)
+
+    def release_description(self, row):
+        # توضیحات ردیف کنار گذاشته می‌شود. وقتی بیش از نیمی از بافر مرده باشد بازسازی می‌شود، پس هزینه آن سرشکن ثابت است
+        self.dead_bytes += self.desc_len[row]
+        self.desc_len[row] = 0
+        if self.dead_bytes > len(self.descriptions) // 2:
+            self.compact_descriptions()
+
+    def compact_descriptions(self):
+        # شماره ردیف‌ها تغییر نمی‌کند
+        descriptions = bytearray()
+        for row in range(len(self.ids)):
+            start = self.desc_start[row]
+            self.desc_start[row] = len(descriptions)
+            descriptions += self.descriptions[start:start + self.desc_len[row]]
+        self.descriptions = descriptions
+        self.dead_bytes = 0
+
+    def append(self, record):
+        # همه فیلدها پیش از تغییر ستون‌ها بررسی می‌شوند تا رکورد نامعتبر ستون‌ها را ناهم‌تراز نکند
+        try:
+            rid = record["id"]
+            amount = record["amount"]
+            if type(rid) is not int or type(amount) is not int or not -MAX_AMOUNT <= amount <= MAX_AMOUNT:
+                raise TypeError
+            day = date_ordinal(record["date"])
+            ttype = self.TYPES.index(record["type"])
+            category = record["category"]
+            encoded = record["description"].encode("utf-8")
+            if not isinstance(category, str):
+                raise TypeError
+        except (AttributeError, KeyError, TypeError, ValueError):
+            raise ValidationError(f"تراکنش نامعتبر: {record!r}")
+        if self.id_index is None and self.ids and rid <= self.ids[-1]:
+            self.id_index = {r: row for row, r in enumerate(self.ids) if self.live[row]}
+        if self.id_index is not None:
+            self.id_index[rid] = len(self.ids)
+        self.ids.append(rid)
+        self.amounts.append(amount)
+        self.days.append(day)
+        self.types.append(ttype)
+        self.categories.append(self.category_code(category))
+        self.desc_start.append(len(self.descriptions))
+        self.desc_len.append(len(encoded))
+        self.descriptions += encoded
+        self.live.append(1)
+        self.next_id = max(self.next_id, rid + 1)
+        if self.listeners:
+            self.notify(len(self.ids) - 1, None, self.days[-1])
+
+    def row_of(self, rid):
+        if self.id_index is not None:
+            return self.id_index.get(rid)
+        row = bisect.bisect_left(self.ids, rid)
+        if row < len(self.ids) and self.ids[row] == rid and self.live[row]:
+            return row
+        return None
+
+    def get(self, rid):
+        row = self.row_of(rid)
+        return None if row is None else TransactionView(self, row)
+
+    def record(self, row):
+        return {key: self.field(row, key) for key in TransactionView.KEYS}
+
+    def field(self, row, key):
+        if key == "amount":
+            return self.amounts[row]
+        if key == "date":
+            return ordinal_date(self.days[row])
+        if key == "type":
+            return self.TYPES[self.types[row]]
+        if key == "category":
+            return self.category_names[self.categories[row]]
+        if key == "description":
+            start = self.desc_start[row]
+            return self.descriptions[start:start + self.desc_len[row]].decode("utf-8")
+        if key == "id":
+            return self.ids[row]
+        raise KeyError(key)
+
+    def set_field(self, row, key, value):
+        old = self.days[row]
+        previous = self.field(row, key) if self.listeners else None
+        if key == "amount":
+            self.amounts[row] = value
+        elif key == "date":
+            self.days[row] = date_ordinal(value)
+        elif key == "type":
+            self.types[row] = self.TYPES.index(value)
+        elif key == "category":
+            self.categories[row] = self.category_code(value)
+        elif key == "description":
+            self.release_description(row)
+            self.desc_start[row], self.desc_len[row] = self.store_description(value)
+        else:
+            raise KeyError(key)
+        if self.listeners:
+            self.notify(row, old, self.days[row], key, previous)
+
+    def remove(self, rid):
+        row = self.row_of(rid)
+        if row is None:
+            return None
+        record = self.record(row)
+        self.live[row] = 0
+        if self.listeners:
+            self.notify(row, self.days[row], None)
+        self.release_description(row)
+        self.removed += 1
+        if self.id_index is not None:
+            del self.id_index[rid]
+        if self.removed > len(self.ids) // 2:
+            self.compact()
+        return record
+
+    def compact(self):
+        rows = [row for row in range(len(self.ids)) if self.live[row]]
+        descriptions = bytearray()
+        desc_start = array("q")
+        for row in rows:
+            desc_start.append(len(descriptions))
+            start = self.desc_start[row]
+            descriptions += self.descriptions[start:start + self.desc_len[row]]
+        self.descriptions = descriptions
+        self.dead_bytes = 0
+        self.desc_start = desc_start
+        for name in ("ids", "amounts", "days", "types", "categories", "desc_len"):
+            column = getattr(self, name)
+            setattr(self, name, array(column.typecode, (column[row] for row in rows)))
+        self.live = array("B", bytes([1]) * len(rows))
+        if self.id_index is not None:
+            self.id_index = {rid: row for row, rid in enumerate(self.ids)}
+        self.removed = 0
+        self.generation += 1
+
+    def allocate_id(self):
+        rid = self.next_id
+        self.next_id += 1
+        return rid
+
+    def copy(self):
+        # کپی مستقل ستون‌ها برای خواندن در رشته دیگر؛ شنونده‌ها کپی نمی‌شوند
+        ledger = ColumnarLedger(next_id=self.next_id)
+        for name in ("ids", "amounts", "days", "types", "categories", "desc_start", "desc_len", "live"):
+            setattr(ledger, name, getattr(self, name)[:])
+        ledger.descriptions = bytes(self.descriptions)
+        ledger.dead_bytes = self.dead_bytes
+        ledger.category_names = list(self.category_names)
+        ledger.category_codes = dict(self.category_codes)
+        ledger.id_index = None if self.id_index is None else dict(self.id_index)
+        ledger.removed = self.removed
+        return ledger
+
+class LedgerAggregator:
+    # جمع درآمد و هزینه به تفکیک روز، ماه، سال یا دسته‌بندی روی ستون‌های ColumnarLedger.
+    # جمع‌های ماهانه نگه داشته می‌شوند و با تغییر یک تراکنش فقط ماه همان تراکنش دوباره محاسبه می‌شود
+    GROUPS = ("day", "month", "year", "category")
+    EPOCH = date(1970, 1, 1).toordinal()
+
+    def __init__(self, ledger):
+        self.ledger = ledger
+        self.months = None
+        self.stale = set()
+        ledger.listeners.append(self.invalidate)
+
+    def invalidate(self, row, old, new, key=None, previous=None):
+        if self.months is not None:
+            for ordinal in (old, new):
+                if ordinal is not None:
+                    self.stale.add(ordinal_month(ordinal))
+
+    @staticmethod
+    def month_bounds(month):
+        first = date(month // 12, month % 12 + 1, 1)
+        following = date(first.year + first.month // 12, first.month % 12 + 1, 1)
+        return first.toordinal(), following.toordinal() - 1
+
+    def scan(self, by, start=None, end=None):
+        # نتیجه: کلید گروه → [درآمد، هزینه]
+        if np is not None:
+            return self.scan_vectorized(by, start, end)
+        ledger = self.ledger
+        result = {}
+        for row in range(len(ledger.ids)):
+            if not ledger.live[row]:
+                continue
+            day = ledger.days[row]
+            if (start is not None and day < start) or (end is not None and day > end):
+                continue
+            if by == "day":
+                key = day
+            elif by == "category":
+                key = ledger.categories[row]
+            else:
+                key = ordinal_month(day) if by == "month" else date.fromordinal(day).year
+            sums = result.get(key)
+            if sums is None:
+                sums = result[key] = [0, 0]
+            sums[ledger.types[row]] += ledger.amounts[row]
+        return result
+
+    @staticmethod
+    def exact_bincount(keys, values, minlength):
+        # bincount با وزن در float64 جمع می‌زند؛ با جدا کردن ۲۴ بیت پایین هر مبلغ هر دو جمع زیر 2^53 می‌مانند
+        # (تا حدود ۱۰۰ میلیون ردیف با مبالغ زیر MAX_AMOUNT) و نتیجه دقیق است
+        high, low = np.divmod(values, 1 << 24)
+        return ((np.bincount(keys, weights=high, minlength=minlength).astype(np.int64) << 24)
+                + np.bincount(keys, weights=low, minlength=minlength).astype(np.int64))
+
+    def scan_vectorized(self, by, start, end):
+        ledger = self.ledger
+        # نماهای NumPy فقط در طول همین تابع نگه داشته می‌شوند تا آرایه‌ها بتوانند بزرگ شوند
+        days = np.frombuffer(ledger.days, dtype=np.int32)
+        mask = np.frombuffer(ledger.live, dtype=np.uint8).astype(bool)
+        if start is not None:
+            mask &= days >= start
+        if end is not None:
+            mask &= days <= end
+        if by == "category":
+            keys = np.frombuffer(ledger.categories, dtype=np.int32)[mask]
+        else:
+            keys = days[mask].astype(np.int64)
+            if by != "day":
+                keys = (keys - self.EPOCH).astype("datetime64[D]").astype("datetime64[M]").astype(np.int64) + 1970 * 12
+                if by == "year":
+                    keys //= 12
+        del days
+        if not keys.size:
+            return {}
+        amounts = np.frombuffer(ledger.amounts, dtype=np.int64)[mask]
+        is_income = np.frombuffer(ledger.types, dtype=np.uint8)[mask] == 0
+        # کلیدها در بازه‌ای فشرده‌اند، پس گروه‌بندی با bincount و بدون مرتب‌سازی انجام می‌شود
+        low = int(keys.min())
+        keys -= low
+        counts = np.bincount(keys)
+        income = self.exact_bincount(keys, np.where(is_income, amounts, 0), len(counts))
+        expense = self.exact_bincount(keys, np.where(is_income, 0, amounts), len(counts))
+        return {int(k) + low: [int(income[k]), int(expense[k])] for k in np.flatnonzero(counts)}
+
+    def monthly(self):
+        if self.months is None:
+            self.months = self.scan("month")
+            self.stale.clear()
+        elif self.stale:
+            for month in self.stale:
+                fresh = self.scan("month", *self.month_bounds(month))
+                if month in fresh:
+                    self.months[month] = fresh[month]
+                else:
+                    self.months.pop(month, None)
+            self.stale.clear()
+        return self.months
+
+    @timed("summarize")
+    def summarize(self, by, start=None, end=None):
+        # خروجی: فهرست (برچسب، درآمد، هزینه) مرتب بر اساس کلید
+        if by in ("month", "year"):
+            first = ordinal_month(start) if start is not None else None
+            last = ordinal_month(end) if end is not None else None
+            # ماه‌هایی که بازه فقط بخشی از آن‌ها را پوشش می‌دهد مستقیم پیمایش می‌شوند
+            partial = set()
+            if start is not None and date.fromordinal(start).day != 1:
+                partial.add(first)
+            if end is not None and ordinal_month(end + 1) == last:
+                partial.add(last)
+            groups = {m: list(sums) for m, sums in self.monthly().items()
+                      if (first is None or m >= first) and (last is None or m <= last) and m not in partial}
+            for month in partial:
+                low, high = self.month_bounds(month)
+                groups.update(self.scan("month", low if start is None else max(start, low), high if end is None else min(end, high)))
+            if by == "year":
+                years = {}
+                for month, (income, expense) in groups.items():
+                    sums = years.setdefault(month // 12, [0, 0])
+                    sums[0] += income
+                    sums[1] += expense
+                groups = years
+        else:
+            groups = self.scan(by, start, end)
+        rows = []
+        for key in sorted(groups):
+            if by == "day":
+                label = ordinal_date(key)
+            elif by == "month":
+                label = f"{key // 12}-{key % 12 + 1:02d}"
+            elif by == "year":
+                label = str(key)
+            else:
+                label = self.ledger.category_names[key] or "-"
+            income, expense = groups[key]
+            rows.append((label, income, expense))
+        if by == "category":
+            rows.sort(key=lambda r: r[0])
+        return rows
+
+def tokenize(text):
+    return re.findall(r"\w+", text.lower())
+
+@lru_cache(maxsize=64)
+def search_tokens(text):
+    return tuple(tokenize(text))
+
+def matches_tokens(description, tokens):
+    # هر واژه جستجو پیشوند یکی از واژه‌های توضیحات است (مانند LedgerIndex.search)
+    words = tokenize(description)
+    return all(any(word.startswith(token) for word in words) for token in tokens)
+
+class LedgerIndex:
+    # نمایه ثانویه ColumnarLedger: ردیف‌ها مرتب بر اساس (روز، ردیف) در دو آرایه موازی که با bisect
+    # جستجو و به‌روز می‌شوند، و نمایه معکوس واژه‌های توضیحات که فقط با اولین جستجوی متنی ساخته می‌شود.
+    # پس از فشرده‌سازی ستون‌ها شماره ردیف‌ها عوض می‌شود و نمایه در اولین پرس‌وجو دوباره ساخته می‌شود
+    def __init__(self, ledger):
+        self.ledger = ledger
+        self.days = None
+        self.rows = None
+        self.generation = None
+        # واژه → ردیف‌ها به ترتیب صعودی؛ با حذف ردیف یا تغییر توضیحات، ردیف از واژه‌های قبلی حذف می‌شود
+        self.postings = None
+        self.vocabulary = []
+        ledger.listeners.append(self.update)
+
+    def build(self):
+        ledger = self.ledger
+        if np is not None:
+            days = np.frombuffer(ledger.days, dtype=np.int32)
+            live = np.flatnonzero(np.frombuffer(ledger.live, dtype=np.uint8))
+            order = live[np.argsort(days[live], kind="stable")]
+            self.rows = array("q", order.astype(np.int64).tobytes())
+            self.days = array("i", days[order].tobytes())
+            del days
+        else:
+            # مرتب‌سازی پایدار ردیف‌های هم‌روز را به ترتیب ردیف نگه می‌دارد
+            self.rows = array("q", sorted((row for row in range(len(ledger.ids)) if ledger.live[row]), key=ledger.days.__getitem__))
+            self.days = array("i", (ledger.days[row] for row in self.rows))
+        self.generation = ledger.generation
+        self.postings = None
+
+    def ensure(self):
+        if self.generation != self.ledger.generation:
+            self.build()
+
+    def locate(self, ordinal, row):
+        low = bisect.bisect_left(self.days, ordinal)
+        high = bisect.bisect_right(self.days, ordinal, low)
+        return bisect.bisect_left(self.rows, row, low, high)
+
+    def update(self, row, old, new, key=None, previous=None):
+        if self.generation != self.ledger.generation:
+            return
+        if old != new:
+            if old is not None:
+                pos = self.locate(old, row)
+                del self.days[pos]
+                del self.rows[pos]
+            if new is not None:
+                pos = self.locate(new, row)
+                self.days.insert(pos, new)
+                self.rows.insert(pos, row)
+        if self.postings is not None:
+            if key == "description":
+                self.remove_tokens(row, previous)
+                self.add_tokens(row)
+            elif new is None:
+                # ردیف حذف‌شده؛ توضیحات هنوز در ستون‌ها هست
+                self.remove_tokens(row, self.ledger.field(row, "description"))
+            elif old is None:
+                self.add_tokens(row)
+
+    def add_tokens(self, row):
+        for token in set(tokenize(self.ledger.field(row, "description"))):
+            posting = self.postings.get(token)
+            if posting is None:
+                posting = self.postings[token] = array("q")
+                bisect.insort(self.vocabulary, token)
+            if not posting or posting[-1] < row:
+                posting.append(row)
+            else:
+                bisect.insort(posting, row)
+
+    def remove_tokens(self, row, text):
+        for token in set(tokenize(text)):
+            posting = self.postings.get(token)
+            if posting is None:
+                continue
+            pos = bisect.bisect_left(posting, row)
+            if pos < len(posting) and posting[pos] == row:
+                del posting[pos]
+            if not posting:
+                del self.postings[token]
+                del self.vocabulary[bisect.bisect_left(self.vocabulary, token)]
+
+    def prefix_rows(self, token):
+        # اجتماع مرتب ردیف‌های همه واژه‌هایی که با token شروع می‌شوند
+        pos = bisect.bisect_left(self.vocabulary, token)
+        postings = []
+        while pos < len(self.vocabulary) and self.vocabulary[pos].startswith(token):
+            postings.append(self.postings[self.vocabulary[pos]])
+            pos += 1
+        if len(postings) == 1:
+            return postings[0]
+        rows = array("q")
+        for row in heapq.merge(*postings):
+            if not rows or rows[-1] != row:
+                rows.append(row)
+        return rows
+
+    @staticmethod
+    def intersect(small, large):
+        # پیمایش آرایه کوچک‌تر و جستجوی دودویی در آرایه بزرگ‌تر از آخرین محل پیداشده
+        rows = array("q")
+        low = 0
+        for row in small:
+            low = bisect.bisect_left(large, row, low)
+            if low == len(large):
+                break
+            if large[low] == row:
+                rows.append(row)
+        return rows
+
+    def search(self, tokens):
+        # هر واژه جستجو پیشوند یکی از واژه‌های توضیحات است
+        if self.postings is None:
+            self.postings = {}
+            self.vocabulary = []
+            ledger = self.ledger
+            for row in range(len(ledger.ids)):
+                if ledger.live[row]:
+                    self.add_tokens(row)
+        # خروجی: ردیف‌های منطبق به ترتیب صعودی؛ اشتراک از کوتاه‌ترین آرایه شروع می‌شود
+        matches = None
+        for rows in sorted((self.prefix_rows(token) for token in set(tokens)), key=len):
+            matches = rows if matches is None else self.intersect(matches, rows)
+            if not matches:
+                return array("q")
+        return matches
+
+    def query(self, start=None, end=None, ttype=None, category=None, text=""):
+        # خروجی: ردیف‌های منطبق مرتب بر اساس تاریخ
+        self.ensure()
+        ledger = self.ledger
+        tokens = tokenize(text)
+        if tokens:
+            days = ledger.days
+            rows = sorted((row for row in self.search(tokens)
+                           if (start is None or days[row] >= start) and (end is None or days[row] <= end)),
+                          key=lambda row: (days[row], row))
+            rows = array("q", rows)
+        else:
+            low = 0 if start is None else bisect.bisect_left(self.days, start)
+            high = len(self.days) if end is None else bisect.bisect_right(self.days, end)
+            rows = self.rows[low:high]
+        type_code = None if ttype is None else ledger.TYPES.index(ttype)
+        category_code = None if category is None else ledger.category_codes.get(category, -1)
+        if type_code is None and category_code is None:
+            return rows
+        if np is not None:
+            selected = np.frombuffer(rows, dtype=np.int64)
+            mask = np.ones(len(selected), dtype=bool)
+            if type_code is not None:
+                mask &= np.frombuffer(ledger.types, dtype=np.uint8)[selected] == type_code
+            if category_code is not None:
+                mask &= np.frombuffer(ledger.categories, dtype=np.int32)[selected] == category_code
+            return array("q", selected[mask].tobytes())
+        return array("q", (row for row in rows
+                           if (type_code is None or ledger.types[row] == type_code)
+                           and (category_code is None or ledger.categories[row] == category_code)))
+
+def transaction_fingerprint(ordinal, ttype, amount, category, description):
+    # درهم‌سازی فیلدهای تراکنش (بدون شناسه) برای تشخیص رکوردهای تکراری در ورود گروهی
+    key = f"{ordinal}|{ttype}|{amount}|{category}|{description}".encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+def ledger_fingerprints(ledger):
+    # اثر انگشت → تعداد، تا تراکنش‌های یکسان موجود فقط به همان تعداد رد شوند
+    counts = {}
+    for row in range(len(ledger.ids)):
+        if ledger.live[row]:
+            fingerprint = transaction_fingerprint(ledger.days[row], ledger.TYPES[ledger.types[row]], ledger.amounts[row],
+                                                  ledger.field(row, "category"), ledger.field(row, "description"))
+            counts[fingerprint] = counts.get(fingerprint, 0) + 1
+    return counts
+
+def record_fingerprints(records):
+    # مانند ledger_fingerprints برای رکوردهای جریانی ذخیره‌سازی؛ خروجی (اثر انگشت‌ها، بزرگ‌ترین شناسه + ۱).
+    # رکورد نامعتبر رد می‌شود
+    counts = {}
+    next_id = 1
+    for t in records:
+        try:
+            fingerprint = transaction_fingerprint(date_ordinal(t["date"]), t["type"], t["amount"], t["category"], t["description"])
+            next_id = max(next_id, t["id"] + 1)
+        except (KeyError, TypeError, ValueError):
+            continue
+        counts[fingerprint] = counts.get(fingerprint, 0) + 1
+    return counts, next_id
+
+def new_import_stats(file_path):
+    return {"size": os.path.getsize(file_path), "bytes": 0, "read": 0, "imported": 0, "duplicates": 0, "invalid": 0, "errors": []}
+
+def is_json_array(file_path):
+    with open(file_path, "rb") as f:
+        return f.read(64).decode("utf-8-sig", errors="ignore").lstrip().startswith("[")
+
+def read_json_array_chunks(file_path, stats, chunk_lines=IMPORT_CHUNK_LINES):
+    # فایل JSON به صورت آرایه به شکل جریانی خوانده می‌شود؛ شماره هر عنصر جای شماره سطر را می‌گیرد
+    chunk = []
+    try:
+        for number, record in enumerate(iter_json_array(file_path, errors="replace"), 1):
+            text = json.dumps(record, ensure_ascii=False)
+            chunk.append((number, text))
+            stats["bytes"] = min(stats["bytes"] + len(text.encode("utf-8")), stats["size"])
+            if len(chunk) >= chunk_lines:
+                yield None, chunk
+                chunk = []
+    except json.JSONDecodeError as e:
+        raise ValidationError(f"فایل {file_path} آرایه JSON معتبر نیست: {e}") from e
+    stats["bytes"] = stats["size"]
+    if chunk:
+        yield None, chunk
+
+def read_import_chunks(file_path, stats, chunk_lines=IMPORT_CHUNK_LINES):
+    # فایل به صورت تکه‌هایی از (شماره سطر، متن) خوانده می‌شود؛ در CSV سطرهای یک فیلد نقل‌قول‌دار چندخطی کنار هم می‌مانند.
+    # فایل .json که با [ شروع شود آرایه است و بقیه JSON Lines. بایت‌های نامعتبر UTF-8 با U+FFFD جایگزین می‌شوند
+    # و parse_import_row همان سطر را نامعتبر می‌شمارد
+    is_csv = not file_path.lower().endswith((".jsonl", ".ndjson", ".json"))
+    if not is_csv and is_json_array(file_path):
+        yield from read_json_array_chunks(file_path, stats, chunk_lines)
+        return
+    with open(file_path, "rb") as f:
+        header = None
+        line_no = 0
+        if is_csv:
+            line_no = 1
+            header = [name.strip().lower() for name in next(csv.reader([f.readline().decode("utf-8-sig", errors="replace")]), [])]
+        chunk = []
+        pending = ""
+        start = None
+        for raw in f:
+            line_no += 1
+            text = raw.decode("utf-8-sig" if line_no == 1 else "utf-8", errors="replace")
+            if start is None:
+                start = line_no
+            pending += text
+            if is_csv and pending.count('"') % 2:
+                continue
+            if pending.strip():
+                chunk.append((start, pending))
+            pending = ""
+            start = None
+            if len(chunk) >= chunk_lines:
+                stats["bytes"] = f.tell()
+                yield header, chunk
+                chunk = []
+        if pending.strip():
+            chunk.append((start, pending))
+        stats["bytes"] = stats["size"]
+        if chunk:
+            yield header, chunk
+
+def parse_import_row(header, text):
+    # خروجی (رکورد، اثر انگشت)؛ سطر نامعتبر ValidationError می‌دهد
+    if "\ufffd" in text:
+        raise ValidationError("سطر UTF-8 معتبر نیست.")
+    try:
+        if header is None:
+            raw = json.loads(text)
+            if not isinstance(raw, dict):
+                raise ValueError
+        else:
+            raw = dict(zip(header, next(csv.reader([text]))))
+    except (ValueError, csv.Error, StopIteration):
+        raise ValidationError("سطر قابل خواندن نیست.") from None
+    ttype = parse_type(raw.get("type", ""))
+    date_str = parse_date(str(raw.get("date", "")).strip())
+    amount = parse_amount(str(raw.get("amount", "")).replace(",", ""))
+    category = str(raw.get("category") or "").strip()
+    description = str(raw.get("description") or "").strip()
+    record = {"date": date_str, "type": ttype, "amount": amount, "category": category, "description": description}
+    return record, transaction_fingerprint(date_ordinal(date_str), ttype, amount, category, description)
+
+def parse_import_chunk(task):
+    # در فرایندهای جداگانه اجرا می‌شود: خروجی فهرست (شماره سطر، رکورد، اثر انگشت، خطا). خطای هر سطر فقط همان
+    # سطر را نامعتبر می‌کند و بقیه فایل وارد می‌شود
+    header, lines = task
+    results = []
+    for line_no, text in lines:
+        try:
+            record, fingerprint = parse_import_row(header, text)
+        except ValidationError as e:
+            results.append((line_no, None, None, str(e)))
+        except Exception as e:
+            results.append((line_no, None, None, f"سطر قابل پردازش نیست: {e!r}"))
+        else:
+            results.append((line_no, record, fingerprint, None))
+    return results
+
+def parse_import_file(file_path, stats, workers=None):
+    # تکه‌ها به ترتیب به مجموعه فرایندها داده می‌شوند و فقط تعداد محدودی در جریان است تا حافظه ثابت بماند
+    chunks = read_import_chunks(file_path, stats)
+    if workers == 0:
+        for chunk in chunks:
+            yield from parse_import_chunk(chunk)
+        return
+    limit = 2 * (workers or os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(parse_import_chunk, chunk))
+            if len(pending) >= limit:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+def import_batches(rows, fingerprints, stats, batch_size=IMPORT_BATCH_SIZE):
+    batch = []
+    for line_no, record, fingerprint, error in rows:
+        stats["read"] += 1
+        if error is not None:
+            stats["invalid"] += 1
+            if len(stats["errors"]) < IMPORT_ERROR_LIMIT:
+                stats["errors"].append(f"سطر {line_no}: {error}")
+            continue
+        count = fingerprints.get(fingerprint)
+        if count:
+            stats["duplicates"] += 1
+            if count == 1:
+                del fingerprints[fingerprint]
+            else:
+                fingerprints[fingerprint] = count - 1
+            continue
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def import_summary(stats):
+    return f"{stats['read']:,} سطر خوانده شد: {stats['imported']:,} ثبت، {stats['duplicates']:,} تکراری، {stats['invalid']:,} نامعتبر"
+
+def transaction_criteria(start="", end="", ttype=None, category=None, text=""):
+    # معیارهای فیلتر مشترک صفحه تراکنش‌ها و خروجی
+    for value in (start, end):
+        if value:
+            parse_date(value)
+    criteria = {
+        "start": date_ordinal(start) if start else None,
+        "end": date_ordinal(end) if end else None,
+        "ttype": ttype or None,
+        "category": category or None,
+        "text": text or ""
+    }
+    if criteria["start"] is not None and criteria["end"] is not None and criteria["start"] > criteria["end"]:
+        raise ValidationError("تاریخ شروع باید پیش از تاریخ پایان باشد.")
+    return criteria
+
+def export_format(file_path, fmt=None):
+    if fmt:
+        return fmt
+    return "jsonl" if file_path.lower().endswith((".jsonl", ".ndjson", ".json")) else "csv"
+
+def write_export(records, fields, file_path, fmt=None):
+    # رکوردها تکه‌تکه در فایل موقت نوشته و در پایان جایگزین می‌شوند؛ "-" یعنی خروجی استاندارد
+    fmt = export_format(file_path, fmt)
+    if file_path == "-":
+        out = sys.stdout
+    else:
+        temp_path = file_path + ".tmp"
+        out = open(temp_path, "w", encoding="utf-8-sig" if fmt == "csv" else "utf-8", newline="")
+    count = 0
+    try:
+        writer = csv.writer(out) if fmt == "csv" else None
+        if writer:
+            writer.writerow(fields)
+        chunk = []
+        for record in records:
+            chunk.append(record)
+            if len(chunk) >= EXPORT_CHUNK_ROWS:
+                count += write_export_chunk(out, writer, fields, chunk)
+                chunk = []
+        count += write_export_chunk(out, writer, fields, chunk)
+        if out is not sys.stdout:
+            out.flush()
+            os.fsync(out.fileno())
+            out.close()
+            os.replace(temp_path, file_path)
+    except BaseException:
+        # فایل موقت نیمه‌کاره باقی نمی‌ماند
+        if out is not sys.stdout:
+            out.close()
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        raise
+    return count
+
+def write_export_chunk(out, writer, fields, chunk):
+    if writer:
+        writer.writerows([record.get(name, "") for name in fields] for record in chunk)
+    elif chunk:
+        out.write("".join(json.dumps({name: record.get(name) for name in fields}, ensure_ascii=False) + "\n" for record in chunk))
+    return len(chunk)
+
+def report_row(month, sums):
+    income, expense, count = sums
+    return {"month": f"{month // 12}-{month % 12 + 1:02d}", "income": money_value(income), "expense": money_value(expense),
+            "net": money_value(income - expense), "count": count}
+
+def filter_records(records, start=None, end=None, ttype=None, category=None, text=""):
+    # معادل LedgerIndex.query برای رکوردهای جریانی ذخیره‌سازی؛ خروجی به ترتیب شناسه است و رکورد نامعتبر رد می‌شود
+    tokens = tokenize(text)
+    for t in records:
+        try:
+            day = date_ordinal(t["date"])
+            if t["type"] not in ColumnarLedger.TYPES:
+                continue
+            if ((start is not None and day < start) or (end is not None and day > end)
+                    or (ttype is not None and t["type"] != ttype) or (category is not None and t["category"] != category)):
+                continue
+            if tokens and not matches_tokens(t["description"], tokens):
+                continue
+        except (AttributeError, KeyError, TypeError, ValueError):
+            continue
+        yield t
+
+def records_monthly_report(records):
+    # گزارش ماهانه از رکوردها به هر ترتیبی؛ حافظه به تعداد ماه‌ها بستگی دارد و نه به تعداد رکوردها
+    months = {}
+    for t in records:
+        sums = months.setdefault(ordinal_month(date_ordinal(t["date"])), [0, 0, 0])
+        sums[ColumnarLedger.TYPES.index(t["type"])] += t["amount"]
+        sums[2] += 1
+    for month in sorted(months):
+        yield report_row(month, months[month])
+
+def export_transaction_records(records, kind, file_path, fmt=None):
+    # kind: "transactions" یا "report"؛ records تراکنش‌ها با مبلغ به صدم تومان است و فقط یک بار پیمایش می‌شود
+    if kind == "transactions":
+        return write_export((money_record(t, MONEY_FIELDS[DATA_FILE]) for t in records), TransactionView.KEYS, file_path, fmt)
+    return write_export(records_monthly_report(records), REPORT_FIELDS, file_path, fmt)
+
+def export_records(records, file_path, collection, fmt=None):
+    fields = MONEY_FIELDS[collection]
+    return write_export((money_record(r, fields) for r in records), SqliteStorage.TABLES[collection][1], file_path, fmt)
+
+@timed("load_data")
+def load_data(file_path, journal=None):
+    try:
+        next_id, records = read_records(file_path, journal)
+        records = RecordList(records, next_id)
+        if PROFILE:
+            METRICS.add("rows_loaded", len(records))
+        return records
+    except json.JSONDecodeError as e:
+        raise StorageError(f"خطا در بارگذاری فایل {file_path}: {str(e)}") from e
+
+def write_atomic(file_path, content):
+    # نوشتن در فایل موقت و جایگزینی، تا قطع برنامه فایل نیمه‌کاره باقی نگذارد
+    tmp_path = file_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, file_path)
+    if PROFILE:
+        METRICS.add("bytes_written", os.path.getsize(file_path))
+
+@timed("save_data")
+def save_data(data, file_path):
+    # ردیف‌های ColumnarLedger (TransactionView) هنگام نوشتن به dict تبدیل می‌شوند
+    rows = list(data)
+    write_atomic(file_path, json.dumps(rows, indent=2, ensure_ascii=False, default=dict))
+    if PROFILE:
+        METRICS.add("rows_saved", len(rows))
+
+def generate_id(data):
+    # شمارنده یکنوا؛ شناسه حذف‌شده دوباره استفاده نمی‌شود
+    return data.allocate_id()
+
+def read_meta(meta_path=META_FILE):
+    if not os.path.exists(meta_path):
+        return None
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except json.JSONDecodeError as e:
+        raise StorageError(f"خطا در بارگذاری فایل {meta_path}: {str(e)}") from e
+
+def write_meta(meta, meta_path=META_FILE):
+    write_atomic(meta_path, json.dumps(meta))
+
+def convert_money(file_path, record, quarantine):
+    # تبدیل مبالغ یک رکورد قالب ۱ به صدم تومان. رکوردی که مبلغ متناهی ندارد (قالب ۱ مقدار NaN و Infinity را
+    # می‌پذیرفت) به quarantine اضافه می‌شود؛ خروجی False یعنی رکورد کنار گذاشته شد
+    converted = {}
+    for name in MONEY_FIELDS[file_path]:
+        try:
+            converted[name] = to_minor(record[name])
+        except (KeyError, ValidationError):
+            quarantine.append({"file": file_path, "record": record, "error": f"مبلغ نامعتبر ({name}: {record.get(name)})"})
+            return False
+    record.update(converted)
+    return True
+
+def quarantine_content(quarantine, quarantine_path=QUARANTINE_FILE):
+    # رکوردهای قبلی فایل به همراه رکوردهای جدید؛ رکوردی که از ارتقای نیمه‌کاره قبلی در فایل مانده تکرار نمی‌شود
+    entries = list(iter_json_array(quarantine_path)) if os.path.exists(quarantine_path) else []
+    seen = {(e["file"], e["record"].get("id")) for e in entries}
+    return entries + [e for e in quarantine if (e["file"], e["record"].get("id")) not in seen]
+
+def migrate_json_money(journal_path=JOURNAL_FILE, meta_path=META_FILE, quarantine_path=QUARANTINE_FILE):
+    # تبدیل مبالغ اعشاری قالب ۱ به صدم تومان؛ باید با قفل JsonStorage اجرا شود. فایل‌های تبدیل‌شده ابتدا با
+    # پسوند .v2 نوشته و در META_FILE فهرست می‌شوند و سپس جایگزین اصلی‌ها می‌شوند، پس اگر برنامه وسط کار
+    # قطع شود finish_migration کار را تمام می‌کند و هیچ فایلی دو بار تبدیل نمی‌شود. خروجی: تعداد رکوردهای کنارگذاشته
+    journal = Journal(journal_path)
+    journal.open()
+    pending = []
+    seq_ops = []
+    quarantine = []
+    for file_path in MONEY_FIELDS:
+        next_id, records = read_records(file_path, journal)
+        rows = []
+        for record in records:
+            next_id = max(next_id, record["id"] + 1)
+            if convert_money(file_path, record, quarantine):
+                rows.append(record)
+        seq_ops.append((file_path, "seq", {"next_id": next_id}))
+        if rows or os.path.exists(file_path):
+            save_data(rows, file_path + ".v2")
+            pending.append(file_path)
+    if quarantine:
+        save_data(quarantine_content(quarantine, quarantine_path), quarantine_path + ".v2")
+        pending.append(quarantine_path)
+    write_atomic(journal_path + ".v2", journal.base_line(seq_ops))
+    pending.append(journal_path)
+    write_meta({"format": FORMAT_VERSION, "pending": pending, "quarantined": len(quarantine)}, meta_path)
+    return finish_migration(meta_path)
+
+def finish_migration(meta_path=META_FILE):
+    meta = read_meta(meta_path)
+    for file_path in meta.get("pending", ()):
+        if os.path.exists(file_path + ".v2"):
+            os.replace(file_path + ".v2", file_path)
+    write_meta({"format": meta["format"]}, meta_path)
+    return meta.get("quarantined", 0)
+
+def ensure_json_format(journal_path=JOURNAL_FILE, meta_path=META_FILE):
+    # باید با قفل JsonStorage اجرا شود؛ داده‌های بدون META_FILE از نسخه‌های پیشین و با مبالغ اعشاری‌اند.
+    # خروجی: تعداد رکوردهایی که در ارتقا کنار گذاشته شدند
+    meta = read_meta(meta_path)
+    if meta is None:
+        if any(os.path.exists(f) for f in (*MONEY_FIELDS, journal_path)):
+            return migrate_json_money(journal_path, meta_path)
+        write_meta({"format": FORMAT_VERSION}, meta_path)
+    elif meta.get("pending"):
+        return finish_migration(meta_path)
+    elif meta.get("format", 1) > FORMAT_VERSION:
+        raise StorageError("فایل‌های داده با نسخه جدیدتری از برنامه ساخته شده‌اند.")
+    elif meta.get("format", 1) < FORMAT_VERSION:
+        return migrate_json_money(journal_path, meta_path)
+    return 0
+
+class JsonStorage:
+    # فایل‌های JSON به همراه ژورنال تغییرات. چند برنامه می‌توانند هم‌زمان از یک پوشه استفاده کنند: هر نوشتن
+    # با قفل فایل انجام می‌شود و پیش از آن خطوطی که برنامه‌های دیگر به ژورنال افزوده‌اند خوانده و در incoming
+    # گذاشته می‌شوند تا LedgerService آن‌ها را به داده‌های حافظه اضافه کند
+    def __init__(self, journal_path=JOURNAL_FILE):
+        self.journal = Journal(journal_path)
+        self.lock = FileLock(journal_path + ".lock")
+        # شمارنده شناسه‌های رزروشده با قفل کوتاه خودش، جدا از قفل ژورنال که فشرده‌سازی در تمام مدت نوشتن
+        # فایل‌های اصلی نگه می‌دارد؛ رزرو شناسه در رشته پنجره انجام می‌شود و نباید پشت آن منتظر بماند
+        self.ids_path = journal_path + ".ids"
+        self.ids_lock = FileLock(self.ids_path + ".lock")
+        # فایل‌هایی که از آخرین فشرده‌سازی در ژورنال تغییر کرده‌اند
+        self.dirty = set()
+        # بزرگ‌ترین شناسه ثبت یا رزروشده هر فایل در ژورنال
+        self.next_ids = {}
+        self.incoming = []
+        self.incoming_lock = threading.Lock()
+        # تعداد عملیات دریافت‌شده از برنامه‌های دیگر؛ stale یعنی برنامه دیگری پیش از دریافت آن‌ها فشرده‌سازی کرده است
+        self.received = 0
+        self.stale = False
+        with self.lock:
+            # تعداد رکوردهایی که در ارتقای قالب به QUARANTINE_FILE منتقل شدند
+            self.quarantined = ensure_json_format(journal_path)
+            self.track(self.journal.open())
+
+    def track(self, ops):
+        for file_path, op, record in ops:
+            self.dirty.add(file_path)
+            if op == "delete":
+                continue
+            next_id = record["next_id"] if op == "seq" else record["id"] + 1
+            if next_id > self.next_ids.get(file_path, 1):
+                self.next_ids[file_path] = next_id
+
+    def scan(self):
+        # باید با قفل فراخوانی شود
+        if not self.journal.changed():
+            return
+        ops, continuous = self.journal.read_tail()
+        if not continuous:
+            self.stale = True
+        self.track(ops)
+        if ops:
+            with self.incoming_lock:
+                self.incoming.extend(ops)
+                self.received += len(ops)
+
+    def changed(self):
+        return self.journal.changed()
+
+    def sync(self):
+        if self.journal.changed():
+            with self.lock:
+                self.scan()
+
+    def take_changes(self):
+        with self.incoming_lock:
+            ops, self.incoming = self.incoming, []
+        return ops
+
+    def reserve(self, file_path, next_id, count):
+        # شناسه‌های [start, start + count) فقط به این برنامه تعلق دارند. شناسه‌های ثبت‌شده در داده‌ها هم در
+        # next_id و next_ids آمده‌اند، پس اگر فایل شمارنده از دست برود فقط شناسه‌های رزروشده و استفاده‌نشده دوباره رزرو می‌شوند
+        with self.ids_lock:
+            try:
+                with open(self.ids_path, "r", encoding="utf-8") as f:
+                    reserved = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                reserved = {}
+            start = max(next_id, self.next_ids.get(file_path, 1), reserved.get(file_path, 1))
+            reserved[file_path] = start + count
+            write_atomic(self.ids_path, json.dumps(reserved))
+        return start
+
+    def load(self, file_path):
+        if self.journal.ops:
+            self.dirty.add(file_path)
+        return load_data(file_path, self.journal)
+
+    def stream(self, file_path):
+        if self.journal.ops:
+            self.dirty.add(file_path)
+        return read_records(file_path, self.journal)
+
+    def commit(self, ops):
+        with self.lock:
+            self.scan()
+            self.journal.append(ops)
+            self.track(ops)
+
+    def needs_compaction(self):
+        journal = self.journal
+        return journal.ops >= COMPACT_THRESHOLD_OPS or journal.offset - journal.base_end >= COMPACT_THRESHOLD_BYTES
+
+    @timed("compact")
+    def compact(self, collections, merged):
+        # collections: مسیر فایل → (رکوردها، شمارنده شناسه)؛ merged: تعداد عملیات دریافتی که در collections آمده است.
+        # اگر تغییری از برنامه‌های دیگر هنوز در collections نیامده باشد فشرده‌سازی انجام نمی‌شود (False)
+        with self.lock:
+            self.scan()
+            if self.stale or merged != self.received:
+                return False
+            for file_path in self.dirty & set(collections):
+                save_data(collections[file_path][0], file_path)
+            # شمارنده شناسه‌ها (همراه شناسه‌های رزروشده) در ژورنال جدید نگه داشته می‌شود
+            self.journal.reset([(file_path, "seq", {"next_id": max(next_id, self.next_ids.get(file_path, 1))})
+                                for file_path, (_, next_id) in collections.items()], COMPACT_KEEP_BYTES)
+            self.dirty.clear()
+            return True
+
+class SqliteStorage:
+    # هر فایل JSON معادل یک جدول است و هر تغییر یک تراکنش تک‌ردیفی. جایگزین فایل‌ها و ژورنال است و نیازی به
+    # فشرده‌سازی ندارد. تراکنش‌ها در حافظه بارگذاری نمی‌شوند: SqliteLedger صفحه‌ها، فیلترها و جمع‌ها را با نمایه‌های
+    # date، type و category از پایگاه می‌خواند. هر ثبت در جدول changes هم نوشته می‌شود تا برنامه‌های دیگر مانند
+    # ژورنال JSON تغییرات را دریافت و به پس‌اندازها، اهداف و تاریخچه حافظه اعمال کنند
+    TABLES = {
+        DATA_FILE: ("transactions", ("id", "date", "type", "amount", "category", "description")),
+        SAVINGS_FILE: ("savings", ("id", "amount", "date")),
+        GOALS_FILE: ("goals", ("id", "name", "target_amount", "current_amount", "deadline")),
+        HISTORY_FILE: ("history", ("id", "label", "undone", "ops")),
+    }
+    # ستون‌هایی که به صورت متن JSON ذخیره می‌شوند
+    JSON_COLUMNS = {"ops"}
+    # مبالغ به صدم تومان در ستون‌های INTEGER (ستون REAL عدد صحیح را به اعشاری تبدیل می‌کند)
+    SCHEMA = (
+        """CREATE TABLE IF NOT EXISTS transactions (
+               id INTEGER PRIMARY KEY, date TEXT NOT NULL, type TEXT NOT NULL,
+               amount INTEGER NOT NULL, category TEXT, description TEXT)""",
+        # فیلتر نوع یا دسته‌بندی همراه بازه تاریخ و ترتیب تاریخ از یک نمایه خوانده می‌شود و جمع‌ها
+        # (SUM ... GROUP BY type) فقط از نمایه type
+        "CREATE INDEX IF NOT EXISTS transactions_date ON transactions(date)",
+        "CREATE INDEX IF NOT EXISTS transactions_type_date ON transactions(type, date, amount)",
+        "CREATE INDEX IF NOT EXISTS transactions_category_date ON transactions(category, date)",
+        """CREATE TABLE IF NOT EXISTS savings (
+               id INTEGER PRIMARY KEY, amount INTEGER NOT NULL, date TEXT NOT NULL)""",
+        """CREATE TABLE IF NOT EXISTS goals (
+               id INTEGER PRIMARY KEY, name TEXT NOT NULL, target_amount INTEGER NOT NULL,
+               current_amount INTEGER NOT NULL, deadline TEXT NOT NULL)""",
+        "CREATE TABLE IF NOT EXISTS sequences (name TEXT PRIMARY KEY, next_id INTEGER NOT NULL)",
+        """CREATE TABLE IF NOT EXISTS history (
+               id INTEGER PRIMARY KEY, label TEXT NOT NULL, undone INTEGER NOT NULL, ops TEXT NOT NULL)""",
+        # AUTOINCREMENT شماره‌ها را پشت سر هم و بدون استفاده دوباره نگه می‌دارد، پس جای خالی یعنی تغییرات حذف‌شده
+        """CREATE TABLE IF NOT EXISTS changes (
+               seq INTEGER PRIMARY KEY AUTOINCREMENT, writer TEXT NOT NULL, file TEXT NOT NULL,
+               op TEXT NOT NULL, record TEXT NOT NULL)""",
+    )
+    # نمایه متنی توضیحات با FTS5 که تریگرها آن را با transactions هم‌گام نگه می‌دارند؛ واژه‌ها مانند tokenize
+    # (حروف، ارقام و _) جدا می‌شوند. اگر SQLite بدون FTS5 ساخته شده باشد جستجو با تابع matches روی هر ردیف انجام می‌شود
+    TEXT_SCHEMA = (
+        """CREATE VIRTUAL TABLE IF NOT EXISTS transactions_text USING fts5(
+               description, content='transactions', content_rowid='id', tokenize="unicode61 remove_diacritics 0 tokenchars '_'")""",
+        """CREATE TRIGGER IF NOT EXISTS transactions_text_insert AFTER INSERT ON transactions BEGIN
+               INSERT INTO transactions_text (rowid, description) VALUES (new.id, new.description); END""",
+        """CREATE TRIGGER IF NOT EXISTS transactions_text_delete AFTER DELETE ON transactions BEGIN
+               INSERT INTO transactions_text (transactions_text, rowid, description) VALUES ('delete', old.id, old.description); END""",
+        """CREATE TRIGGER IF NOT EXISTS transactions_text_update AFTER UPDATE ON transactions BEGIN
+               INSERT INTO transactions_text (transactions_text, rowid, description) VALUES ('delete', old.id, old.description);
+               INSERT INTO transactions_text (rowid, description) VALUES (new.id, new.description); END""",
+    )
+
+    def __init__(self, path=DB_FILE):
+        # اتصال بین رشته پنجره، رشته ذخیره‌سازی و رشته ورود گروهی مشترک است و با lock استفاده می‌شود
+        self.path = path
+        self.stale = False
+        self.quarantined = 0
+        # تغییراتی که همین برنامه در changes نوشته است دوباره دریافت نمی‌شوند
+        self.writer = os.urandom(8).hex()
+        self.lock = threading.RLock()
+        self.incoming = []
+        # با هر ثبت یا تغییر دریافتی زیاد می‌شود تا SqliteLedger نتیجه‌های نگه‌داشته‌شده را کنار بگذارد
+        self.generation = 0
+        self.fts = False
+        self.conn = sqlite3.connect(path, timeout=LOCK_TIMEOUT, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.create_function("matches", 2, self.matches, deterministic=True)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] != FORMAT_VERSION:
+            self.upgrade()
+        else:
+            with self.conn:
+                self.create_schema()
+        # آخرین تغییر changes که دریافت شده و مقدار PRAGMA data_version در آخرین بررسی
+        self.seen = self.conn.execute("SELECT COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'changes'), 0)").fetchone()[0]
+        self.version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    @staticmethod
+    def matches(description, text):
+        # تابع SQL جستجوی متنی با همان قاعده LedgerIndex
+        return matches_tokens(description or "", search_tokens(text))
+
+    def create_schema(self):
+        # جدول‌ها و نمایه‌هایی که پس از ساخت پایگاه به SCHEMA اضافه شده‌اند. در پایگاهی که پیش از نمایه‌ها ساخته
+        # شده تاریخ‌ها یک بار به شکل yyyy-mm-dd درمی‌آیند و نمایه متنی از ردیف‌های موجود ساخته می‌شود
+        conn = self.conn
+        existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master")}
+        for statement in self.SCHEMA:
+            conn.execute(statement)
+        if "transactions_type_date" not in existing:
+            rows = conn.execute("SELECT id, date FROM transactions WHERE length(date) != 10").fetchall()
+            conn.executemany("UPDATE transactions SET date = ? WHERE id = ?", ((canonical_date(r["date"]), r["id"]) for r in rows))
+        try:
+            for statement in self.TEXT_SCHEMA:
+                conn.execute(statement)
+        except sqlite3.OperationalError:
+            # no such module: fts5
+            return
+        self.fts = True
+        if "transactions_text" not in existing:
+            conn.execute("INSERT INTO transactions_text (transactions_text) VALUES ('rebuild')")
+
+    def where(self, start=None, end=None, ttype=None, category=None, text=""):
+        # معادل filter_records برای پرس‌وجوی SQLite: (شرط WHERE، پارامترها). تاریخ‌ها به شکل yyyy-mm-dd ذخیره
+        # می‌شوند، پس مقایسه متنی همان مقایسه تاریخ است و با نمایه‌ها انجام می‌شود
+        conditions = []
+        params = []
+        for condition, value in (("date >= ?", start), ("date <= ?", end)):
+            if value is not None:
+                conditions.append(condition)
+                params.append(ordinal_date(value))
+        for condition, value in (("type = ?", ttype), ("category = ?", category)):
+            if value is not None:
+                conditions.append(condition)
+                params.append(value)
+        tokens = search_tokens(text)
+        if tokens and self.fts:
+            # هر واژه جستجو پیشوند یکی از واژه‌های توضیحات است
+            conditions.append("id IN (SELECT rowid FROM transactions_text WHERE transactions_text MATCH ?)")
+            params.append(" AND ".join(f'"{token}"*' for token in tokens))
+        elif tokens:
+            conditions.append("matches(description, ?)")
+            params.append(text)
+        return (" WHERE " + " AND ".join(conditions) if conditions else ""), params
+
+    def upgrade(self):
+        # پایگاه جدید ساخته می‌شود؛ در پایگاه قالب ۱ جدول‌ها با ستون‌های INTEGER از نو ساخته و مبالغ تبدیل می‌شوند.
+        # همه در یک تراکنش است و برنامه دیگری که هم‌زمان باز شده پس از گرفتن قفل دوباره نسخه را می‌خواند
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version > FORMAT_VERSION:
+                raise StorageError("پایگاه داده با نسخه جدیدتری از برنامه ساخته شده است.")
+            existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            old = {}
+            if version < FORMAT_VERSION:
+                for file_path, (table, _) in self.TABLES.items():
+                    if table in existing:
+                        old[file_path] = conn.execute(f"SELECT * FROM {table}").fetchall()
+                        conn.execute(f"DROP TABLE {table}")
+            self.create_schema()
+            quarantine = []
+            for file_path, rows in old.items():
+                table, columns = self.TABLES[file_path]
+                placeholders = ", ".join("?" for _ in columns)
+                records = (dict(row) for row in rows)
+                conn.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})",
+                                 (self.values(file_path, r) for r in records if convert_money(file_path, r, quarantine)))
+            if old and self.fts:
+                # DROP TABLE تریگرها را اجرا نمی‌کند و نمایه متنی ممکن است ردیف‌های جدول قبلی را داشته باشد
+                conn.execute("INSERT INTO transactions_text (transactions_text) VALUES ('rebuild')")
+            if quarantine:
+                # پیش از COMMIT نوشته می‌شود؛ اگر ثبت ناموفق باشد ارتقای بعدی همین رکوردها را دوباره کنار می‌گذارد
+                save_data(quarantine_content(quarantine), QUARANTINE_FILE)
+            conn.execute(f"PRAGMA user_version = {FORMAT_VERSION}")
+            conn.execute("COMMIT")
+            self.quarantined = len(quarantine)
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def reader(self):
+        # اتصال جداگانه برای خواندن در رشته دیگر؛ حالت WAL خواندن هم‌زمان با نوشتن را ممکن می‌کند
+        conn = sqlite3.connect(self.path)
+        conn.row_factory = sqlite3.Row
+        conn.create_function("matches", 2, self.matches, deterministic=True)
+        return conn
+
+    def fetch(self, sql, params=()):
+        with self.lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def next_id(self, file_path):
+        table, _ = self.TABLES[file_path]
+        rows = self.fetch("SELECT next_id FROM sequences WHERE name = ?", (table,))
+        return rows[0]["next_id"] if rows else 1
+
+    def load(self, file_path):
+        table, _ = self.TABLES[file_path]
+        rows = self.fetch(f"SELECT * FROM {table} ORDER BY id")
+        return RecordList((self.row_record(r) for r in rows), self.next_id(file_path))
+
+    def row_record(self, row):
+        record = dict(row)
+        for column in self.JSON_COLUMNS.intersection(record):
+            record[column] = json.loads(record[column])
+        return record
+
+    def stream(self, file_path):
+        table, _ = self.TABLES[file_path]
+
+        def records():
+            conn = self.reader()
+            try:
+                for r in conn.execute(f"SELECT * FROM {table} ORDER BY id"):
+                    yield dict(r)
+            finally:
+                conn.close()
+
+        return self.next_id(file_path), records()
+
+    def select(self, criteria, order="date, id"):
+        # تراکنش‌های منطبق با معیارهای transaction_criteria برای خروجی در رشته دیگر؛ فیلتر در خود پایگاه اجرا می‌شود
+        where, params = self.where(**criteria)
+        conn = self.reader()
+        try:
+            for r in conn.execute(f"SELECT * FROM transactions{where} ORDER BY {order}", params):
+                yield dict(r)
+        finally:
+            conn.close()
+
+    def values(self, file_path, record):
+        _, columns = self.TABLES[file_path]
+        values = [json.dumps(record[c], ensure_ascii=False) if c in self.JSON_COLUMNS else record[c] for c in columns]
+        if file_path == DATA_FILE:
+            values[1] = canonical_date(values[1])
+        return tuple(values)
+
+    def write(self, file_path, op, record):
+        table, columns = self.TABLES[file_path]
+        if op == "delete":
+            self.conn.execute(f"DELETE FROM {table} WHERE id = ?", (record["id"],))
+            return
+        # برخلاف INSERT OR REPLACE، به‌روزرسانی ردیف موجود تریگر UPDATE نمایه متنی را اجرا می‌کند
+        placeholders = ", ".join("?" for _ in columns)
+        updates = ", ".join(f"{c} = excluded.{c}" for c in columns[1:])
+        self.conn.execute(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders}) ON CONFLICT(id) DO UPDATE SET {updates}",
+                          self.values(file_path, record))
+
+    def commit(self, ops):
+        if not ops:
+            return
+        # BEGIN IMMEDIATE قفل نوشتن را پیش از خواندن تغییرات برنامه‌های دیگر می‌گیرد تا تغییری بین خواندن و ثبت جا نماند
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.scan()
+                next_ids = {}
+                for file_path, op, record in ops:
+                    self.write(file_path, op, record)
+                    if op != "delete":
+                        table, _ = self.TABLES[file_path]
+                        next_ids[table] = max(next_ids.get(table, 1), record["id"] + 1)
+                # شمارنده هر جدول یک بار در هر ثبت جلو می‌رود، نه به ازای هر ردیف
+                self.conn.executemany("INSERT INTO sequences (name, next_id) VALUES (?, ?) "
+                                      "ON CONFLICT(name) DO UPDATE SET next_id = max(next_id, excluded.next_id)",
+                                      next_ids.items())
+                self.conn.executemany("INSERT INTO changes (writer, file, op, record) VALUES (?, ?, ?, ?)",
+                                      ((self.writer, file_path, op, json.dumps(record, ensure_ascii=False)) for file_path, op, record in ops))
+                last = self.conn.execute("SELECT MAX(seq) FROM changes").fetchone()[0]
+                self.conn.execute("DELETE FROM changes WHERE seq <= ?", (last - CHANGE_LOG_KEEP,))
+                self.conn.commit()
+            except BaseException:
+                self.conn.rollback()
+                raise
+            self.seen = last
+            self.generation += 1
+
+    def reserve(self, file_path, next_id, count):
+        # اتصال جداگانه تا تراکنش رشته ذخیره‌سازی را نیمه‌کاره ثبت نکند؛ SQLite خود نویسنده‌ها را پشت سر هم اجرا می‌کند
+        table, _ = self.TABLES[file_path]
+        conn = sqlite3.connect(self.path, timeout=LOCK_TIMEOUT, isolation_level=None)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT next_id FROM sequences WHERE name = ?", (table,)).fetchone()
+            start = max(next_id, row[0] if row else 1)
+            conn.execute("INSERT OR REPLACE INTO sequences (name, next_id) VALUES (?, ?)", (table, start + count))
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        return start
+
+    def scan(self):
+        # باید با lock فراخوانی شود. اگر برنامه‌های دیگر بیش از CHANGE_LOG_KEEP تغییر پس از آخرین دریافت ثبت کرده
+        # باشند بخشی از آن‌ها حذف شده است (stale)
+        rows = self.conn.execute("SELECT seq, writer, file, op, record FROM changes WHERE seq > ? ORDER BY seq", (self.seen,)).fetchall()
+        if not rows:
+            return
+        if rows[0]["seq"] != self.seen + 1:
+            self.stale = True
+        self.seen = rows[-1]["seq"]
+        ops = [(r["file"], r["op"], json.loads(r["record"])) for r in rows if r["writer"] != self.writer]
+        if ops:
+            self.incoming.extend(ops)
+            self.generation += 1
+
+    def changed(self):
+        # PRAGMA data_version با هر ثبت از اتصال دیگری (برنامه دیگر یا رزرو شناسه) تغییر می‌کند
+        with self.lock:
+            version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        if version == self.version:
+            return False
+        self.version = version
+        return True
+
+    def sync(self):
+        with self.lock:
+            self.scan()
+
+    def take_changes(self):
+        with self.lock:
+            ops, self.incoming = self.incoming, []
+        return ops
+
+    def needs_compaction(self):
+        return False
+
+    def compact(self, collections, merged):
+        return True
+
+class SqliteRows:
+    # نتیجه یک پرس‌وجوی تراکنش‌ها به صورت دنباله (مانند LedgerSlots) بدون بارگذاری همه ردیف‌ها: تعداد با COUNT و
+    # ردیف‌ها در صفحه‌های SQL_PAGE_ROWS تایی با LIMIT/OFFSET خوانده و تا تغییر بعدی پایگاه نگه داشته می‌شوند
+    def __init__(self, ledger, criteria, order):
+        self.ledger = ledger
+        self.where, self.params = ledger.storage.where(**criteria)
+        self.order = order
+        self.generation = None
+        self.count = None
+        self.pages = {}
+
+    def ensure(self):
+        self.ledger.refresh()
+        if self.generation != self.ledger.generation:
+            self.generation = self.ledger.generation
+            self.count = None
+            self.pages = {}
+
+    def __len__(self):
+        self.ensure()
+        if self.count is None:
+            self.count = self.ledger.storage.fetch(f"SELECT COUNT(*) FROM transactions{self.where}", self.params)[0][0]
+        return self.count
+
+    def page(self, number):
+        page = self.pages.get(number)
+        if page is None:
+            if len(self.pages) >= SQL_PAGE_CACHE:
+                del self.pages[next(iter(self.pages))]
+            rows = self.ledger.storage.fetch(f"SELECT * FROM transactions{self.where} ORDER BY {self.order} LIMIT ? OFFSET ?",
+                                             (*self.params, SQL_PAGE_ROWS, number * SQL_PAGE_ROWS))
+            page = self.pages[number] = [dict(r) for r in rows]
+        return page
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        page = self.page(i // SQL_PAGE_ROWS)
+        # برنامه دیگری ممکن است پس از COUNT ردیفی را حذف کرده باشد؛ مانند جایگاه حذف‌شده LedgerSlots
+        return page[i % SQL_PAGE_ROWS] if i % SQL_PAGE_ROWS < len(page) else None
+
+class SqliteLedger:
+    # تراکنش‌های پایگاه SQLite با رابط ColumnarLedger (get، append، remove، slots) و query و summarize به جای
+    # LedgerIndex و LedgerAggregator. ردیف‌ها در حافظه نگه داشته نمی‌شوند و تغییرات با ثبت UnitOfWork در
+    # SqliteStorage نوشته می‌شوند، پس append و remove فقط شمارنده شناسه را به‌روز می‌کنند و get رکورد مستقل برمی‌گرداند.
+    # وقتی ثبت در رشته دیگری انجام می‌شود settle پیش از هر خواندن تا ثبت تغییرات در صف صبر می‌کند
+    TYPES = ColumnarLedger.TYPES
+
+    def __init__(self, storage):
+        self.storage = storage
+        self.next_id = storage.next_id(DATA_FILE)
+        self.generation = storage.generation
+        self.settle = None
+        # جمع درآمد و هزینه تا تغییر بعدی پایگاه
+        self.sums = None
+        self.all_rows = SqliteRows(self, {}, "id")
+
+    def refresh(self):
+        if self.settle is not None:
+            self.settle()
+        if self.generation != self.storage.generation:
+            self.generation = self.storage.generation
+            self.sums = None
+
+    @property
+    def slots(self):
+        return self.all_rows
+
+    def __len__(self):
+        return len(self.all_rows)
+
+    def __iter__(self):
+        # به ترتیب شناسه در تکه‌های SQL_PAGE_ROWS تایی تا اتصال در تمام مدت پیمایش گرفته نماند
+        self.refresh()
+        last = None
+        while True:
+            if last is None:
+                rows = self.storage.fetch("SELECT * FROM transactions ORDER BY id LIMIT ?", (SQL_PAGE_ROWS,))
+            else:
+                rows = self.storage.fetch("SELECT * FROM transactions WHERE id > ? ORDER BY id LIMIT ?", (last, SQL_PAGE_ROWS))
+            if not rows:
+                return
+            for r in rows:
+                yield dict(r)
+            last = rows[-1]["id"]
+
+    def get(self, rid):
+        self.refresh()
+        rows = self.storage.fetch("SELECT * FROM transactions WHERE id = ?", (rid,))
+        return dict(rows[0]) if rows else None
+
+    def append(self, record):
+        self.next_id = max(self.next_id, record["id"] + 1)
+
+    def remove(self, rid):
+        # رکورد پیش از حذف؛ حذف با ثبت UnitOfWork انجام می‌شود
+        return self.get(rid)
+
+    def allocate_id(self):
+        rid = self.next_id
+        self.next_id += 1
+        return rid
+
+    @property
+    def category_names(self):
+        self.refresh()
+        return [r[0] for r in self.storage.fetch("SELECT DISTINCT category FROM transactions ORDER BY category")]
+
+    def type_sums(self):
+        self.refresh()
+        if self.sums is None:
+            sums = {r[0]: r[1] for r in self.storage.fetch("SELECT type, SUM(amount) FROM transactions GROUP BY type")}
+            self.sums = (sums.get("income", 0), sums.get("expense", 0))
+        return self.sums
+
+    def query(self, start=None, end=None, ttype=None, category=None, text=""):
+        # خروجی: تراکنش‌های منطبق مرتب بر اساس تاریخ، مانند LedgerIndex.query
+        return SqliteRows(self, {"start": start, "end": end, "ttype": ttype, "category": category, "text": text}, "date, id")
+
+    @timed("summarize")
+    def summarize(self, by, start=None, end=None):
+        # مانند LedgerAggregator.summarize با GROUP BY روی ستون date (yyyy-mm-dd) یا category
+        key = {"day": "date", "month": "substr(date, 1, 7)", "year": "substr(date, 1, 4)", "category": "category"}[by]
+        where, params = self.storage.where(start, end)
+        self.refresh()
+        rows = self.storage.fetch(f"SELECT {key}, SUM(CASE WHEN type = 'income' THEN amount ELSE 0 END), "
+                                  f"SUM(CASE WHEN type = 'expense' THEN amount ELSE 0 END) FROM transactions{where} GROUP BY 1 ORDER BY 1", params)
+        if by == "category":
+            return sorted((r[0] or "-", r[1], r[2]) for r in rows)
+        return [tuple(r) for r in rows]
+
+def remove_database(path):
+    for suffix in ("", "-wal", "-shm", "-journal"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+def migrate_json_to_sqlite(db_path=DB_FILE, journal_path=JOURNAL_FILE):
+    # انتقال یک‌باره داده‌های JSON (به همراه ژورنال) به SQLite. پایگاه در فایل موقت ساخته و پس از کامل شدن جایگزین
+    # می‌شود، پس اگر انتقال قطع شود پایگاه خالی باقی نمی‌ماند و اجرای بعدی دوباره انتقال را انجام می‌دهد
+    source = JsonStorage(journal_path)
+    with source.lock:
+        # برنامه دیگری ممکن است هم‌زمان انتقال را تمام کرده باشد
+        if os.path.exists(db_path):
+            return SqliteStorage(db_path)
+        tmp_path = db_path + ".tmp"
+        remove_database(tmp_path)
+        target = SqliteStorage(tmp_path)
+        try:
+            with target.conn:
+                for file_path in SqliteStorage.TABLES:
+                    records = source.load(file_path)
+                    for record in records:
+                        target.write(file_path, "insert", record)
+                    table, _ = SqliteStorage.TABLES[file_path]
+                    target.conn.execute("INSERT OR REPLACE INTO sequences (name, next_id) VALUES (?, ?)", (table, records.next_id))
+            # بستن آخرین اتصال WAL را در پایگاه می‌نویسد تا فایل اصلی به تنهایی کامل باشد
+            target.conn.close()
+            os.replace(tmp_path, db_path)
+        except BaseException:
+            target.conn.close()
+            remove_database(tmp_path)
+            raise
+    return SqliteStorage(db_path)
+
+def open_storage(backend=STORAGE_BACKEND):
+    if backend != "sqlite":
+        return JsonStorage()
+    if not os.path.exists(DB_FILE) and any(os.path.exists(f) for f in (DATA_FILE, SAVINGS_FILE, GOALS_FILE, JOURNAL_FILE)):
+        return migrate_json_to_sqlite()
+    return SqliteStorage()
+
+class LedgerTotals:
+    # جمع درآمد و هزینه که با هر تغییر به‌روز می‌شود تا نیازی به پیمایش کل داده‌ها نباشد؛ جمع پس‌انداز را
+    # خود SavingsLots نگه می‌دارد و اینجا فقط خوانده می‌شود
+    def __init__(self, data, savings):
+        self.rebuild(data, savings)
+
+    @timed("totals_rebuild")
+    def rebuild(self, data, savings):
+        self.income = sum(t["amount"] for t in data if t["type"] == "income")
+        self.expense = sum(t["amount"] for t in data if t["type"] == "expense")
+        self.lots = savings
+
+    @property
+    def savings(self):
+        return self.lots.total
+
+    @property
+    @timed("balance")
+    def balance(self):
+        return self.income - self.expense - self.savings
+
+    def add_transaction(self, t):
+        if t["type"] == "income":
+            self.income += t["amount"]
+        else:
+            self.expense += t["amount"]
+
+    def remove_transaction(self, t):
+        if t["type"] == "income":
+            self.income -= t["amount"]
+        else:
+            self.expense -= t["amount"]
+
+    @timed("totals_verify")
+    def verify(self, data, savings):
+        # با python -O هم اجرا می‌شود؛ ناسازگاری به صورت LedgerError گزارش می‌شود
+        rebuilt = LedgerTotals(data, savings)
+        expected = {"income": rebuilt.income, "expense": rebuilt.expense, "savings": sum(s["amount"] for s in savings)}
+        mismatches = [f"{name}: {getattr(self, name)} != {wanted}" for name, wanted in expected.items() if getattr(self, name) != wanted]
+        if mismatches:
+            raise LedgerError("جمع‌ها با داده‌ها یکسان نیستند: " + "، ".join(mismatches))
+
+class SqliteTotals(LedgerTotals):
+    # جمع درآمد و هزینه از SqliteLedger.type_sums (SUM ... GROUP BY type روی نمایه (type, amount)) که پس از هر ثبت
+    # دوباره پرس‌وجو می‌شود؛ افزودن و حذف تراکنش در اینجا چیزی را تغییر نمی‌دهد
+    def rebuild(self, data, savings):
+        self.data = data
+        self.lots = savings
+
+    @property
+    def income(self):
+        return self.data.type_sums()[0]
+
+    @property
+    def expense(self):
+        return self.data.type_sums()[1]
+
+    def add_transaction(self, t):
+        pass
+
+    def remove_transaction(self, t):
+        pass
+
+def validate_date(date_str):
+    # date_ordinal نتیجه تجزیه تاریخ‌های معتبر را نگه می‌دارد
+    try:
+        date_ordinal(date_str)
+        return True
+    except ValueError:
+        return False
+
+class GoalEngine:
+    # مهلت تجزیه‌شده و درصد پیشرفت هر هدف نگه داشته می‌شود و مرزهای «مهلت نزدیک» و «منقضی» در یک
+    # min-heap قرار می‌گیرند تا زمان‌بند فقط در اولین مرز بعدی بیدار شود. ورودی‌های کهنه هیپ (هدف حذف‌شده،
+    # مهلت تغییرکرده یا هدف کامل‌شده) هنگام برداشتن کنار گذاشته می‌شوند؛ هدف کامل‌شده‌ای که دوباره ناتمام شود
+    # (واگرد تخصیص) مرزهایش را دوباره در هیپ می‌گذارد
+    NEAR, EXPIRED = 1, 2
+
+    def __init__(self, goals):
+        self.goals = goals
+        self.deadlines = {}
+        self.progress = {}
+        self.heap = []
+        for goal in goals:
+            self.update(goal)
+
+    def update(self, goal):
+        gid = goal["id"]
+        finished = self.progress.get(gid, 0) >= 100
+        self.progress[gid] = (goal["current_amount"] / goal["target_amount"]) * 100 if goal["target_amount"] > 0 else 0
+        deadline = date_ordinal(goal["deadline"])
+        if self.deadlines.get(gid) != deadline or (finished and self.progress[gid] < 100):
+            self.deadlines[gid] = deadline
+            heapq.heappush(self.heap, (deadline - NEAR_DEADLINE_DAYS, self.NEAR, gid, deadline))
+            heapq.heappush(self.heap, (deadline, self.EXPIRED, gid, deadline))
+
+    def forget(self, gid):
+        self.deadlines.pop(gid, None)
+        self.progress.pop(gid, None)
+
+    def status(self, gid, today):
+        # today: شماره روز؛ خروجی "active"، "near" یا "expired"
+        days_left = self.deadlines[gid] - today
+        return "active" if days_left > NEAR_DEADLINE_DAYS else "near" if days_left > 0 else "expired"
+
+    def live(self, entry):
+        _, _, gid, deadline = entry
+        return self.deadlines.get(gid) == deadline and self.progress[gid] < 100
+
+    def next_boundary(self):
+        while self.heap and not self.live(self.heap[0]):
+            heapq.heappop(self.heap)
+        return self.heap[0][0] if self.heap else None
+
+    def due(self, today):
+        # مرزهایی که تا امروز رسیده‌اند برداشته می‌شوند؛ برای هر هدف فقط شدیدترین وضعیت برگردانده می‌شود
+        events = {}
+        while self.heap and self.heap[0][0] <= today:
+            entry = heapq.heappop(self.heap)
+            if self.live(entry):
+                events[entry[2]] = max(events.get(entry[2], 0), entry[1])
+        return [(self.goals.get(gid), "near" if kind == self.NEAR else "expired") for gid, kind in events.items()]
+
+    def plan(self, available, today):
+        # تقسیم مبلغ موجود بین اهداف ناتمام به نسبت فوریت (مبلغ باقی‌مانده ÷ روزهای باقی‌مانده)؛ سهم اضافه
+        # هدفی که کامل می‌شود دوباره بین بقیه تقسیم می‌شود. خروجی: فهرست (هدف، مبلغ) مرتب بر اساس مهلت
+        pending = []
+        for goal in self.goals:
+            need = goal["target_amount"] - goal["current_amount"]
+            if need > 0:
+                pending.append((goal, need, need / max(self.deadlines[goal["id"]] - today, 1)))
+        shares = {}
+        while available > 0 and pending:
+            total_weight = sum(weight for _, _, weight in pending)
+            spent = 0
+            remaining = []
+            for goal, need, weight in pending:
+                # سهم‌ها به پایین گرد می‌شوند تا جمعشان از مبلغ موجود بیشتر نشود
+                share = int(available * weight / total_weight)
+                if share >= need:
+                    share = need
+                else:
+                    remaining.append((goal, need - share, weight))
+                shares[goal["id"]] = shares.get(goal["id"], 0) + share
+                spent += share
+            available -= spent
+            if len(remaining) == len(pending):
+                break
+            pending = remaining
+        plan = [(self.goals.get(gid), amount) for gid, amount in shares.items()]
+        plan.sort(key=lambda item: self.deadlines[item[0]["id"]])
+        return [(goal, amount) for goal, amount in plan if amount > 0]
+
+def parse_date(value):
+    if not validate_date(value):
+        raise ValidationError("فرمت تاریخ نامعتبر است (yyyy-mm-dd).")
+    return value
+
+def parse_type(value):
+    ttype = TYPE_NAMES.get(str(value).strip().lower())
+    if ttype is None:
+        raise ValidationError("نوع تراکنش نامعتبر است.")
+    return ttype
+
+def parse_amount(value, positive_message="مبلغ باید مثبت باشد."):
+    # مبلغ به تومان → عدد صحیح به صدم تومان
+    amount = to_minor(value)
+    if amount <= 0:
+        raise ValidationError(positive_message)
+    return amount
+
+def today():
+    return datetime.now().strftime("%Y-%m-%d")
+
+class LedgerService:
+    # منطق مالی بدون رابط کاربری: هر عملیات ورودی را بررسی و داده‌ها و جمع‌ها را به‌روز می‌کند و
+    # تغییرات را با یک UnitOfWork ثبت می‌کند. به جای نمایش پیام، LedgerError برگردانده می‌شود
+    def __init__(self, storage=None, persist=None, load_transactions=True, on_load_error=None, id_block=ID_BLOCK):
+        self.storage = storage or open_storage()
+        if self.storage.quarantined:
+            # فقط یک بار، در اجرایی که قالب داده‌ها را ارتقا داده است
+            self.warn(StorageError(f"{self.storage.quarantined:,} رکورد با مبلغ نامعتبر کنار گذاشته و در {QUARANTINE_FILE} نگه داشته شد."),
+                      on_load_error)
+        savings = self.load(SAVINGS_FILE, on_load_error)
+        self.savings = SavingsLots(savings, savings.next_id)
+        self.goals = self.load(GOALS_FILE, on_load_error)
+        self.goal_engine = GoalEngine(self.goals)
+        history = self.load(HISTORY_FILE, on_load_error)
+        self.history = OperationLog(history, history.next_id)
+        # با SQLite تراکنش‌ها بارگذاری نمی‌شوند و صفحه‌ها، فیلترها و جمع‌ها از پایگاه خوانده می‌شوند
+        self.paged = isinstance(self.storage, SqliteStorage)
+        if self.paged:
+            self.data = SqliteLedger(self.storage)
+            self.totals = SqliteTotals(self.data, self.savings)
+        else:
+            self.data = ColumnarLedger()
+            self.totals = LedgerTotals(self.data, self.savings)
+        # برنامه گرافیکی ثبت را به رشته ذخیره‌سازی می‌سپارد؛ پیش‌فرض ثبت هم‌زمان است
+        self.persist = persist or self.commit
+        # انتهای بازه شناسه‌های رزروشده هر فایل و تعداد تغییرات دریافتی از برنامه‌های دیگر که اعمال شده است
+        self.reserved = {}
+        self.id_block = id_block
+        self.merged = 0
+        # تراکنش‌های نامعتبری که هنگام بارگذاری نادیده گرفته شدند و پیام چند مورد اول
+        self.rejected = []
+        self.load_errors = []
+        # تراکنش‌ها در حافظه نیستند (ورود گروهی خط فرمان)؛ فشرده‌سازی نباید DATA_FILE را از data بازنویسی کند.
+        # برنامه گرافیکی تراکنش‌ها را خودش بارگذاری و فشرده‌سازی را مستقیم به ذخیره‌سازی می‌سپارد
+        self.partial = not load_transactions
+        if load_transactions and not self.paged:
+            next_id, records = self.storage.stream(DATA_FILE)
+            self.add_loaded(records)
+            self.data.next_id = max(self.data.next_id, next_id)
+            if self.rejected:
+                self.warn(self.quarantine_rejected(), on_load_error)
+
+    @staticmethod
+    def warn(error, on_error=None):
+        if on_error is None:
+            print(f"هشدار: {error}", file=sys.stderr)
+        else:
+            on_error(error)
+
+    def quarantine_rejected(self):
+        # تراکنش‌های نامعتبر در QUARANTINE_FILE نگه داشته می‌شوند تا با فشرده‌سازی بعدی از دست نروند؛ خروجی پیام هشدار
+        try:
+            save_data(quarantine_content([{"file": DATA_FILE, "record": t, "error": "تراکنش نامعتبر"} for t in self.rejected]), QUARANTINE_FILE)
+            kept = f" و در {QUARANTINE_FILE} نگه داشته شد"
+        except (OSError, ValueError) as e:
+            kept = f" (ذخیره در {QUARANTINE_FILE} ممکن نشد: {e})"
+        return StorageError(f"{len(self.rejected):,} تراکنش نامعتبر در {DATA_FILE} نادیده گرفته شد{kept}:\n" + "\n".join(self.load_errors))
+
+    def load(self, file_path, on_error=None):
+        try:
+            return self.storage.load(file_path)
+        except StorageError as e:
+            if on_error is None:
+                raise
+            on_error(e)
+            return RecordList()
+
+    def add_loaded(self, records):
+        count = len(self.data)
+        for t in records:
+            try:
+                self.data.append(t)
+            except ValidationError as e:
+                self.rejected.append(t)
+                if len(self.load_errors) < IMPORT_ERROR_LIMIT:
+                    self.load_errors.append(str(e))
+                if isinstance(t, dict) and type(t.get("id")) is int:
+                    # شناسه تراکنش نامعتبر دوباره استفاده نمی‌شود
+                    self.data.next_id = max(self.data.next_id, t["id"] + 1)
+                continue
+            self.totals.add_transaction(t)
+        if PROFILE:
+            METRICS.add("rows_loaded", len(self.data) - count)
+
+    def commit(self, ops):
+        self.storage.commit([(file_path, op, dict(record)) for file_path, op, record in ops])
+
+    def unit_of_work(self, label=None):
+        # با label عمل در تاریخچه واگرد ثبت می‌شود
+        return UnitOfWork(self.persist, self.remember if label else None, label)
+
+    def remember(self, uow):
+        # عمل جدید عمل‌های واگردشده را از تاریخچه حذف می‌کند؛ تغییرات تاریخچه در همان دسته ژورنال ثبت می‌شوند
+        for entry in self.history.undone():
+            self.history.remove(entry["id"])
+            uow.log(HISTORY_FILE, "delete", {"id": entry["id"]})
+        if len(uow.inverse) > UNDO_MAX_OPS:
+            # عملی که در تاریخچه جا نمی‌شود قابل واگرد نیست و عمل‌های پیش از آن هم دیگر قابل واگرد نیستند
+            evicted = self.history.evict(0)
+        else:
+            entry = {"id": self.allocate_id(HISTORY_FILE, self.history), "label": uow.label, "undone": False, "ops": uow.inverse[::-1]}
+            self.history.append(entry)
+            uow.log(HISTORY_FILE, "insert", entry)
+            evicted = self.history.evict()
+        for entry in evicted:
+            uow.log(HISTORY_FILE, "delete", {"id": entry["id"]})
+
+    def undo(self):
+        entry = self.history.last_done()
+        if entry is None:
+            raise NotFoundError("عملی برای واگرد وجود ندارد.")
+        return self.replay(entry, True)
+
+    def redo(self):
+        entry = self.history.first_undone()
+        if entry is None:
+            raise NotFoundError("عملی برای انجام دوباره وجود ندارد.")
+        return self.replay(entry, False)
+
+    def replay(self, entry, undone):
+        # تغییرات entry اعمال و عکس آن‌ها (برای انجام دوباره یا واگرد بعدی) جایگزین می‌شود؛
+        # خروجی: عمل، شناسه تراکنش‌های تغییرکرده و فایل‌هایی که تغییر کرده‌اند
+        uow = self.unit_of_work()
+        inverse = []
+        transaction_ids = set()
+        files = set()
+        for file_path, op, record in entry["ops"]:
+            old = self.apply_op(file_path, op, record)
+            inverse.append(inverse_op(file_path, op, record, old))
+            uow.log(file_path, op, record)
+            files.add(file_path)
+            if file_path == DATA_FILE:
+                transaction_ids.add(record["id"])
+        entry = dict(entry, undone=undone, ops=inverse[::-1])
+        self.history.put(entry)
+        uow.log(HISTORY_FILE, "update", entry)
+        uow.commit()
+        self.check_totals()
+        return entry, transaction_ids, files
+
+    def collections(self, copy=False):
+        # مسیر فایل → (رکوردها، شمارنده شناسه) برای فشرده‌سازی؛ رکوردها در save_data به JSON تبدیل می‌شوند.
+        # با copy=True خروجی به داده‌های حافظه وابسته نیست و در رشته ذخیره‌سازی خوانده می‌شود: ستون‌های تراکنش‌ها
+        # با کپی آرایه‌ها و بقیه که کوچک‌اند با کپی رکوردها
+        collections = {DATA_FILE: (self.data.copy() if copy else self.data, self.data.next_id)}
+        for file_path, records in ((SAVINGS_FILE, self.savings), (GOALS_FILE, self.goals), (HISTORY_FILE, self.history)):
+            collections[file_path] = ([dict(r) for r in records] if copy else records, records.next_id)
+        return collections
+
+    def compact(self):
+        if self.partial:
+            return False
+        self.storage.sync()
+        if self.storage.needs_compaction():
+            self.merge_changes()
+            return self.storage.compact(self.collections(), self.merged)
+        return False
+
+    def reserve_ids(self, file_path, records, count):
+        # شناسه‌ها در بلوک‌هایی در ذخیره‌سازی رزرو می‌شوند تا دو برنامه هم‌زمان شناسه تکراری نسازند
+        if records.next_id + count > self.reserved.get(file_path, 0):
+            size = max(count, self.id_block)
+            records.next_id = self.storage.reserve(file_path, records.next_id, size)
+            self.reserved[file_path] = records.next_id + size
+
+    def allocate_id(self, file_path, records):
+        self.reserve_ids(file_path, records, 1)
+        return generate_id(records)
+
+    def merge_changes(self):
+        # تغییراتی که برنامه‌های دیگر ثبت کرده‌اند به داده‌ها و جمع‌ها اعمال می‌شود؛
+        # خروجی: شناسه تراکنش‌های تغییرکرده و فایل‌هایی که تغییر کرده‌اند
+        ops = self.storage.take_changes()
+        self.merged += len(ops)
+        transaction_ids = set()
+        files = set()
+        for file_path, op, record in ops:
+            if op == "seq":
+                continue
+            files.add(file_path)
+            if file_path == DATA_FILE:
+                transaction_ids.add(record["id"])
+            self.apply_op(file_path, op, record)
+        if files:
+            self.check_totals()
+        return transaction_ids, files
+
+    def apply_op(self, file_path, op, record):
+        # اعمال یک عملیات ژورنال روی داده‌ها و جمع‌ها؛ خروجی رکورد پیش از تغییر (None اگر وجود نداشت)
+        if file_path == DATA_FILE:
+            return self.merge_transaction(op, record)
+        if file_path == SAVINGS_FILE:
+            if op == "delete":
+                return self.savings.remove(record["id"])
+            return self.savings.put(dict(record))
+        if file_path == GOALS_FILE:
+            if op == "delete":
+                old = self.goals.remove(record["id"])
+                self.goal_engine.forget(record["id"])
+                return old
+            goal = dict(record)
+            old = self.goals.put(goal)
+            self.goal_engine.update(goal)
+            return old
+        if op == "delete":
+            return self.history.remove(record["id"])
+        return self.history.put(dict(record))
+
+    def merge_transaction(self, op, record):
+        if op == "delete":
+            t = self.data.remove(record["id"])
+            if t is not None:
+                self.totals.remove_transaction(t)
+            return t
+        t = self.data.get(record["id"])
+        if t is None:
+            self.data.append(record)
+            self.totals.add_transaction(record)
+            return None
+        old = dict(t)
+        self.totals.remove_transaction(t)
+        for key in ("date", "type", "amount", "category", "description"):
+            if t[key] != record[key]:
+                t[key] = record[key]
+        self.totals.add_transaction(t)
+        return old
+
+    def check_totals(self):
+        if VERIFY_TOTALS:
+            self.totals.verify(self.data, self.savings)
+
+    def new_transaction(self, ttype, date_str, amount, category, description, uow):
+        transaction = {
+            "id": self.allocate_id(DATA_FILE, self.data),
+            "date": date_str,
+            "type": ttype,
+            "amount": amount,
+            "category": category,
+            "description": description
+        }
+        self.data.append(transaction)
+        uow.record(DATA_FILE, "insert", transaction)
+        self.totals.add_transaction(transaction)
+        return transaction
+
+    def add_transaction(self, ttype, date_str, amount, category="", description=""):
+        ttype = parse_type(ttype)
+        parse_date(date_str)
+        amount = parse_amount(amount)
+        uow = self.unit_of_work("ثبت تراکنش")
+        transaction = self.new_transaction(ttype, date_str, amount, category, description, uow)
+        uow.commit()
+        self.check_totals()
+        return transaction
+
+    def edit_transaction(self, tid, ttype=None, date_str=None, amount=None, category=None, description=None):
+        # فیلدهای None بدون تغییر می‌مانند
+        t = self.data.get(tid)
+        if t is None:
+            raise NotFoundError("تراکنش پیدا نشد.")
+        if date_str is not None:
+            parse_date(date_str)
+        if ttype is not None:
+            ttype = parse_type(ttype)
+        if amount is not None:
+            amount = parse_amount(amount)
+        old = dict(t)
+        self.totals.remove_transaction(t)
+        for key, value in (("date", date_str), ("type", ttype), ("amount", amount), ("category", category), ("description", description)):
+            if value is not None:
+                t[key] = value
+        uow = self.unit_of_work("ویرایش تراکنش")
+        uow.record(DATA_FILE, "update", t, old)
+        uow.commit()
+        self.totals.add_transaction(t)
+        self.check_totals()
+        return t
+
+    def delete_transaction(self, tid):
+        t = self.data.remove(tid)
+        if t is None:
+            raise NotFoundError("تراکنش پیدا نشد.")
+        self.totals.remove_transaction(t)
+        uow = self.unit_of_work("حذف تراکنش")
+        uow.record(DATA_FILE, "delete", {"id": tid}, t)
+        uow.commit()
+        self.check_totals()
+        return t
+
+    def drain_savings(self, amount, uow):
+        # برداشت از پس‌اندازها به ترتیب قدیمی‌ترین
+        for op, record, old in self.savings.drain(amount):
+            uow.record(SAVINGS_FILE, op, record, old)
+
+    def add_savings(self, amount):
+        amount = parse_amount(amount, "مبلغ پس‌انداز باید مثبت باشد.")
+        if amount > self.totals.balance:
+            raise InsufficientFundsError("موجودی کافی نیست.")
+        savings_data = {
+            "id": self.allocate_id(SAVINGS_FILE, self.savings),
+            "amount": amount,
+            "date": today()
+        }
+        self.savings.append(savings_data)
+        uow = self.unit_of_work("افزودن پس‌انداز")
+        uow.record(SAVINGS_FILE, "insert", savings_data)
+        uow.commit()
+        self.check_totals()
+        return savings_data
+
+    def release_savings(self, amount):
+        # مبلغ رها‌شده به صورت درآمد به حساب برمی‌گردد
+        amount = parse_amount(amount)
+        if amount > self.totals.savings:
+            raise InsufficientFundsError("مبلغ رها‌سازی بیش از پس‌انداز است.")
+        uow = self.unit_of_work("رها‌سازی پس‌انداز")
+        income_entry = self.new_transaction("income", today(), amount, "رها‌سازی پس‌انداز", f"رها‌سازی {format_money(amount)} تومان از پس‌انداز", uow)
+        self.drain_savings(amount, uow)
+        uow.commit()
+        self.check_totals()
+        return income_entry
+
+    def add_goal(self, name, target_amount, deadline):
+        if not name:
+            raise ValidationError("نام هدف را وارد کنید.")
+        parse_date(deadline)
+        target_amount = parse_amount(target_amount, "مبلغ هدف باید مثبت باشد.")
+        goal = {
+            "id": self.allocate_id(GOALS_FILE, self.goals),
+            "name": name,
+            "target_amount": target_amount,
+            "current_amount": 0,
+            "deadline": deadline
+        }
+        self.goals.append(goal)
+        self.goal_engine.update(goal)
+        uow = self.unit_of_work("افزودن هدف")
+        uow.record(GOALS_FILE, "insert", goal)
+        uow.commit()
+        return goal
+
+    def allocate_to_goal(self, goal_id, amount, source="balance"):
+        # source: "balance" برای برداشت از موجودی یا "savings" برای برداشت از پس‌انداز
+        amount = parse_amount(amount, "مبلغ تخصیص باید مثبت باشد.")
+        g = self.goals.get(goal_id)
+        if g is None:
+            raise NotFoundError("هدف پیدا نشد.")
+        if g["current_amount"] + amount > g["target_amount"]:
+            raise ValidationError("مبلغ تخصیص بیش از مبلغ هدف است.")
+        uow = self.unit_of_work("تخصیص به هدف")
+        if source == "balance":
+            if amount > self.totals.balance:
+                raise InsufficientFundsError("موجودی کافی نیست.")
+            description = f"تخصیص به هدف {g['name']}"
+        else:
+            if amount > self.totals.savings:
+                raise InsufficientFundsError("پس‌انداز کافی نیست.")
+            self.drain_savings(amount, uow)
+            description = f"تخصیص از پس‌انداز به هدف {g['name']}"
+        expense = self.new_transaction("expense", today(), amount, f"هدف: {g['name']}", description, uow)
+        old = dict(g)
+        g["current_amount"] += amount
+        self.goal_engine.update(g)
+        uow.record(GOALS_FILE, "update", g, old)
+        uow.commit()
+        self.check_totals()
+        return expense
+
+    def plan_allocation(self, source="balance"):
+        available = self.totals.balance if source == "balance" else self.totals.savings
+        return self.goal_engine.plan(max(available, 0), date.today().toordinal())
+
+    def import_fingerprints(self):
+        # اثر انگشت تراکنش‌های ذخیره‌شده در یک گذر جریانی، بدون نگه داشتن خود تراکنش‌ها؛ شمارنده شناسه هم به‌روز می‌شود
+        stored_next_id, records = self.storage.stream(DATA_FILE)
+        counts, next_id = record_fingerprints(records)
+        self.data.next_id = max(self.data.next_id, stored_next_id, next_id)
+        return counts
+
+    def import_batch(self, batch, keep=True):
+        # یک دسته از ورود گروهی با یک UnitOfWork (یک دسته در ژورنال) ثبت می‌شود؛
+        # با keep=False فقط در ذخیره‌سازی ثبت می‌شود و به داده‌های حافظه اضافه نمی‌شود
+        uow = self.unit_of_work()
+        self.reserve_ids(DATA_FILE, self.data, len(batch))
+        for transaction in batch:
+            transaction["id"] = generate_id(self.data)
+            if keep:
+                self.data.append(transaction)
+                self.totals.add_transaction(transaction)
+            uow.record(DATA_FILE, "insert", transaction)
+        uow.commit()
+        self.check_totals()
+        return len(batch)
+
+def print_record(record, collection=DATA_FILE):
+    print(json.dumps(money_record(record, MONEY_FIELDS[collection]), ensure_ascii=False))
+
+def import_main(args):
+    # تراکنش‌های موجود بارگذاری نمی‌شوند و دسته‌ها مستقیم در ذخیره‌سازی ثبت می‌شوند، پس حافظه به اندازه فایل
+    # ورودی بستگی ندارد؛ فشرده‌سازی ژورنال به اجرای بعدی برنامه سپرده می‌شود
+    service = LedgerService(load_transactions=False)
+    stats = new_import_stats(args.file)
+    for batch in import_batches(parse_import_file(args.file, stats, args.workers), service.import_fingerprints(), stats, args.batch_size):
+        stats["imported"] += service.import_batch(batch, keep=False)
+        print(f"\r{100 * stats['bytes'] // max(stats['size'], 1)}% {import_summary(stats)}", end="", file=sys.stderr, flush=True)
+    print(file=sys.stderr)
+    for error in stats["errors"]:
+        print(error, file=sys.stderr)
+    print(import_summary(stats))
+    return 0
+
+def export_main(args):
+    # تراکنش‌ها بارگذاری نمی‌شوند و مستقیم از ذخیره‌سازی خوانده و فیلتر می‌شوند؛ ترتیب خروجی تراکنش‌ها ترتیب شناسه است
+    criteria = transaction_criteria(args.start or "", args.end or "", args.type, args.category, args.search or "")
+    service = LedgerService(load_transactions=False)
+    if args.kind in ("savings", "goals"):
+        collection = SAVINGS_FILE if args.kind == "savings" else GOALS_FILE
+        count = export_records(service.savings if args.kind == "savings" else service.goals, args.output, collection, args.format)
+    elif service.paged:
+        count = export_transaction_records(service.storage.select(criteria, "id"), args.kind, args.output, args.format)
+    else:
+        _, records = service.storage.stream(DATA_FILE)
+        count = export_transaction_records(filter_records(records, **criteria), args.kind, args.output, args.format)
+    print(f"{count:,} ردیف نوشته شد", file=sys.stderr)
+    return 0
+
+def run_command(args):
+    # فرمان‌های تک‌عملیاتی؛ رکورد حاصل به صورت یک خط JSON چاپ می‌شود. هر فرمان فقط شناسه‌هایی را که لازم دارد رزرو می‌کند
+    service = LedgerService(id_block=1)
+    if args.command == "add":
+        print_record(service.add_transaction(args.type, args.date, args.amount, args.category, args.description))
+    elif args.command == "edit":
+        print_record(service.edit_transaction(args.id, args.type, args.date, args.amount, args.category, args.description))
+    elif args.command == "delete":
+        print_record(service.delete_transaction(args.id))
+    elif args.command == "save":
+        print_record(service.add_savings(args.amount), SAVINGS_FILE)
+    elif args.command == "release":
+        print_record(service.release_savings(args.amount))
+    elif args.command == "goal":
+        print_record(service.add_goal(args.name, args.target, args.deadline), GOALS_FILE)
+    elif args.command == "allocate":
+        print_record(service.allocate_to_goal(args.goal_id, args.amount, args.source))
+    elif args.command == "plan":
+        for goal, amount in service.plan_allocation(args.source):
+            print(json.dumps({"goal_id": goal["id"], "name": goal["name"], "amount": money_value(amount), "deadline": goal["deadline"]}, ensure_ascii=False))
+    elif args.command == "summary":
+        totals = service.totals
+        print(json.dumps({name: money_value(getattr(totals, name)) for name in ("income", "expense", "balance", "savings")}))
+    elif args.command in ("undo", "redo"):
+        entry, _, _ = service.undo() if args.command == "undo" else service.redo()
+        print(json.dumps({"id": entry["id"], "label": entry["label"], "undone": entry["undone"]}, ensure_ascii=False))
+    service.compact()
+    return 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="مدیریت مالی")
+    commands = parser.add_subparsers(dest="command")
+    importer = commands.add_parser("import", help="ورود گروهی تراکنش‌ها از CSV، JSON Lines یا آرایه JSON")
+    importer.add_argument("file")
+    importer.add_argument("--workers", type=int, default=None, help="تعداد فرایندهای پردازش (0 = بدون فرایند جداگانه)")
+    importer.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    importer.set_defaults(handler=import_main)
+    exporter = commands.add_parser("export", help="خروجی CSV یا JSON Lines از تراکنش‌ها، پس‌اندازها، اهداف یا گزارش ماهانه")
+    exporter.add_argument("kind", choices=("transactions", "savings", "goals", "report"))
+    exporter.add_argument("output", help="مسیر فایل خروجی یا - برای خروجی استاندارد")
+    exporter.add_argument("--format", choices=("csv", "jsonl"), default=None)
+    exporter.add_argument("--from", dest="start", help="yyyy-mm-dd")
+    exporter.add_argument("--to", dest="end", help="yyyy-mm-dd")
+    exporter.add_argument("--type", choices=("income", "expense"))
+    exporter.add_argument("--category")
+    exporter.add_argument("--search")
+    exporter.set_defaults(handler=export_main)
+    add = commands.add_parser("add", help="ثبت تراکنش")
+    add.add_argument("type", help="income / expense")
+    add.add_argument("date", help="yyyy-mm-dd")
+    add.add_argument("amount")
+    add.add_argument("--category", default="")
+    add.add_argument("--description", default="")
+    edit = commands.add_parser("edit", help="ویرایش تراکنش؛ فقط فیلدهای داده‌شده تغییر می‌کنند")
+    edit.add_argument("id", type=int)
+    edit.add_argument("--type")
+    edit.add_argument("--date")
+    edit.add_argument("--amount")
+    edit.add_argument("--category")
+    edit.add_argument("--description")
+    delete = commands.add_parser("delete", help="حذف تراکنش")
+    delete.add_argument("id", type=int)
+    save = commands.add_parser("save", help="افزودن به پس‌انداز")
+    save.add_argument("amount")
+    release = commands.add_parser("release", help="رها‌سازی از پس‌انداز")
+    release.add_argument("amount")
+    goal = commands.add_parser("goal", help="افزودن هدف مالی")
+    goal.add_argument("name")
+    goal.add_argument("target")
+    goal.add_argument("deadline", help="yyyy-mm-dd")
+    allocate = commands.add_parser("allocate", help="تخصیص به هدف مالی")
+    allocate.add_argument("goal_id", type=int)
+    allocate.add_argument("amount")
+    allocate.add_argument("--source", choices=("balance", "savings"), default="balance")
+    plan = commands.add_parser("plan", help="پیشنهاد تقسیم موجودی یا پس‌انداز بین اهداف")
+    plan.add_argument("--source", choices=("balance", "savings"), default="balance")
+    commands.add_parser("summary", help="جمع درآمد، هزینه، مانده و پس‌انداز")
+    commands.add_parser("undo", help="واگرد آخرین عمل")
+    commands.add_parser("redo", help="انجام دوباره آخرین عمل واگردشده")
+    for name in ("add", "edit", "delete", "save", "release", "goal", "allocate", "plan", "summary", "undo", "redo"):
+        commands.choices[name].set_defaults(handler=run_command)
+    return parser
+
+def cli(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command is None:
+        parser.print_help()
+        return 2
+    try:
+        return args.handler(args)
+    except LedgerError as e:
+        print(f"خطا: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if PROFILE:
+            METRICS.dump()
+
+if __name__ == "__main__":
+    sys.exit(cli())
@@ -0,0 +1,13 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    # فایل‌های داده با مسیر نسبی در پوشه جاری ساخته می‌شوند
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
@@ -0,0 +1,42 @@
+import json
+import os
+import subprocess
+import sys
+
+from finance_core import JOURNAL_FILE, ColumnarLedger
+
+CORE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "finance_core.py")
+
+def transaction(rid, date_str, ttype="expense", amount=100, category="", description=""):
+    return {"id": rid, "date": date_str, "type": ttype, "amount": amount, "category": category, "description": description}
+
+def state(service):
+    transactions = sorted((dict(t) for t in service.data), key=lambda t: t["id"])
+    totals = (service.totals.income, service.totals.expense, service.totals.savings)
+    return transactions, [dict(s) for s in service.savings], totals
+
+def journal_lines():
+    with open(JOURNAL_FILE, "r", encoding="utf-8") as f:
+        return [line for line in f if line.strip()]
+
+def sample_ledger():
+    return ColumnarLedger([
+        transaction(1, "2026-01-05", "income", 1000, "حقوق", "حقوق دی"),
+        transaction(2, "2026-01-20", "expense", 200, "خوراک", "خرید نان"),
+        transaction(3, "2026-02-03", "expense", 300, "خوراک", "نان و شیر"),
+        transaction(4, "2026-02-14", "expense", 50, "رفت‌وآمد", "تاکسی"),
+        transaction(5, "2026-03-01", "income", 400, "هدیه", "هدیه تولد"),
+        transaction(6, "2026-01-20", "expense", 70, "خوراک", "شیر"),
+    ])
+
+def ids(ledger, rows):
+    return [ledger.ids[row] for row in rows]
+
+def run_cli(workdir, *args, check=True):
+    # برنامه در فرایند جداگانه اجرا می‌شود تا مانند برنامه دیگری روی همان فایل‌ها رفتار کند
+    env = dict(os.environ)
+    env.pop("FINANCE_STORAGE", None)
+    result = subprocess.run([sys.executable, CORE, *args], cwd=workdir, env=env, capture_output=True, text=True, check=check)
+    if not check:
+        return result
+    return [json.loads(line) for line in result.stdout.splitlines() if line.strip()]
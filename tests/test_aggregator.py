@@ -0,0 +1,25 @@
+from finance_core import LedgerAggregator, date_ordinal
+
+from support import sample_ledger
+
+def brute_months(ledger, start, end):
+    months = {}
+    for t in ledger:
+        day = date_ordinal(t["date"])
+        if start <= day <= end:
+            sums = months.setdefault(t["date"][:7], [0, 0])
+            sums[ledger.TYPES.index(t["type"])] += t["amount"]
+    return [(month, income, expense) for month, (income, expense) in sorted(months.items())]
+
+def test_summarize_partial_months():
+    ledger = sample_ledger()
+    aggregator = LedgerAggregator(ledger)
+    aggregator.summarize("month")
+    start, end = date_ordinal("2026-01-10"), date_ordinal("2026-02-13")
+    assert aggregator.summarize("month", start, end) == brute_months(ledger, start, end)
+    assert aggregator.summarize("month", start, end) == [("2026-01", 0, 270), ("2026-02", 0, 300)]
+    assert aggregator.summarize("year", start, end) == [("2026", 0, 570)]
+    ledger.get(4)["date"] = "2026-02-10"
+    start, end = date_ordinal("2026-01-01"), date_ordinal("2026-02-28")
+    assert aggregator.summarize("month", start, end) == brute_months(ledger, start, end)
+    assert aggregator.summarize("month", date_ordinal("2026-01-21"), date_ordinal("2026-01-31")) == []
@@ -0,0 +1,31 @@
+import subprocess
+import sys
+
+from finance_core import cli
+from support import CORE, run_cli
+
+def test_core_imports_without_tk():
+    code = f"import runpy, sys; runpy.run_path({CORE!r}); print('tkinter' in sys.modules)"
+    assert subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout.strip() == "False"
+
+def test_add_edit_summary(workdir):
+    income, = run_cli(workdir, "add", "income", "2026-01-01", "1,000.5", "--category", "حقوق")
+    assert income["amount"] == 1000.5 and income["category"] == "حقوق"
+    expense, = run_cli(workdir, "add", "expense", "2026-01-02", "0.5")
+    edited, = run_cli(workdir, "edit", str(expense["id"]), "--amount", "200", "--description", "اجاره")
+    assert edited == dict(expense, amount=200.0, description="اجاره")
+    saved, = run_cli(workdir, "save", "100")
+    assert saved["amount"] == 100.0
+    summary, = run_cli(workdir, "summary")
+    assert summary == {"income": 1000.5, "expense": 200.0, "balance": 700.5, "savings": 100.0}
+    undone, = run_cli(workdir, "undo")
+    assert undone["undone"]
+    summary, = run_cli(workdir, "summary")
+    assert summary["savings"] == 0.0 and summary["balance"] == 800.5
+
+def test_errors_exit_with_message(workdir, capsys):
+    assert cli(["add", "income", "2026-01-01", "-5"]) == 1
+    assert "خطا" in capsys.readouterr().err
+    assert cli(["delete", "99"]) == 1
+    assert cli(["add", "income", "2026-02-30", "5"]) == 1
+    assert cli([]) == 2
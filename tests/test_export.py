@@ -0,0 +1,62 @@
+import csv
+import json
+import os
+
+import pytest
+
+import finance_core
+from finance_core import LedgerError, LedgerService, cli, export_transaction_records, write_export
+
+def sample_service():
+    service = LedgerService()
+    service.add_transaction("income", "2026-01-05", "1000", "حقوق", "حقوق دی")
+    service.add_transaction("expense", "2026-01-20", "200.5", "خوراک", "خرید نان")
+    service.add_transaction("expense", "2026-02-03", "300", "خوراک", "نان و شیر")
+    service.add_transaction("income", "2026-03-01", "400", "هدیه", "هدیه تولد")
+    service.add_savings("100")
+    return service
+
+def read_csv(file_path):
+    with open(file_path, encoding="utf-8-sig", newline="") as f:
+        return list(csv.DictReader(f))
+
+def test_export_filtered_transactions(workdir):
+    sample_service()
+    assert cli(["export", "transactions", "food.csv", "--category", "خوراک", "--search", "نان"]) == 0
+    assert [(row["date"], row["amount"]) for row in read_csv("food.csv")] == [("2026-01-20", "200.5"), ("2026-02-03", "300.0")]
+    assert cli(["export", "transactions", "q1.jsonl", "--from", "2026-01-10", "--to", "2026-02-28", "--type", "expense"]) == 0
+    with open("q1.jsonl", encoding="utf-8") as f:
+        assert [json.loads(line)["description"] for line in f] == ["خرید نان", "نان و شیر"]
+
+def test_export_monthly_report(workdir):
+    sample_service()
+    assert cli(["export", "report", "report.csv"]) == 0
+    assert read_csv("report.csv") == [
+        {"month": "2026-01", "income": "1000.0", "expense": "200.5", "net": "799.5", "count": "2"},
+        {"month": "2026-02", "income": "0.0", "expense": "300.0", "net": "-300.0", "count": "1"},
+        {"month": "2026-03", "income": "400.0", "expense": "0.0", "net": "400.0", "count": "1"}]
+
+def test_export_savings_and_goals(workdir, capsys):
+    service = sample_service()
+    service.add_goal("سفر", "500", "2027-01-01")
+    assert cli(["export", "savings", "-", "--format", "jsonl"]) == 0
+    assert json.loads(capsys.readouterr().out)["amount"] == 100.0
+    assert cli(["export", "goals", "goals.csv"]) == 0
+    assert read_csv("goals.csv")[0]["target_amount"] == "500.0"
+
+def test_export_writes_in_chunks(workdir, monkeypatch):
+    monkeypatch.setattr(finance_core, "EXPORT_CHUNK_ROWS", 3)
+    records = ({"id": i, "date": "2026-01-01", "type": "income", "amount": i, "category": "", "description": ""} for i in range(1, 11))
+    assert export_transaction_records(records, "transactions", "all.jsonl") == 10
+    with open("all.jsonl", encoding="utf-8") as f:
+        assert [json.loads(line)["amount"] for line in f] == [i / 100 for i in range(1, 11)]
+
+def test_failed_export_leaves_no_files(workdir):
+    def records():
+        yield {"id": 1, "date": "2026-01-01", "type": "income", "amount": 1, "category": "", "description": ""}
+        raise LedgerError("لغو")
+    with pytest.raises(LedgerError):
+        export_transaction_records(records(), "report", "report.csv")
+    with pytest.raises(OSError):
+        write_export([], ("id",), os.path.join("missing", "out.csv"))
+    assert not any(name.startswith("report") for name in os.listdir("."))
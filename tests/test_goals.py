@@ -0,0 +1,51 @@
+from datetime import date, timedelta
+
+from finance_core import NEAR_DEADLINE_DAYS, GoalEngine, LedgerService, RecordList, ordinal_date
+
+TODAY = date(2026, 1, 1).toordinal()
+
+def goal(gid, target, current, days_left):
+    return {"id": gid, "name": f"هدف {gid}", "target_amount": target, "current_amount": current,
+            "deadline": ordinal_date(TODAY + days_left)}
+
+def test_plan_splits_by_urgency():
+    engine = GoalEngine(RecordList([goal(1, 1000, 0, 10), goal(2, 1000, 0, 40), goal(3, 500, 500, 5)]))
+    plan = engine.plan(1000, TODAY)
+    assert [(g["id"], amount) for g, amount in plan] == [(1, 800), (2, 200)]
+
+def test_plan_redistributes_excess_and_never_overspends():
+    engine = GoalEngine(RecordList([goal(1, 1000, 900, 1), goal(2, 1000, 0, 30), goal(3, 1000, 0, 31)]))
+    plan = engine.plan(700, TODAY)
+    shares = {g["id"]: amount for g, amount in plan}
+    assert shares[1] == 100
+    assert sum(shares.values()) <= 700 and sum(shares.values()) >= 698
+    assert [g["id"] for g, _ in plan] == [1, 2, 3]
+    assert engine.plan(10 ** 9, TODAY) == [(engine.goals.get(1), 100), (engine.goals.get(2), 1000), (engine.goals.get(3), 1000)]
+
+def test_due_reports_each_boundary_once():
+    engine = GoalEngine(RecordList([goal(1, 100, 0, 10), goal(2, 100, 0, 3), goal(3, 100, 100, 1)]))
+    assert engine.next_boundary() == TODAY + 3 - NEAR_DEADLINE_DAYS
+    assert [(g["id"], status) for g, status in engine.due(TODAY)] == [(2, "near")]
+    assert engine.due(TODAY) == []
+    assert engine.next_boundary() == TODAY + 10 - NEAR_DEADLINE_DAYS
+    assert sorted((g["id"], status) for g, status in engine.due(TODAY + 20)) == [(1, "expired"), (2, "expired")]
+    assert engine.next_boundary() is None
+
+def test_undo_below_target_rearms_notifications(workdir):
+    service = LedgerService()
+    service.add_transaction("income", "2026-01-01", "1000")
+    deadline = (date.today() + timedelta(days=3)).isoformat()
+    target = service.add_goal("سفر", "100", deadline)
+    engine = service.goal_engine
+    today = date.today().toordinal()
+    assert [status for _, status in engine.due(today)] == ["near"]
+    service.allocate_to_goal(target["id"], "100")
+    assert engine.next_boundary() is None
+    service.undo()
+    assert engine.progress[target["id"]] == 0
+    assert engine.next_boundary() == today + 3 - NEAR_DEADLINE_DAYS
+    assert [(g["id"], status) for g, status in engine.due(today)] == [(target["id"], "near")]
+    assert engine.next_boundary() == today + 3
+    # کامل شدن دوباره اعلان‌ها را متوقف می‌کند
+    service.redo()
+    assert engine.next_boundary() is None
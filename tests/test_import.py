@@ -0,0 +1,71 @@
+import json
+from argparse import Namespace
+
+from finance_core import LedgerService, import_main, new_import_stats, parse_import_file
+
+def test_import_skips_duplicates(workdir):
+    service = LedgerService()
+    service.add_transaction("expense", "2026-01-02", "15", "خوراک", "نان")
+    with open("bank.csv", "w", encoding="utf-8") as f:
+        f.write("date,type,amount,category,description\n"
+                "2026-01-02,expense,15,خوراک,نان\n"
+                "2026-01-02,expense,15,خوراک,نان\n"
+                "2026-01-03,income,\"1,000\",حقوق,\"حقوق\nدی\"\n"
+                "2026-13-01,expense,5,,\n")
+    import_main(Namespace(file="bank.csv", workers=0, batch_size=1))
+    reloaded = LedgerService()
+    assert sorted((t["date"], t["amount"], t["description"]) for t in reloaded.data) == [
+        ("2026-01-02", 1500, "نان"), ("2026-01-02", 1500, "نان"), ("2026-01-03", 100000, "حقوق\nدی")]
+    assert len({t["id"] for t in reloaded.data}) == 3
+    # ورود دوباره همان فایل چیزی اضافه نمی‌کند
+    import_main(Namespace(file="bank.csv", workers=0, batch_size=1))
+    assert len(LedgerService().data) == 3
+
+def test_import_json_array(workdir):
+    rows = [{"date": "2026-01-01", "type": "درآمد", "amount": "10"}, {"date": "2026-01-02", "type": "هزینه", "amount": 2.5}, [1]]
+    with open("rows.json", "w", encoding="utf-8") as f:
+        json.dump(rows, f, ensure_ascii=False)
+    import_main(Namespace(file="rows.json", workers=0, batch_size=10))
+    service = LedgerService()
+    assert sorted((t["type"], t["amount"]) for t in service.data) == [("expense", 250), ("income", 1000)]
+
+def parse(file_path, workers=0):
+    stats = new_import_stats(file_path)
+    rows = list(parse_import_file(file_path, stats, workers))
+    return [(line_no, record and record["amount"], error) for line_no, record, _, error in rows], stats
+
+def test_bad_rows_are_reported_not_fatal(workdir):
+    with open("bank.csv", "wb") as f:
+        f.write("date,type,amount\n"
+                "2026-01-01,income,10\n"
+                "2026-01-02,income,1e999999999\n".encode("utf-8") +
+                b"2026-01-03,income,5,\xff\xfe\n" +
+                "2026-01-04,income,abc\n"
+                "2026-01-05,نامعلوم,5\n"
+                "2026-01-06,expense,7\n".encode("utf-8"))
+    rows, stats = parse("bank.csv")
+    assert [(line_no, amount) for line_no, amount, _ in rows] == [(2, 1000), (3, None), (4, None), (5, None), (6, None), (7, 700)]
+    assert all(error for _, amount, error in rows if amount is None)
+    assert "UTF-8" in rows[2][2]
+    assert stats["bytes"] == stats["size"]
+    import_main(Namespace(file="bank.csv", workers=0, batch_size=10))
+    assert sorted(t["amount"] for t in LedgerService().data) == [700, 1000]
+
+def test_bad_json_lines(workdir):
+    with open("rows.jsonl", "wb") as f:
+        f.write(b'{"date": "2026-01-01", "type": "income", "amount": 1}\n'
+                b'{"date": "2026-01-02", "type": "income"\n'
+                b'[1, 2]\n'
+                b'{"date": "2026-01-03", "type": "income", "amount": "1\xff"}\n'
+                b'{"date": ["x"], "type": {}, "amount": null}\n'
+                b'\n'
+                b'{"date": "2026-01-04", "type": "expense", "amount": 2}\n')
+    rows, _ = parse("rows.jsonl", workers=1)
+    assert [(line_no, amount) for line_no, amount, _ in rows] == [(1, 100), (2, None), (3, None), (4, None), (5, None), (7, 200)]
+
+def test_bad_bytes_in_json_array(workdir):
+    with open("rows.json", "wb") as f:
+        f.write(b'[{"date": "2026-01-01", "type": "income", "amount": 1, "description": "\xff"},'
+                b' {"date": "2026-01-02", "type": "income", "amount": 2}]')
+    rows, _ = parse("rows.json")
+    assert [(line_no, amount) for line_no, amount, _ in rows] == [(1, None), (2, 200)]
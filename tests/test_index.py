@@ -0,0 +1,28 @@
+from finance_core import LedgerIndex, date_ordinal
+
+from support import ids, sample_ledger, transaction
+
+def test_index_query_filters():
+    ledger = sample_ledger()
+    index = LedgerIndex(ledger)
+    assert ids(ledger, index.query()) == [1, 2, 6, 3, 4, 5]
+    assert ids(ledger, index.query(start=date_ordinal("2026-01-20"), end=date_ordinal("2026-02-03"))) == [2, 6, 3]
+    assert ids(ledger, index.query(ttype="income")) == [1, 5]
+    assert ids(ledger, index.query(category="خوراک")) == [2, 6, 3]
+    assert ids(ledger, index.query(category="ناموجود")) == []
+    assert ids(ledger, index.query(text="نا")) == [2, 3]
+    assert ids(ledger, index.query(text="نان شیر")) == [3]
+    assert ids(ledger, index.query(start=date_ordinal("2026-02-01"), ttype="expense", category="خوراک", text="شیر")) == [3]
+
+def test_index_follows_changes():
+    ledger = sample_ledger()
+    index = LedgerIndex(ledger)
+    assert ids(ledger, index.query(text="شیر")) == [6, 3]
+    ledger.get(6)["description"] = "قبض برق"
+    ledger.get(2)["date"] = "2026-03-10"
+    ledger.remove(3)
+    ledger.append(transaction(7, "2026-01-01", "expense", 10, "خوراک", "شیر"))
+    assert ids(ledger, index.query(text="شیر")) == [7]
+    assert ids(ledger, index.query(text="قبض")) == [6]
+    assert ids(ledger, index.query(category="خوراک")) == [7, 6, 2]
+    assert "نان" in index.postings and 3 not in index.postings["نان"]
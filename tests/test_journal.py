@@ -0,0 +1,26 @@
+import os
+
+from finance_core import DATA_FILE, JOURNAL_FILE, LedgerService
+from support import state
+
+def test_journal_replay(workdir):
+    service = LedgerService()
+    first = service.add_transaction("income", "2026-01-01", "500")
+    second = service.add_transaction("expense", "2026-01-02", "120.5", "خوراک", "نان")
+    service.edit_transaction(second["id"], amount="130")
+    service.delete_transaction(first["id"])
+    assert not os.path.exists(DATA_FILE)
+    reloaded = LedgerService()
+    assert state(reloaded) == state(service)
+    assert reloaded.data.get(second["id"])["amount"] == 13000
+
+def test_journal_ignores_truncated_line(workdir):
+    service = LedgerService()
+    service.add_transaction("income", "2026-01-01", "500")
+    with open(JOURNAL_FILE, "ab") as f:
+        f.write(b'{"file": "finance_data.json", "op": "insert", "rec')
+    assert state(LedgerService()) == state(service)
+    # خط ناقص پیش از نوشتن عمل بعدی کنار گذاشته می‌شود
+    service = LedgerService()
+    added = service.add_transaction("expense", "2026-01-03", "20")
+    assert LedgerService().data.get(added["id"])["amount"] == 2000
@@ -0,0 +1,61 @@
+import pytest
+
+from finance_core import ColumnarLedger, ValidationError
+
+from support import sample_ledger, transaction
+
+@pytest.mark.parametrize("record", [
+    transaction(1, "2026-13-01"),
+    transaction(1, "2026-01-01", "loan"),
+    transaction(1, "2026-01-01", amount=1.5),
+    transaction("1", "2026-01-01"),
+    transaction(1, "2026-01-01", category=None),
+    {"id": 1, "date": "2026-01-01", "type": "income", "amount": 1},
+])
+def test_append_rejects_invalid_record(record):
+    ledger = sample_ledger()
+    with pytest.raises(ValidationError):
+        ledger.append(record)
+    # ستون‌ها هم‌تراز می‌مانند
+    assert len(ledger) == 6 and len({len(ledger.ids), len(ledger.amounts), len(ledger.days), len(ledger.live)}) == 1
+
+def test_fields_round_trip():
+    ledger = sample_ledger()
+    assert dict(ledger.get(3)) == transaction(3, "2026-02-03", "expense", 300, "خوراک", "نان و شیر")
+    assert ledger.record(ledger.row_of(5)) == transaction(5, "2026-03-01", "income", 400, "هدیه", "هدیه تولد")
+    assert len(ledger.category_names) == 4
+    assert ledger.next_id == 7
+
+def test_descriptions_compacted():
+    ledger = ColumnarLedger([transaction(1, "2026-01-01", description="الف" * 50), transaction(2, "2026-01-02", description="ب")])
+    view = ledger.get(1)
+    for i in range(20):
+        view["description"] = f"متن {i}"
+    assert view["description"] == "متن 19" and ledger.get(2)["description"] == "ب"
+    # متن‌های کنار گذاشته‌شده در بافر انباشته نمی‌شوند
+    assert len(ledger.descriptions) < 100
+
+def test_out_of_order_ids_use_index():
+    ledger = ColumnarLedger([transaction(5, "2026-01-01"), transaction(2, "2026-01-02")])
+    assert ledger.id_index == {5: 0, 2: 1}
+    assert ledger.get(2)["date"] == "2026-01-02" and ledger.get(3) is None
+    ledger.remove(5)
+    assert ledger.get(5) is None and [t["id"] for t in ledger] == [2]
+
+def test_remove_compacts_rows():
+    ledger = sample_ledger()
+    for rid in (1, 2, 3, 4):
+        assert ledger.remove(rid)["id"] == rid
+    assert ledger.remove(1) is None
+    assert len(ledger.ids) == len(ledger) == 2 and ledger.generation == 1
+    assert [t["id"] for t in ledger] == [5, 6]
+    assert ledger.get(6)["description"] == "شیر"
+
+def test_copy_is_independent():
+    ledger = sample_ledger()
+    snapshot = ledger.copy()
+    ledger.get(2)["amount"] = 999
+    ledger.remove(3)
+    ledger.append(transaction(7, "2026-04-01"))
+    assert [t["id"] for t in snapshot] == [1, 2, 3, 4, 5, 6]
+    assert snapshot.get(2)["amount"] == 200 and snapshot.get(3)["description"] == "نان و شیر"
@@ -0,0 +1,61 @@
+import json
+import os
+
+import pytest
+
+from finance_core import (DATA_FILE, FORMAT_VERSION, META_FILE, QUARANTINE_FILE, SAVINGS_FILE, LedgerService, ValidationError,
+                          cli, save_data, to_minor)
+
+@pytest.mark.parametrize("value, minor", [
+    ("0.1", 10), (0.1, 10), (2.675, 268), ("1.005", 101), ("1,234.5", 123450), ("-0.005", -1), ("12", 1200), (" 7.999 ", 800),
+])
+def test_to_minor_rounds_half_up(value, minor):
+    assert to_minor(value) == minor
+
+@pytest.mark.parametrize("value", ["NaN", "inf", float("nan"), float("-inf"), "abc", "", None, "1e999999999", "-1e999999999",
+                                   "1e999990", "1e14"])
+def test_to_minor_rejects_invalid(value):
+    with pytest.raises(ValidationError):
+        to_minor(value)
+
+def test_overflowing_amount_is_a_validation_error(workdir, capsys):
+    service = LedgerService()
+    with pytest.raises(ValidationError):
+        service.add_transaction("income", "2026-01-01", "1e999999999")
+    assert cli(["add", "income", "2026-01-01", "1e999999999"]) == 1
+    assert "خطا" in capsys.readouterr().err
+    assert len(LedgerService().data) == 0
+
+def write_v1(file_path, records):
+    with open(file_path, "w", encoding="utf-8") as f:
+        json.dump(records, f)
+
+def test_migration_converts_and_quarantines(workdir):
+    write_v1(DATA_FILE, [{"id": 1, "date": "2026-01-01", "type": "income", "amount": 0.1, "category": "", "description": ""},
+                         {"id": 2, "date": "2026-01-02", "type": "income", "amount": float("nan"), "category": "", "description": ""},
+                         {"id": 3, "date": "2026-01-03", "type": "expense", "amount": 1e300, "category": "", "description": ""}])
+    write_v1(SAVINGS_FILE, [{"id": 1, "amount": 2.675, "date": "2026-01-01"}])
+    errors = []
+    service = LedgerService(on_load_error=errors.append)
+    assert [(t["id"], t["amount"]) for t in service.data] == [(1, 10)]
+    assert [s["amount"] for s in service.savings] == [268]
+    assert len(errors) == 1 and "2" in str(errors[0])
+    with open(QUARANTINE_FILE, encoding="utf-8") as f:
+        assert [e["record"]["id"] for e in json.load(f)] == [2, 3]
+    with open(META_FILE, encoding="utf-8") as f:
+        assert json.load(f) == {"format": FORMAT_VERSION}
+    # شناسه رکوردهای کنارگذاشته دوباره استفاده نمی‌شود و ارتقا تکرار نمی‌شود
+    assert service.add_transaction("income", "2026-01-04", "1")["id"] == 4
+    errors = []
+    reloaded = LedgerService(on_load_error=errors.append)
+    assert errors == [] and [t["amount"] for t in reloaded.data] == [10, 100]
+
+def test_interrupted_migration_is_finished(workdir):
+    write_v1(DATA_FILE, [{"id": 1, "date": "2026-01-01", "type": "income", "amount": 0.5, "category": "", "description": ""}])
+    save_data([{"id": 1, "date": "2026-01-01", "type": "income", "amount": 50, "category": "", "description": ""}], DATA_FILE + ".v2")
+    with open(META_FILE, "w", encoding="utf-8") as f:
+        json.dump({"format": FORMAT_VERSION, "pending": [DATA_FILE]}, f)
+    service = LedgerService()
+    assert [t["amount"] for t in service.data] == [50]
+    assert not os.path.exists(DATA_FILE + ".v2")
+    assert [t["amount"] for t in LedgerService().data] == [50]
@@ -0,0 +1,27 @@
+import json
+
+from finance_core import DATA_FILE, LedgerService, PersistenceWorker
+from support import journal_lines, state
+
+def test_compaction_snapshot_is_independent(workdir):
+    service = LedgerService()
+    worker = PersistenceWorker(service.storage)
+    service.persist = lambda ops: worker.submit("commit", [(file_path, op, dict(record)) for file_path, op, record in ops])
+    worker.start()
+    first = service.add_transaction("income", "2026-01-01", "100", "حقوق", "دی")
+    second = service.add_transaction("expense", "2026-01-02", "30")
+    with service.storage.lock:
+        # رشته ذخیره‌سازی تا پایان این بلوک منتظر قفل می‌ماند و تغییرات بعدی پس از کپی انجام می‌شوند
+        worker.submit("compact", (service.collections(copy=True), service.merged))
+        service.edit_transaction(first["id"], description="بهمن")
+        service.delete_transaction(second["id"])
+        service.add_savings("10")
+    worker.stop()
+    results = []
+    while not worker.results.empty():
+        results.append(worker.results.get_nowait())
+    assert ("compact", None) in results and all(error is None for _, error in results)
+    with open(DATA_FILE, encoding="utf-8") as f:
+        assert [(t["id"], t["description"]) for t in json.load(f)] == [(first["id"], "دی"), (second["id"], "")]
+    assert any(json.loads(line).get("base") for line in journal_lines())
+    assert state(LedgerService()) == state(service)
@@ -0,0 +1,53 @@
+import pytest
+
+import finance_core
+from finance_core import InsufficientFundsError, LedgerService, SavingsLots
+
+def lots():
+    return SavingsLots([{"id": 1, "amount": 100, "date": "2026-01-01"}, {"id": 2, "amount": 200, "date": "2026-01-02"},
+                        {"id": 3, "amount": 300, "date": "2026-01-03"}], 4)
+
+def test_savings_drain_oldest_first():
+    savings = lots()
+    changes = savings.drain(250)
+    assert [(op, record["id"]) for op, record, _ in changes] == [("delete", 1), ("update", 2)]
+    assert changes[1][1]["amount"] == 50 and changes[1][2]["amount"] == 200
+    assert savings.total == 350
+    assert savings.first()["id"] == 2
+    assert savings.drain(1000)[-1][0] == "delete"
+    assert savings.total == 0 and savings.first() is None
+
+def test_savings_restore_goes_first():
+    savings = lots()
+    (_, _, old), = savings.drain(100)
+    savings.restore(old)
+    assert [s["id"] for s in savings] == [1, 2, 3]
+    assert savings.total == 600
+    savings.drain(150)
+    assert savings.first() == {"id": 2, "amount": 150, "date": "2026-01-02"}
+
+def test_savings_put_restores_drained_lot():
+    savings = lots()
+    removed = [old for _, _, old in savings.drain(300)]
+    for old in reversed(removed):
+        savings.put(dict(old))
+    assert [dict(s) for s in savings] == [dict(s) for s in lots()]
+    assert savings.total == 600
+
+def test_service_savings_total_follows_lots(workdir, monkeypatch):
+    monkeypatch.setattr(finance_core, "VERIFY_TOTALS", True)
+    service = LedgerService()
+    service.add_transaction("income", "2026-01-01", "1000")
+    for amount in ("100", "200", "300"):
+        service.add_savings(amount)
+    service.release_savings("150")
+    goal = service.add_goal("سفر", "500", "2027-01-01")
+    service.allocate_to_goal(goal["id"], "400", "savings")
+    assert service.totals.savings == service.savings.total == 5000
+    with pytest.raises(InsufficientFundsError):
+        service.release_savings("51")
+    service.undo()
+    service.undo()
+    assert service.totals.savings == 45000
+    assert [s["amount"] for s in service.savings] == [15000, 30000]
+    assert LedgerService().totals.savings == 45000
@@ -0,0 +1,105 @@
+import json
+import threading
+
+import finance_core
+from finance_core import DATA_FILE, JOURNAL_FILE, LedgerService
+from support import journal_lines, run_cli, state
+
+def test_compaction_keeps_recent_lines(workdir, monkeypatch):
+    monkeypatch.setattr(finance_core, "COMPACT_THRESHOLD_OPS", 5)
+    service = LedgerService()
+    for day in range(1, 7):
+        service.add_transaction("income", f"2026-01-{day:02d}", str(day * 10))
+    last = service.add_transaction("expense", "2026-01-07", "5")
+    service.edit_transaction(last["id"], amount="7")
+    lines = journal_lines()
+    # اندازه سه خط آخر: فقط همان‌ها در ژورنال جدید می‌مانند
+    monkeypatch.setattr(finance_core, "COMPACT_KEEP_BYTES", sum(len(line.encode("utf-8")) for line in lines[-3:]))
+    assert service.compact()
+    kept = journal_lines()
+    assert kept[:-1] == lines[-3:]
+    assert json.loads(kept[-1])["base"]
+    # خطوط نگه‌داشته‌شده پیش از خط base دوباره اعمال می‌شوند ولی تغییری ایجاد نمی‌کنند
+    reloaded = LedgerService()
+    assert state(reloaded) == state(service)
+    assert reloaded.data.get(last["id"])["amount"] == 700
+    added = reloaded.add_transaction("income", "2026-01-08", "1")
+    assert added["id"] > last["id"]
+
+def import_rows(service, count):
+    batch = [{"date": "2026-02-01", "type": "expense", "amount": 100, "category": "خوراک", "description": f"ردیف {i}"}
+             for i in range(count)]
+    service.import_batch(batch)
+
+def test_batches_count_as_ops(workdir, monkeypatch):
+    monkeypatch.setattr(finance_core, "COMPACT_THRESHOLD_OPS", 100)
+    service = LedgerService()
+    import_rows(service, 90)
+    assert not service.storage.needs_compaction()
+    import_rows(service, 10)
+    assert service.storage.needs_compaction()
+    assert service.compact()
+    assert not service.storage.needs_compaction()
+    assert len(LedgerService().data) == 100
+
+def test_large_journal_compacts_by_size(workdir, monkeypatch):
+    monkeypatch.setattr(finance_core, "COMPACT_THRESHOLD_BYTES", 4096)
+    service = LedgerService()
+    import_rows(service, 10)
+    assert not service.storage.needs_compaction()
+    import_rows(service, 50)
+    assert service.storage.needs_compaction()
+    service.add_transaction("income", "2026-02-02", "1")
+    size = len(open(JOURNAL_FILE, "rb").read())
+    assert service.compact()
+    # خط دسته بزرگ از حجم نگه‌داشته‌شده بیشتر است و کنار گذاشته می‌شود
+    monkeypatch.setattr(finance_core, "COMPACT_KEEP_BYTES", 1024)
+    import_rows(service, 50)
+    assert service.compact()
+    kept = journal_lines()
+    assert sum(len(line.encode("utf-8")) for line in kept[:-1]) <= 1024
+    assert all(len(json.loads(line).get("batch", ())) < 50 for line in kept)
+    assert len(open(JOURNAL_FILE, "rb").read()) < size
+    assert state(LedgerService()) == state(service)
+
+def test_reserve_does_not_wait_for_compaction(workdir):
+    service = LedgerService(id_block=1)
+    held, release = threading.Event(), threading.Event()
+    def compaction():
+        with service.storage.lock:
+            held.set()
+            release.wait(10)
+    worker = threading.Thread(target=compaction)
+    worker.start()
+    held.wait(10)
+    try:
+        reserved = []
+        reserving = threading.Thread(target=lambda: reserved.extend(service.allocate_id(DATA_FILE, service.data) for _ in range(3)))
+        reserving.start()
+        reserving.join(5)
+        assert reserved == [1, 2, 3]
+    finally:
+        release.set()
+        worker.join()
+    # برنامه دیگر شناسه‌های رزروشده را دوباره استفاده نمی‌کند
+    theirs, = run_cli(workdir, "add", "income", "2026-01-02", "50")
+    assert theirs["id"] == 4
+
+def test_two_process_merge(workdir):
+    service = LedgerService()
+    mine = service.add_transaction("income", "2026-01-01", "100")
+    theirs, = run_cli(workdir, "add", "income", "2026-01-02", "50", "--description", "از برنامه دیگر")
+    assert theirs["id"] != mine["id"]
+    service.storage.sync()
+    transaction_ids, files = service.merge_changes()
+    assert transaction_ids == {theirs["id"]} and DATA_FILE in files
+    assert service.data.get(theirs["id"])["description"] == "از برنامه دیگر"
+    assert service.totals.income == 15000
+    run_cli(workdir, "edit", str(mine["id"]), "--amount", "70")
+    service.storage.sync()
+    service.merge_changes()
+    assert service.data.get(mine["id"])["amount"] == 7000
+    service.add_savings("20")
+    summary, = run_cli(workdir, "summary")
+    assert summary == {"income": 120.0, "expense": 0.0, "balance": 100.0, "savings": 20.0}
+    assert [s["amount"] for s in LedgerService().savings] == [2000]
@@ -0,0 +1,164 @@
+import sqlite3
+
+import pytest
+
+import finance_core
+from finance_core import (DATA_FILE, DB_FILE, SAVINGS_FILE, LedgerAggregator, LedgerIndex, LedgerService, NotFoundError,
+                          SqliteLedger, SqliteStorage, date_ordinal, migrate_json_to_sqlite)
+
+from support import ids, sample_ledger, state, transaction
+
+def sample_storage():
+    storage = SqliteStorage()
+    storage.commit([(DATA_FILE, "insert", dict(t)) for t in sample_ledger()])
+    return storage
+
+def plan(storage, sql, params=()):
+    return " ".join(row[3] for row in storage.fetch("EXPLAIN QUERY PLAN " + sql, params))
+
+def test_queries_use_indexes(workdir):
+    storage = sample_storage()
+    assert "COVERING INDEX transactions_type_date" in plan(storage, "SELECT type, SUM(amount) FROM transactions GROUP BY type")
+    assert "INDEX transactions_date" in plan(storage, "SELECT * FROM transactions WHERE date >= ? ORDER BY date, id", ("2026-02-01",))
+    assert "INDEX transactions_category_date" in plan(storage, "SELECT * FROM transactions WHERE category = ? ORDER BY date, id", ("خوراک",))
+    where, params = storage.where(text="نان")
+    assert "transactions_text" in plan(storage, "SELECT * FROM transactions" + where, params)
+
+def test_totals_from_sql_without_loading(workdir):
+    sample_storage()
+    service = LedgerService(SqliteStorage())
+    assert isinstance(service.data, SqliteLedger) and service.data.sums is None
+    assert (service.totals.income, service.totals.expense) == (1400, 620)
+    assert len(service.data) == 6 and service.data.next_id == 7
+    service.add_savings("1")
+    service.delete_transaction(2)
+    assert (service.totals.expense, service.totals.savings, service.totals.balance) == (420, 100, 880)
+    service.totals.verify(service.data, service.savings)
+
+@pytest.mark.parametrize("criteria", [
+    {}, {"start": "2026-01-20", "end": "2026-02-03"}, {"ttype": "income"}, {"category": "خوراک"}, {"category": "ناموجود"},
+    {"text": "نا"}, {"text": "نان شیر"}, {"start": "2026-02-01", "ttype": "expense", "category": "خوراک", "text": "شیر"},
+])
+def test_query_matches_index(workdir, criteria):
+    ledger = sample_ledger()
+    sql = SqliteLedger(sample_storage())
+    for key in ("start", "end"):
+        if key in criteria:
+            criteria[key] = date_ordinal(criteria[key])
+    assert [t["id"] for t in sql.query(**criteria)] == ids(ledger, LedgerIndex(ledger).query(**criteria))
+
+def test_text_search_without_fts(workdir):
+    storage = sample_storage()
+    storage.fts = False
+    sql = SqliteLedger(storage)
+    assert [t["id"] for t in sql.query(text="نان شیر")] == [3]
+    assert [t["id"] for t in sql.query(text="نا")] == [2, 3]
+
+def test_summarize_matches_aggregator(workdir):
+    ledger = sample_ledger()
+    sql = SqliteLedger(sample_storage())
+    aggregator = LedgerAggregator(ledger)
+    for by in ("day", "month", "year", "category"):
+        for start, end in ((None, None), ("2026-01-10", "2026-02-13"), ("2026-02-01", None)):
+            span = (start and date_ordinal(start), end and date_ordinal(end))
+            assert sql.summarize(by, *span) == aggregator.summarize(by, *span)
+
+def test_pages_follow_changes(workdir, monkeypatch):
+    monkeypatch.setattr(finance_core, "SQL_PAGE_ROWS", 2)
+    service = LedgerService(sample_storage())
+    slots = service.data.slots
+    assert [t["id"] for t in slots[1:5]] == [2, 3, 4, 5] and len(slots.pages) == 3
+    expenses = service.data.query(ttype="expense")
+    assert [t["id"] for t in expenses] == [2, 6, 3, 4]
+    service.edit_transaction(6, ttype="income")
+    service.add_transaction("expense", "2026-1-1", "1")
+    assert [t["id"] for t in expenses] == [7, 2, 3, 4]
+    assert expenses[0]["date"] == "2026-01-01"
+    assert len(slots) == 7 and slots[6]["id"] == 7
+    with pytest.raises(IndexError):
+        slots[7]
+    assert [t["id"] for t in service.data] == [1, 2, 3, 4, 5, 6, 7]
+
+def test_undo_redo_round_trip(workdir):
+    service = LedgerService(SqliteStorage())
+    states = [state(service)]
+    first = service.add_transaction("income", "2026-01-01", "1000")
+    states.append(state(service))
+    service.add_savings("300")
+    states.append(state(service))
+    service.release_savings("250")
+    states.append(state(service))
+    service.edit_transaction(first["id"], description="حقوق", amount="1200")
+    states.append(state(service))
+    service.delete_transaction(first["id"])
+    states.append(state(service))
+    for expected in reversed(states[:-1]):
+        service.undo()
+        assert state(service) == expected
+    with pytest.raises(NotFoundError):
+        service.undo()
+    for expected in states[1:]:
+        service.redo()
+        assert state(service) == expected
+    assert state(LedgerService(SqliteStorage())) == states[-1]
+
+def test_changes_reach_other_service(workdir):
+    first = LedgerService(SqliteStorage())
+    second = LedgerService(SqliteStorage())
+    first.add_transaction("income", "2026-01-01", "100")
+    first.add_savings("40")
+    assert second.storage.changed() and not second.storage.changed()
+    second.storage.sync()
+    transaction_ids, files = second.merge_changes()
+    assert transaction_ids == {1} and SAVINGS_FILE in files
+    assert (second.totals.income, second.totals.savings) == (10000, 4000)
+    assert [dict(s) for s in second.savings] == [dict(s) for s in first.savings]
+    # تغییرات خود برنامه دوباره دریافت نمی‌شوند
+    second.release_savings("10")
+    second.storage.sync()
+    assert second.merge_changes() == (set(), set())
+    first.storage.sync()
+    first.merge_changes()
+    assert first.totals.savings == 3000 and not first.storage.stale
+
+def test_trimmed_changes_mark_stale(workdir, monkeypatch):
+    monkeypatch.setattr(finance_core, "CHANGE_LOG_KEEP", 2)
+    first = LedgerService(SqliteStorage())
+    second = LedgerService(SqliteStorage())
+    for amount in ("1", "2", "3"):
+        first.add_transaction("income", "2026-01-01", amount)
+    second.storage.sync()
+    assert second.storage.stale
+    assert second.totals.income == 600
+
+def test_migration_normalizes_dates(workdir):
+    service = LedgerService(finance_core.JsonStorage())
+    service.add_transaction("expense", "2026-2-1", "5", "خوراک")
+    service.add_transaction("income", "2026-01-15", "10")
+    storage = migrate_json_to_sqlite()
+    assert (workdir / DB_FILE).exists()
+    migrated = LedgerService(storage)
+    assert [t["id"] for t in migrated.data.query()] == [2, 1]
+    assert migrated.data.get(1)["date"] == "2026-02-01"
+    assert (migrated.totals.income, migrated.totals.expense) == (1000, 500)
+    assert migrated.data.category_names == ["", "خوراک"]
+
+def test_export_select(workdir):
+    storage = sample_storage()
+    rows = storage.select({"ttype": "expense", "text": "نان"}, "id")
+    assert [t["id"] for t in rows] == [2, 3]
+    assert [t["id"] for t in storage.select({"start": date_ordinal("2026-02-01")})] == [3, 4, 5]
+    assert transaction(1, "2026-01-05", "income", 1000, "حقوق", "حقوق دی") == next(storage.select({}))
+
+def test_upgrade_v1_database(workdir):
+    conn = sqlite3.connect(DB_FILE)
+    conn.execute("CREATE TABLE transactions (id INTEGER PRIMARY KEY, date TEXT, type TEXT, amount REAL, category TEXT, description TEXT)")
+    conn.executemany("INSERT INTO transactions VALUES (?, ?, ?, ?, ?, ?)",
+                     [(1, "2026-1-2", "income", 12.5, "", ""), (2, "2026-01-03", "expense", None, "", "")])
+    conn.commit()
+    conn.close()
+    storage = SqliteStorage()
+    assert storage.quarantined == 1 and (workdir / finance_core.QUARANTINE_FILE).exists()
+    service = LedgerService(storage, on_load_error=lambda e: None)
+    assert list(service.data) == [transaction(1, "2026-01-02", "income", 1250)]
+    assert SqliteStorage().quarantined == 0
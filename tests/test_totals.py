@@ -0,0 +1,27 @@
+import pytest
+
+import finance_core
+from finance_core import LedgerError, LedgerService, LedgerTotals
+
+def test_totals_follow_changes(workdir, monkeypatch):
+    monkeypatch.setattr(finance_core, "VERIFY_TOTALS", True)
+    service = LedgerService()
+    income = service.add_transaction("income", "2026-01-01", "1000")
+    expense = service.add_transaction("expense", "2026-01-02", "300")
+    service.add_savings("200")
+    service.edit_transaction(expense["id"], ttype="income")
+    service.release_savings("50")
+    service.delete_transaction(income["id"])
+    service.undo()
+    totals = service.totals
+    assert (totals.income, totals.expense, totals.savings, totals.balance) == (135000, 0, 15000, 120000)
+    expected = LedgerTotals(service.data, service.savings)
+    assert (expected.income, expected.expense, expected.savings) == (totals.income, totals.expense, totals.savings)
+
+def test_verify_reports_mismatch(workdir):
+    service = LedgerService()
+    service.add_transaction("income", "2026-01-01", "10")
+    service.totals.verify(service.data, service.savings)
+    service.totals.income += 1
+    with pytest.raises(LedgerError, match="income"):
+        service.totals.verify(service.data, service.savings)
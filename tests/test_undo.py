@@ -0,0 +1,46 @@
+import pytest
+
+from finance_core import LedgerService, NotFoundError
+
+from support import state
+
+def test_undo_redo_round_trip(workdir):
+    service = LedgerService()
+    states = [state(service)]
+    first = service.add_transaction("income", "2026-01-01", "1000")
+    states.append(state(service))
+    service.add_transaction("expense", "2026-01-02", "100", "خوراک", "نان")
+    states.append(state(service))
+    service.add_savings("200")
+    states.append(state(service))
+    service.add_savings("300")
+    states.append(state(service))
+    service.release_savings("250")
+    states.append(state(service))
+    service.edit_transaction(first["id"], description="حقوق", amount="1200")
+    states.append(state(service))
+    service.delete_transaction(first["id"])
+    states.append(state(service))
+    for expected in reversed(states[:-1]):
+        service.undo()
+        assert state(service) == expected
+    with pytest.raises(NotFoundError):
+        service.undo()
+    assert state(LedgerService()) == states[0]
+    for expected in states[1:]:
+        service.redo()
+        assert state(service) == expected
+    with pytest.raises(NotFoundError):
+        service.redo()
+    assert state(LedgerService()) == states[-1]
+
+def test_new_action_clears_redo(workdir):
+    service = LedgerService()
+    service.add_transaction("income", "2026-01-01", "10")
+    service.undo()
+    service.add_transaction("income", "2026-01-02", "20")
+    with pytest.raises(NotFoundError):
+        service.redo()
+    service.undo()
+    assert len(service.data) == 0
+    assert len(LedgerService().history) == 1